@@ -24,8 +24,16 @@ export function connectGpioWebSocket(callback) {
         try {
             const data = JSON.parse(event.data)
 
-            // Ловим только события изменения GPIO
-            if (data.type === 'gpio_event') {
+            // События GPIO приходят пачками: берем последнее значение каждого пина
+            if (data.type === 'gpio_batch') {
+                data.events.forEach((gpioEvent) => {
+                    console.log(`🔌 GPIO изменился: ${gpioEvent.value} (событий: ${gpioEvent.count})`)
+                    if (callback) {
+                        callback(gpioEvent.value)
+                    }
+                })
+            } else if (data.type === 'gpio_event') {
+                // Одиночное событие пина
                 console.log(`🔌 GPIO изменился: ${data.value}`)
                 // Вызываем callback с данными
                 if (callback) {
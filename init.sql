@@ -23,6 +23,10 @@ CREATE TABLE IF NOT EXISTS test_executions (
     result_passed BOOLEAN,
     result_details TEXT,
     result_data JSONB, -- полные данные результата в JSON формате
+    serial_number VARCHAR(100),
+    mac_address VARCHAR(50),
+    firmware_build VARCHAR(100), -- ID билда/хэш прошивки устройства
+    suite_hash VARCHAR(64), -- хэш набора robot и его ресурсов
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
@@ -54,12 +58,58 @@ CREATE TABLE IF NOT EXISTS ethernet_test_results (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Колонки кэша результатов для баз, созданных до их появления
+ALTER TABLE test_executions ADD COLUMN IF NOT EXISTS serial_number VARCHAR(100);
+ALTER TABLE test_executions ADD COLUMN IF NOT EXISTS mac_address VARCHAR(50);
+ALTER TABLE test_executions ADD COLUMN IF NOT EXISTS firmware_build VARCHAR(100);
+ALTER TABLE test_executions ADD COLUMN IF NOT EXISTS suite_hash VARCHAR(64);
+
+-- Очередь прогонов тестов. Воркеры (процессы API и отдельные хосты стендов)
+-- забирают задания через SELECT ... FOR UPDATE SKIP LOCKED, держат аренду
+-- heartbeat-ами; задание с истекшей арендой забирает другой воркер
+CREATE TABLE IF NOT EXISTS test_jobs (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    session_key VARCHAR(100) NOT NULL, -- слот стенда / серийный номер устройства
+    test_id VARCHAR(50) NOT NULL,
+    payload JSONB NOT NULL, -- TestRequest запуска
+    status VARCHAR(20) NOT NULL DEFAULT 'queued', -- queued, running, completed, failed, cancelled
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    worker_id VARCHAR(255),
+    lease_expires_at TIMESTAMP WITH TIME ZONE,
+    heartbeat_at TIMESTAMP WITH TIME ZONE,
+    cancel_requested BOOLEAN NOT NULL DEFAULT FALSE,
+    snapshot JSONB, -- состояние тестов сессии на последнем heartbeat
+    error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP WITH TIME ZONE,
+    finished_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Сообщения шины WebSocket, не помещающиеся в NOTIFY (8000 байт): воркер
+-- сохраняет сообщение и уведомляет остальных его id. Строки живут минуты,
+-- журнал WAL для них не нужен
+CREATE UNLOGGED TABLE IF NOT EXISTS ws_events (
+    id BIGSERIAL PRIMARY KEY,
+    payload TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Индексы для оптимизации запросов
 CREATE INDEX IF NOT EXISTS idx_test_executions_test_id ON test_executions(test_id);
 CREATE INDEX IF NOT EXISTS idx_test_executions_status ON test_executions(status);
 CREATE INDEX IF NOT EXISTS idx_test_executions_created_at ON test_executions(created_at);
+-- Поиск результата в кэше: то же устройство, прошивка и версия набора
+CREATE INDEX IF NOT EXISTS idx_test_executions_cache
+    ON test_executions(serial_number, mac_address, test_id, created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_sim_results_execution_id ON sim_test_results(execution_id);
 CREATE INDEX IF NOT EXISTS idx_ethernet_results_execution_id ON ethernet_test_results(execution_id);
+CREATE INDEX IF NOT EXISTS idx_test_jobs_claim ON test_jobs(status, created_at);
+-- Одно активное задание на устройство: второй запуск не ставится в очередь
+CREATE UNIQUE INDEX IF NOT EXISTS idx_test_jobs_active_session ON test_jobs(session_key)
+    WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS idx_ws_events_created_at ON ws_events(created_at);
 
 -- Вставка базовых тестов
 INSERT INTO tests (test_id, test_name, description) VALUES 
@@ -83,4 +133,7 @@ CREATE TRIGGER update_tests_updated_at BEFORE UPDATE ON tests
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
 CREATE TRIGGER update_test_executions_updated_at BEFORE UPDATE ON test_executions
-    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
\ No newline at end of file
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+CREATE TRIGGER update_test_jobs_updated_at BEFORE UPDATE ON test_jobs
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
@@ -0,0 +1,188 @@
+"""
+SSHLibrary с общим пулом авторизованных SSH соединений.
+
+Login переиспользует уже установленный транспорт paramiko к тому же
+host:port/пользователю и открывает на нем только новый канал, а Close
+Connection/Close All Connections закрывают канал, но оставляют транспорт
+в пуле. Пул живет на уровне модуля, поэтому в прогретых воркерах
+Robot Framework соединения с роутером и коммутатором переживают
+переход между наборами; повторное рукопожатие происходит только после
+перезагрузки устройства (или вызова Invalidate SSH Connections).
+Пул свой у каждого процесса robot (воркера пула), общего брокера
+соединений на уровне сервиса нет.
+
+Подключение в наборе: Library    PooledSSHLibrary.py
+"""
+
+import hashlib
+import os
+import threading
+
+from robot.api import logger
+from robot.utils import is_truthy
+from SSHLibrary import SSHLibrary
+
+# Отключить пул без правки наборов: SSH_POOL_ENABLED=0
+POOL_ENABLED = os.getenv("SSH_POOL_ENABLED", "1") != "0"
+# Сколько ждать проверочного канала на транспорте из пула, секунды
+PROBE_TIMEOUT = float(os.getenv("SSH_POOL_PROBE_TIMEOUT", "3"))
+# Keepalive транспорта, чтобы NAT/коммутатор не рвали простаивающие сессии
+KEEPALIVE_INTERVAL = int(os.getenv("SSH_POOL_KEEPALIVE", "15"))
+
+# (host, port, username, хеш учетных данных) -> paramiko.SSHClient
+_POOL = {}
+_POOL_LOCK = threading.Lock()
+
+
+def _pool_key(connection, username, *credentials):
+    """
+    Ключ пула: транспорт, авторизованный с другим паролем или ключом, не
+    переиспользуется. В ключе хранится хеш учетных данных, а не они сами.
+    """
+    secret = hashlib.sha256("\0".join(str(item or "") for item in credentials).encode("utf-8"))
+    return (connection.config.host, int(connection.config.port), username, secret.hexdigest())
+
+
+def _is_alive(client):
+    """Транспорт активен и отвечает: открываем и сразу закрываем канал"""
+    transport = client.get_transport()
+    if transport is None or not transport.is_active() or not transport.is_authenticated():
+        return False
+    try:
+        channel = transport.open_session(timeout=PROBE_TIMEOUT)
+        channel.close()
+        return True
+    except Exception:
+        return False
+
+
+def _drop(key):
+    with _POOL_LOCK:
+        client = _POOL.pop(key, None)
+    if client is not None:
+        try:
+            client.close()
+        except Exception:
+            pass
+
+
+class PooledSSHLibrary(SSHLibrary):
+    ROBOT_LIBRARY_SCOPE = "GLOBAL"
+
+    def login(self, username=None, password=None, allow_agent=False, look_for_keys=False,
+              delay="0.5 seconds", proxy_cmd=None, read_config=False,
+              jumphost_index_or_alias=None, keep_alive_interval="0 seconds"):
+        credentials = ("password", password)
+        if POOL_ENABLED and self._pooled_attach(username, credentials):
+            return self._read_pooled_login_output(delay)
+        output = super().login(username, password, allow_agent, look_for_keys, delay,
+                               proxy_cmd, read_config, jumphost_index_or_alias,
+                               keep_alive_interval)
+        if POOL_ENABLED:
+            self._pooled_store(username, credentials)
+        return output
+
+    login.__doc__ = SSHLibrary.login.__doc__
+
+    def login_with_public_key(self, username=None, keyfile=None, password="",
+                              allow_agent=False, look_for_keys=False, delay="0.5 seconds",
+                              proxy_cmd=None, jumphost_index_or_alias=None,
+                              read_config=False, keep_alive_interval="0 seconds"):
+        credentials = ("key", keyfile, password)
+        if POOL_ENABLED and self._pooled_attach(username, credentials):
+            return self._read_pooled_login_output(delay)
+        output = super().login_with_public_key(username, keyfile, password, allow_agent,
+                                               look_for_keys, delay, proxy_cmd,
+                                               jumphost_index_or_alias, read_config,
+                                               keep_alive_interval)
+        if POOL_ENABLED:
+            self._pooled_store(username, credentials)
+        return output
+
+    login_with_public_key.__doc__ = SSHLibrary.login_with_public_key.__doc__
+
+    def close_connection(self):
+        self._detach(self.current)
+        super().close_connection()
+
+    def close_all_connections(self):
+        for connection in self._connections._connections:
+            if connection:
+                self._detach(connection)
+        super().close_all_connections()
+
+    def invalidate_ssh_connections(self, host=None):
+        """Закрывает соединения пула (все или к ``host``).
+
+        Вызывать после перезагрузки устройства, если транспорт мог
+        остаться полуоткрытым.
+
+        Example:
+        | `Invalidate SSH Connections` | 192.168.1.1 |
+        """
+        with _POOL_LOCK:
+            keys = [key for key in _POOL if host is None or key[0] == host]
+        for key in keys:
+            _drop(key)
+        logger.info(f"Соединения пула SSH закрыты: {len(keys)}")
+
+    def get_ssh_pool_size(self):
+        """Количество соединений в пуле"""
+        return len(_POOL)
+
+    def _pooled_attach(self, username, credentials):
+        """Подставляет транспорт из пула в текущее соединение"""
+        key = _pool_key(self.current, username, *credentials)
+        with _POOL_LOCK:
+            client = _POOL.get(key)
+        if client is None:
+            return False
+        if not _is_alive(client):
+            logger.info(f"Соединение пула SSH {key[0]}:{key[1]} устарело, переподключение")
+            _drop(key)
+            return False
+        self.current.client = client
+        self.current._pooled = True
+        logger.info(f"Используется соединение из пула SSH {key[2]}@{key[0]}:{key[1]}")
+        return True
+
+    def _pooled_store(self, username, credentials):
+        client = self.current.client
+        transport = client.get_transport()
+        if transport is None or not transport.is_active():
+            return
+        if KEEPALIVE_INTERVAL:
+            transport.set_keepalive(KEEPALIVE_INTERVAL)
+        key = _pool_key(self.current, username, *credentials)
+        with _POOL_LOCK:
+            previous = _POOL.get(key)
+            _POOL[key] = client
+        if previous is not None and previous is not client:
+            try:
+                previous.close()
+            except Exception:
+                pass
+        self.current._pooled = True
+
+    def _read_pooled_login_output(self, delay):
+        output = self.current._read_login_output(delay)
+        if is_truthy(self.current.config.escape_ansi):
+            output = self._escape_ansi_sequences(output)
+        return output
+
+    @staticmethod
+    def _detach(connection):
+        """Закрывает каналы соединения, оставляя транспорт в пуле"""
+        if not getattr(connection, "_pooled", False):
+            return
+        shell = getattr(connection, "_shell", None)
+        channel = getattr(shell, "_shell", None)
+        if channel is not None:
+            try:
+                channel.close()
+            except Exception:
+                pass
+        connection._shell = None
+        connection._pooled = False
+        # close() соединения закроет уже пустой клиент, а не транспорт из пула
+        connection.client = connection._get_client()
@@ -1,6 +1,6 @@
 import logging
 from fastapi import APIRouter, HTTPException
-from domain.services.firmware_service import (
+from api_service.domain.services.firmware_service import (
     FirmwareService,
     FirmwareInstallRequest,
     FirmwareTestRequest
@@ -1,27 +1,155 @@
 import logging
+import os
 
 print("--- LOADING GET.PY ROUTER ---")
-from fastapi import APIRouter, Depends, HTTPException
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from api.routes.requests_1c import get_orders, get_sn_and_mac_from_1c
-from db.db_tests import tests_db
-from db.postgres_db import db
-from typing import Dict, List, Optional
+from api_service.db.db_tests import state_version, tests_db
+from api_service.domain.services.bench_agents import agent_registry
+from api_service.domain.services.session_service import session_manager
+from api_service.domain.services.suite_registry import suite_registry
+from api_service.websocket.backplane import backplane
+from api_service.websocket.broadcaster import broadcaster
+from api_service.websocket.gpio_events import gpio_coalescer
+from api_service.websocket.heartbeat import heartbeat
+from api_service.db.postgres_db import db
+from typing import Dict, List, Optional, Tuple
+import asyncpg
 
 router = APIRouter()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Предельное время ожидания изменений в GET /tests?wait_for_version=, секунды
+TESTS_LONG_POLL_TIMEOUT = float(os.getenv("TESTS_LONG_POLL_TIMEOUT", "30"))
+
+# Сколько готовых тел ответа GET /tests хранится (общее и по сессиям)
+TESTS_BODY_CACHE_SIZE = int(os.getenv("TESTS_BODY_CACHE_SIZE", "64"))
+
+# Готовые тела ответа GET /tests по session_id: (версия состояния, JSON)
+_tests_bodies: Dict[Optional[str], Tuple[int, bytes]] = {}
+
+
+def _evict_tests_bodies():
+    """Убирает тела удаленных сессий и самые старые сверх TESTS_BODY_CACHE_SIZE"""
+    for session_id in list(_tests_bodies):
+        if session_id is not None and session_manager.get(session_id) is None:
+            del _tests_bodies[session_id]
+    while len(_tests_bodies) > TESTS_BODY_CACHE_SIZE:
+        del _tests_bodies[next(iter(_tests_bodies))]
+
+
+def _tests_body(session_id: Optional[str], version: int) -> bytes:
+    """JSON статусов тестов; пересобирается, только если изменилась версия состояния"""
+    cached = _tests_bodies.get(session_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    if session_id is not None:
+        session = session_manager.get(session_id)
+        if session is None:
+            _evict_tests_bodies()
+            raise HTTPException(status_code=404, detail="Сессия не найдена")
+        result = session.snapshot(include_all=True)
+    else:
+        result = []
+        for test_id, test_data in tests_db.items():
+            test_info = test_data.copy()
+            test_info["test_id"] = test_id
+            result.append(test_info)
+
+    body = orjson.dumps(result, default=str)
+    # Пересобранное тело уходит в конец: вытесняются давно не запрошенные
+    _tests_bodies.pop(session_id, None)
+    _tests_bodies[session_id] = (version, body)
+    _evict_tests_bodies()
+    return body
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
 
 # Получение статуса всех тестов
 @router.get("/tests")
-async def get_all_tests_status():
-    """Получить статус всех тестов"""
-    result = []
-    for test_id, test_data in tests_db.items():
-        test_info = test_data.copy()
-        test_info["test_id"] = test_id
-        result.append(test_info)
-    return result
+async def get_all_tests_status(
+    request: Request,
+    session_id: Optional[str] = None,
+    wait_for_version: Optional[str] = None,
+    timeout: float = TESTS_LONG_POLL_TIMEOUT,
+):
+    """
+    Получить статус всех тестов (или тестов одной сессии).
+
+    ETag ответа - версия состояния тестов: запрос с If-None-Match текущей
+    версии получает 304 без тела. С ?wait_for_version=<версия> (значение
+    X-State-Version прошлого ответа) запрос ждет изменения состояния до
+    timeout секунд и возвращается сразу после него; без изменений - 304.
+    Версия своя у каждого процесса API: версия другого воркера считается
+    устаревшей, и ответ приходит сразу с полным телом.
+    """
+    if session_id is not None and session_manager.get(session_id) is None:
+        raise HTTPException(status_code=404, detail="Сессия не найдена")
+
+    if wait_for_version is not None and wait_for_version == state_version.tag:
+        await state_version.wait(
+            state_version.value, min(max(timeout, 0), TESTS_LONG_POLL_TIMEOUT)
+        )
+
+    version, tag = state_version.value, state_version.tag
+    etag = f'"{tag}"'
+    headers = {"ETag": etag, "X-State-Version": tag, "Cache-Control": "no-cache"}
+    if tag == wait_for_version or _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content=_tests_body(session_id, version), media_type="application/json", headers=headers
+    )
+
+
+# Сессии тестирования устройств
+@router.get("/sessions")
+async def get_sessions():
+    """Получить список сессий тестирования"""
+    return [session.to_dict() for session in session_manager.list()]
+
+
+@router.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    """Получить состояние сессии тестирования"""
+    session = session_manager.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Сессия не найдена")
+    return session.to_dict()
+
+
+# Агенты стендов
+@router.get("/agents")
+async def get_agents():
+    """Получить список подключенных агентов стендов"""
+    return [agent.to_dict() for agent in agent_registry.list()]
+
+
+# Статистика рассылки WebSocket
+@router.get("/ws/stats")
+async def get_ws_stats():
+    """Получить статистику рассылки WebSocket: кодирование, объем, отстающие и оборванные клиенты"""
+    return {
+        **broadcaster.stats(),
+        "heartbeat": heartbeat.stats(),
+        "gpio": gpio_coalescer.stats(),
+        "backplane": backplane.stats(),
+    }
+
+
+# Наборы из robot-tests/
+@router.get("/suites")
+async def get_suites():
+    """Получить наборы тестов и их метаданные"""
+    return [suite.to_dict() for suite in suite_registry.list()]
 
 
 # Получение результатов
@@ -44,6 +172,31 @@ async def get_sn_and_mac(order_uid: str):
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+@router.get("/tests/jobs")
+async def get_test_jobs(
+    session_id: Optional[str] = None, status: Optional[str] = None, limit: int = 100
+):
+    """Получить задания очереди прогонов"""
+    if db.pool is None:
+        raise HTTPException(status_code=503, detail="База данных недоступна")
+    jobs = await db.get_test_jobs(session_id, status, limit)
+    return {"jobs": jobs, "total": len(jobs)}
+
+
+@router.get("/tests/jobs/{job_id}")
+async def get_test_job(job_id: str):
+    """Получить задание очереди со статусом и снимком состояния тестов"""
+    if db.pool is None:
+        raise HTTPException(status_code=503, detail="База данных недоступна")
+    try:
+        job = await db.get_test_job(job_id)
+    except (ValueError, asyncpg.DataError):
+        raise HTTPException(status_code=400, detail="Некорректный ID задания")
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задание не найдено")
+    return job
+
+
 @router.get("/tests/executions")
 async def get_test_executions(test_id: Optional[str] = None, limit: int = 100):
     """Получить список выполнений тестов из PostgreSQL"""
@@ -3,18 +3,23 @@ from typing import Dict, List
 import jwt
 from pydantic import BaseModel
 from api_service.app.config import oauth2_scheme, SECRET_KEY
-from domain.models.test_models import TestRequest
-from db.db_tests import tests_db
+from domain.models.test_models import CancelRequest, TestRequest
 from domain.services.test_service import (
     broadcast_status,
-    run_test_simulation,
+    run_single_test,
     run_tests_sequentially,
 )
+from api_service.db.postgres_db import db
+from api_service.domain.services.job_queue import enqueue_test_run, job_queue_available
+from api_service.domain.services.session_service import session_manager
 import asyncio
 import datetime
 
 router = APIRouter()
 
+# Сколько ждать, пока отмененный прогон убьет robot и обновит статусы
+CANCEL_WAIT_TIMEOUT = 10
+
 
 def get_current_user(token: str = Depends(oauth2_scheme)):
     try:
@@ -24,6 +29,27 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
         raise HTTPException(status_code=401, detail="Invalid token")
 
 
+async def enqueue_run(test_request_payload: TestRequest, session):
+    """Постановка прогона в очередь test_jobs; выполнит его любой воркер"""
+    job = await enqueue_test_run(test_request_payload)
+    if job is None:
+        return {
+            "status": "success",
+            "message": "Тесты уже запущены",
+            "session_id": session.session_id,
+        }
+    # Задание принято: сессия показывает новый прогон до его старта в воркере
+    session.apply_device(test_request_payload)
+    session.reset_tests()
+    return {
+        "status": "success",
+        "message": "Тесты поставлены в очередь",
+        "session_id": session.session_id,
+        "job_id": job["id"],
+        "job": job,
+    }
+
+
 # Имитация логина
 @router.post("/token")
 async def login():
@@ -37,65 +63,67 @@ async def run_test(test_request_payload: TestRequest):
 
     print(f"Запрос на запуск теста с ID: {requested_test_id}")
 
-    # Сбрасываем данные всех тестов перед новым запуском
-    for test_key in tests_db.keys():
-        if test_key != "all":  # Не сбрасываем запись "all"
-            tests_db[test_key]["status"] = "idle"
-            tests_db[test_key]["time_start"] = ""
-            tests_db[test_key]["time_end"] = ""
-            tests_db[test_key]["updated_at"] = ""
-            tests_db[test_key]["result"] = None
+    # Каждое устройство (слот стенда) тестируется в своей сессии.
+    # Данные устройства и тесты меняются только когда запуск принят
+    session = session_manager.ensure(test_request_payload)
+    print(f"Сессия тестирования: {session.session_id}")
+
+    if session.is_running():
+        raise HTTPException(status_code=409, detail="Тесты уже запущены")
+
+    if requested_test_id != "all" and requested_test_id not in session.tests:
+        raise HTTPException(
+            status_code=404, detail=f"Тест с ID '{requested_test_id}' не найден"
+        )
 
     if requested_test_id == "all":
-        if not tests_db:
+        if not session.tests:
             print("База данных тестов пуста. Нет тестов для запуска.")
             return []
 
-        # Запускаем последовательное выполнение в фоне
         if test_request_payload.status == "Testing":
             return {"status": "success", "message": "Тесты уже запущены"}
         elif test_request_payload.status == "success":
             return {"status": "success", "message": "Тесты уже пройдены"}
-        else:
-            asyncio.create_task(run_tests_sequentially(test_request_payload))
-
-        # Сразу возвращаем текущее состояние (которое idle)
-        tests_to_return = []
-        for test_key, test_value in tests_db.items():
-            if test_key != "all":
-                item = test_value.copy()
-                item["test_id"] = test_key
-                tests_to_return.append(item)
-        return tests_to_return
+        elif job_queue_available():
+            return await enqueue_run(test_request_payload, session)
 
-    else:  # Запуск конкретного теста
-        if requested_test_id not in tests_db:
-            raise HTTPException(
-                status_code=404, detail=f"Тест с ID '{requested_test_id}' не найден"
-            )
+        # Сбрасываем данные всех тестов сессии перед новым запуском
+        session.apply_device(test_request_payload)
+        session.reset_tests()
+        # Запускаем последовательное выполнение в фоне
+        session.task = asyncio.create_task(
+            run_tests_sequentially(test_request_payload, session)
+        )
 
+        # Сразу возвращаем текущее состояние сессии (которое idle)
+        return session.snapshot()
+
+    else:  # Запуск конкретного теста
         print(f"Запуск конкретного теста: {requested_test_id}")
-        test_item_in_db = tests_db[requested_test_id]
-        test_item_in_db["test_id"] = requested_test_id
+
+        if job_queue_available():
+            return await enqueue_run(test_request_payload, session)
+
+        session.apply_device(test_request_payload)
+        session.reset_tests()
 
         current_time_utc_iso = datetime.datetime.now(datetime.timezone.utc).strftime(
             "%Y-%m-%dT%H:%M:%SZ"
         )
 
-        test_item_in_db["status"] = "running"
-        test_item_in_db["time_start"] = current_time_utc_iso
-        test_item_in_db["updated_at"] = current_time_utc_iso
-        test_item_in_db["time_end"] = ""
-        test_item_in_db["result"] = None
+        test_item_in_db = session.update_test(
+            requested_test_id,
+            status="running",
+            time_start=current_time_utc_iso,
+            updated_at=current_time_utc_iso,
+            time_end="",
+            result=None,
+        )
 
-        if test_item_in_db["status"] == "testing":
-            return {"status": "success", "message": "Тесты уже запущены"}
-        elif test_item_in_db["status"] == "success":
-            return {"status": "success", "message": "Тесты уже пройдены"}
-        else:
-            asyncio.create_task(
-                run_test_simulation(test_item_in_db, test_request_payload)
-            )
+        session.task = asyncio.create_task(
+            run_single_test(test_item_in_db, test_request_payload, session)
+        )
 
         # Сразу возвращаем обновленное состояние
         item_to_return = test_item_in_db.copy()
@@ -106,3 +134,44 @@ async def run_test(test_request_payload: TestRequest):
 
     #     print(f"Exception в update_device_status_endpoint: {e}")
     #     raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/tests/cancel")
+async def cancel_tests(cancel_request: CancelRequest):
+    session_key = session_manager.session_key(cancel_request)
+    cancelled_jobs = 0
+    if job_queue_available():
+        # Задание могло уйти на воркер другого хоста - он увидит отмену на heartbeat
+        cancelled_jobs = await db.cancel_test_jobs(session_key)
+
+    session = session_manager.get(session_key)
+    if session is None:
+        if cancelled_jobs:
+            return {
+                "status": "success",
+                "message": "Отмена заданий очереди запрошена",
+                "session_id": session_key,
+                "jobs": cancelled_jobs,
+            }
+        raise HTTPException(status_code=404, detail="Сессия не найдена")
+
+    if not session.is_running():
+        return {
+            "status": "success",
+            "message": "Отмена заданий очереди запрошена" if cancelled_jobs else "Нет запущенных тестов",
+            "session_id": session.session_id,
+            "jobs": cancelled_jobs,
+        }
+
+    print(f"Отмена тестов сессии {session.session_id}")
+    session.task.cancel()
+    # Ждем, пока процессы robot будут убиты, а статусы разосланы
+    await asyncio.wait({session.task}, timeout=CANCEL_WAIT_TIMEOUT)
+
+    return {
+        "status": "success",
+        "message": "Тесты отменены",
+        "session_id": session.session_id,
+        "jobs": cancelled_jobs,
+        "tests": session.snapshot(),
+    }
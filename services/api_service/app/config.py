@@ -1,9 +1,10 @@
 from fastapi.security import OAuth2PasswordBearer
-from typing import Dict, List
+from typing import Dict, Set
 from fastapi import WebSocket
 
-# Типы для WebSocket соединений
-ConnectedClients = Dict[str, List[WebSocket]]
+# Типы для WebSocket соединений: топик -> подписчики (множество,
+# чтобы подписка и отписка не зависели от числа клиентов)
+ConnectedClients = Dict[str, Set[WebSocket]]
 
 # Общие переменные для всего приложения
 # Типизированная переменная для WebSocket соединений
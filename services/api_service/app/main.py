@@ -4,13 +4,22 @@ import logging
 from typing import Dict
 from fastapi.middleware.cors import CORSMiddleware
 from db import db_tests
-from db.postgres_db import db
+from api_service.db.postgres_db import db
 from domain.models.test_models import *
 from api.routes.post import router as post_router
 from api.routes.get import router as get_router
 from api.routes.firmware import router as firmware_router
 from api.routes.patch import router as patch_router
 from api_service.websocket.endpoint import parse_and_broadcast_gpio_event
+from api_service.domain.services.bench_agents import BENCH_AGENTS_ENABLED
+from api_service.domain.services.robot_worker_pool import robot_worker_pool
+from api_service.domain.services.job_queue import job_queue_available, job_worker
+from api_service.domain.services.run_artifacts import artifact_store
+from api_service.domain.services.suite_registry import suite_registry
+from api_service.websocket.backplane import backplane
+from api_service.websocket.encoding import WS_PER_MESSAGE_DEFLATE
+from api_service.websocket.heartbeat import WS_PING_INTERVAL, WS_PING_TIMEOUT, heartbeat
+import os
 import subprocess
 
 # Настройка логирования
@@ -23,28 +32,68 @@ app = FastAPI()
 gpio_process = None
 
 
+async def check_bench_agent_workers():
+    """
+    С агентами стендов API работает одним воркером uvicorn: реестр агентов
+    в памяти процесса, и прогон, запущенный воркером без агента, выполнился
+    бы на хосте API. С WEB_CONCURRENCY > 1 API не стартует, а лишний воркер,
+    запущенный иначе (uvicorn --workers, gunicorn -w), отсеивает блокировка
+    на шине, которую держит первый воркер.
+    """
+    if int(os.getenv("WEB_CONCURRENCY", "1")) > 1 or not await backplane.try_lock("bench_agents"):
+        raise RuntimeError(
+            "Агенты стендов (BENCH_AGENT_TOKEN) работают только с одним воркером uvicorn"
+        )
+
+
 @app.on_event("startup")
 async def startup_event():
     """Инициализация подключения к PostgreSQL при запуске"""
+    # Прогрев воркеров Robot Framework идет в фоне, пока поднимается сервис
+    try:
+        await robot_worker_pool.start()
+    except Exception as e:
+        print(f"Не удалось запустить пул Robot Framework: {e}")
+
+    # Очистка старых каталогов прогонов по возрасту и размеру
+    artifact_store.start()
+    # Новые и измененные наборы в robot-tests/ подхватываются без перезапуска
+    suite_registry.start()
+    # Ping клиентов /ws и очистка оборванных подключений WebSocket
+    heartbeat.start()
+
     try:
         await db.connect()
         print("PostgreSQL подключение установлено")
 
-        global gpio_process
-        gpio_process = await asyncio.create_subprocess_exec(
-            "node",
-            "services/gpio/gpio_manager.js",
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-        print("✅ GPIO монитор запущен как демон")
+        # События тестов, прошивки и GPIO расходятся по всем воркерам uvicorn
+        await backplane.start()
+
+        # Прогоны из очереди test_jobs выполняет и сам процесс API
+        if job_queue_available():
+            job_worker.start()
 
-        # Запуск асинхронного чтения вывода GPIO
-        asyncio.create_task(read_gpio_output())
+        # Монитор GPIO один на хост: при нескольких воркерах его запускает
+        # воркер, получивший блокировку, события остальным приходят через шину
+        if await backplane.try_lock("gpio_monitor"):
+            global gpio_process
+            gpio_process = await asyncio.create_subprocess_exec(
+                "node",
+                "services/gpio/gpio_manager.js",
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            print("✅ GPIO монитор запущен как демон")
+
+            # Запуск асинхронного чтения вывода GPIO
+            asyncio.create_task(read_gpio_output())
 
     except Exception as e:
         print(f"Ошибка подключения к PostgreSQL: {e}")
 
+    if BENCH_AGENTS_ENABLED:
+        await check_bench_agent_workers()
+
 
 async def read_gpio_output():
     """Чтение вывода GPIO процесса"""
@@ -52,7 +101,10 @@ async def read_gpio_output():
         line = await gpio_process.stdout.readline()
         if line:
             line = line.decode().strip()
-            print(f"[GPIO] {line}")
+            # События не печатаются построчно: при частых импульсах вывод
+            # в консоль сам тормозит цикл событий; их счетчики - в /ws/stats
+            if "Событие:" not in line:
+                print(f"[GPIO] {line}")
             await parse_and_broadcast_gpio_event(line)
         else:
             break
@@ -61,6 +113,14 @@ async def read_gpio_output():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Закрытие подключения к PostgreSQL при остановке"""
+    # Незавершенные задания очереди возвращаются другим воркерам
+    await job_worker.stop()
+    await robot_worker_pool.stop()
+    await artifact_store.stop()
+    await suite_registry.stop()
+    await heartbeat.stop()
+    await backplane.stop()
+
     await db.disconnect()
     print("PostgreSQL подключение закрыто")
 
@@ -81,8 +141,10 @@ app.add_middleware(
 )
 
 from api_service.websocket.endpoint import router as websocket_router
+from api_service.websocket.agent_endpoint import router as agent_websocket_router
 
 app.include_router(websocket_router)
+app.include_router(agent_websocket_router)
 app.include_router(post_router)
 app.include_router(get_router)
 app.include_router(firmware_router)
@@ -91,4 +153,11 @@ app.include_router(patch_router)
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=8000,
+        ws_ping_interval=WS_PING_INTERVAL,
+        ws_ping_timeout=WS_PING_TIMEOUT,
+        ws_per_message_deflate=WS_PER_MESSAGE_DEFLATE,
+    )
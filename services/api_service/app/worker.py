@@ -0,0 +1,59 @@
+"""
+Отдельный воркер очереди test_jobs для хостов стендов и дополнительных ядер.
+
+Запуск (из services/api_service, PYTHONPATH как у API):
+    TEST_JOB_QUEUE=1 python -m app.worker
+"""
+
+import asyncio
+import logging
+import signal
+
+from api_service.db.postgres_db import db
+from api_service.domain.services.job_queue import JobWorker
+from api_service.domain.services.robot_worker_pool import robot_worker_pool
+from api_service.domain.services.run_artifacts import artifact_store
+from api_service.websocket.backplane import backplane
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    await db.connect()
+    if db.pool is None:
+        raise SystemExit("PostgreSQL недоступен, воркер очереди не запущен")
+    await robot_worker_pool.start()
+    artifact_store.start()
+    # Статусы прогонов воркера доходят до клиентов WebSocket процессов API
+    await backplane.start()
+
+    worker = JobWorker()
+    if worker.concurrency <= 0:
+        raise SystemExit("JOB_WORKER_CONCURRENCY должен быть больше 0")
+    task = asyncio.create_task(worker.run_forever())
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, task.cancel)
+        except NotImplementedError:
+            # Windows: остановка по Ctrl+C через KeyboardInterrupt
+            pass
+
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    finally:
+        await robot_worker_pool.stop()
+        await artifact_store.stop()
+        await backplane.stop()
+        await db.disconnect()
+        logger.info("Воркер очереди остановлен")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,27 +1,11 @@
-from typing import Dict
+import asyncio
+import time
+import uuid
+from typing import Dict, Optional
 
-tests_db: Dict[str, Dict] = {  # Имитация базы данных тестов
-    "wifi": {
-        "status": "idle",
-        "time_start": "",
-        "time_end": "",
-        "updated_at": "",
-        "result": None,
-    },
-    "sim": {
-        "status": "idle",
-        "time_start": "",
-        "time_end": "",
-        "updated_at": "",
-        "result": None,
-    },
-        "ethernets": {
-        "status": "idle",
-        "time_start": "",
-        "time_end": "",
-        "updated_at": "",
-        "result": None,
-    },
+# Имитация базы данных тестов. Записи наборов добавляет реестр
+# domain/services/suite_registry.py по файлам robot-tests/*.robot
+tests_db: Dict[str, Dict] = {
     "all": {
         "status": "idle",
         "time_start": "",
@@ -30,3 +14,64 @@ tests_db: Dict[str, Dict] = {  # Имитация базы данных тест
         "result": None,
     },
 }
+
+
+class StateVersion:
+    """
+    Версия состояния тестов (tests_db и сессий) для условных GET и long-poll
+    GET /tests. Растет при каждом изменении; начинается с текущего времени
+    в мс, чтобы после перезапуска API не повторить версию прежнего процесса.
+
+    Состояние тестов хранится в памяти процесса, поэтому и версия своя у
+    каждого воркера uvicorn. Клиентам отдается tag - версия вместе с
+    идентификатором процесса: tag другого воркера никогда не совпадет с
+    текущим, и клиент получит полный ответ, а не 304 с чужим состоянием.
+    """
+
+    def __init__(self):
+        self.value = int(time.time() * 1000)
+        self.instance = uuid.uuid4().hex[:8]
+        self._changed: Optional[asyncio.Event] = None
+
+    @property
+    def tag(self) -> str:
+        return f"{self.instance}-{self.value}"
+
+    def bump(self):
+        self.value += 1
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = None
+
+    async def wait(self, version: int, timeout: float) -> bool:
+        """Ждет версию, отличную от version; False - за timeout секунд изменений не было"""
+        deadline = time.monotonic() + timeout
+        while self.value == version:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if self._changed is None:
+                self._changed = asyncio.Event()
+            try:
+                await asyncio.wait_for(self._changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+
+# Глобальная версия состояния тестов
+state_version = StateVersion()
+
+
+def create_tests_state() -> Dict[str, Dict]:
+    """Новое состояние тестов в idle для отдельной сессии"""
+    state = {}
+    for test_id in tests_db.keys():
+        state[test_id] = {
+            "status": "idle",
+            "time_start": "",
+            "time_end": "",
+            "updated_at": "",
+            "result": None,
+        }
+    return state
@@ -40,16 +40,22 @@ class PostgreSQLDatabase:
             await self.pool.close()
             logger.info("Соединение с PostgreSQL закрыто")
     
-    async def create_test_execution(self, test_id: str, status: str = 'idle') -> str:
+    async def create_test_execution(self, test_id: str, status: str = 'idle',
+                                    serial_number: Optional[str] = None,
+                                    mac_address: Optional[str] = None,
+                                    firmware_build: Optional[str] = None,
+                                    suite_hash: Optional[str] = None) -> str:
         """Создание новой записи выполнения теста"""
         async with self.pool.acquire() as conn:
             execution_id = await conn.fetchval(
                 """
-                INSERT INTO test_executions (test_id, status, time_start)
-                VALUES ($1, $2, $3)
+                INSERT INTO test_executions
+                (test_id, status, time_start, serial_number, mac_address, firmware_build, suite_hash)
+                VALUES ($1, $2, $3, $4, $5, $6, $7)
                 RETURNING id
                 """,
-                test_id, status, datetime.now() if status != 'idle' else None
+                test_id, status, datetime.now() if status != 'idle' else None,
+                serial_number, mac_address, firmware_build, suite_hash
             )
             logger.info(f"Создано выполнение теста {test_id} с ID: {execution_id}")
             return str(execution_id)
@@ -69,6 +75,9 @@ class PostgreSQLDatabase:
             if key in ['status', 'time_start', 'time_end', 'execution_time', 
                       'progress', 'result_passed', 'result_details', 'result_data']:
                 set_parts.append(f"{key} = ${param_count}")
+                # asyncpg принимает JSONB только строкой
+                if key == 'result_data' and value is not None and not isinstance(value, str):
+                    value = json.dumps(value, ensure_ascii=False, default=str)
                 values.append(value)
                 param_count += 1
         
@@ -272,6 +281,32 @@ class PostgreSQLDatabase:
             
             return result
     
+    async def find_cached_test_execution(self, test_id: str, serial_number: str, mac_address: str,
+                                         firmware_build: str, suite_hash: str,
+                                         max_age_seconds: float) -> Optional[Dict]:
+        """Последнее успешное выполнение теста на том же устройстве, прошивке и версии набора"""
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(
+                """
+                SELECT * FROM test_executions
+                WHERE serial_number = $1 AND mac_address = $2 AND test_id = $3
+                  AND firmware_build = $4 AND suite_hash = $5
+                  AND result_passed = TRUE
+                  AND created_at > now() - make_interval(secs => $6)
+                ORDER BY created_at DESC
+                LIMIT 1
+                """,
+                serial_number, mac_address, test_id, firmware_build, suite_hash,
+                float(max_age_seconds)
+            )
+            if row is None:
+                return None
+            execution = dict(row)
+            execution['id'] = str(execution['id'])
+            if isinstance(execution.get('result_data'), str):
+                execution['result_data'] = json.loads(execution['result_data'])
+            return execution
+
     async def get_test_statistics(self) -> Dict[str, Any]:
         """Получение статистики по тестам"""
         async with self.pool.acquire() as conn:
@@ -320,5 +355,200 @@ class PostgreSQLDatabase:
                 'success_stats': [dict(row) for row in success_stats]
             }
 
+    # Очередь прогонов тестов (test_jobs)
+
+    @staticmethod
+    def _job_to_dict(row) -> Optional[Dict]:
+        if row is None:
+            return None
+        job = dict(row)
+        job['id'] = str(job['id'])
+        for key in ('payload', 'snapshot'):
+            if isinstance(job.get(key), str):
+                job[key] = json.loads(job[key])
+        return job
+
+    async def enqueue_test_job(self, session_key: str, test_id: str, payload: Dict[str, Any],
+                               max_attempts: int = 3) -> Optional[Dict]:
+        """Постановка прогона в очередь; None - у устройства уже есть активное задание"""
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(
+                """
+                INSERT INTO test_jobs (session_key, test_id, payload, max_attempts)
+                VALUES ($1, $2, $3::jsonb, $4)
+                ON CONFLICT (session_key) WHERE status IN ('queued', 'running') DO NOTHING
+                RETURNING *
+                """,
+                session_key, test_id, json.dumps(payload), max_attempts
+            )
+            if row is not None:
+                logger.info(f"Задание {row['id']} ({test_id}) поставлено в очередь для {session_key}")
+            return self._job_to_dict(row)
+
+    async def claim_test_job(self, worker_id: str, lease_seconds: float) -> Optional[Dict]:
+        """
+        Забирает следующее задание очереди. Задания других воркеров с
+        истекшей арендой забираются повторно, пока не исчерпаны попытки.
+        """
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                expired = await conn.execute(
+                    """
+                    UPDATE test_jobs
+                    SET status = 'failed', finished_at = now(), lease_expires_at = NULL,
+                        error = 'Аренда истекла, попытки исчерпаны (воркер ' || worker_id || ')'
+                    WHERE status = 'running' AND lease_expires_at < now()
+                      AND attempts >= max_attempts
+                    """
+                )
+                if expired != 'UPDATE 0':
+                    logger.warning(f"Задания с истекшей арендой переведены в failed: {expired}")
+
+                row = await conn.fetchrow(
+                    """
+                    WITH next_job AS (
+                        SELECT id FROM test_jobs
+                        WHERE status = 'queued'
+                           OR (status = 'running' AND lease_expires_at < now())
+                        ORDER BY created_at
+                        LIMIT 1
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    UPDATE test_jobs j
+                    SET status = 'running', worker_id = $1, attempts = j.attempts + 1,
+                        lease_expires_at = now() + make_interval(secs => $2),
+                        heartbeat_at = now(), started_at = COALESCE(j.started_at, now())
+                    FROM next_job
+                    WHERE j.id = next_job.id
+                    RETURNING j.*
+                    """,
+                    worker_id, float(lease_seconds)
+                )
+            if row is not None:
+                logger.info(f"Задание {row['id']} взято воркером {worker_id}, попытка {row['attempts']}")
+            return self._job_to_dict(row)
+
+    async def heartbeat_test_job(self, job_id: str, worker_id: str, lease_seconds: float,
+                                 snapshot: Optional[List[Dict]] = None) -> Optional[bool]:
+        """
+        Продлевает аренду задания и сохраняет состояние тестов.
+        Возвращает cancel_requested; None - аренда потеряна.
+        """
+        async with self.pool.acquire() as conn:
+            return await conn.fetchval(
+                """
+                UPDATE test_jobs
+                SET lease_expires_at = now() + make_interval(secs => $3),
+                    heartbeat_at = now(), snapshot = COALESCE($4::jsonb, snapshot)
+                WHERE id = $1 AND worker_id = $2 AND status = 'running'
+                RETURNING cancel_requested
+                """,
+                job_id, worker_id, float(lease_seconds),
+                json.dumps(snapshot, default=str) if snapshot is not None else None
+            )
+
+    async def finish_test_job(self, job_id: str, worker_id: str, status: str,
+                              snapshot: Optional[List[Dict]] = None,
+                              error: Optional[str] = None) -> bool:
+        """Завершение задания: completed, failed или cancelled"""
+        async with self.pool.acquire() as conn:
+            result = await conn.execute(
+                """
+                UPDATE test_jobs
+                SET status = $3, snapshot = COALESCE($4::jsonb, snapshot), error = $5,
+                    finished_at = now(), lease_expires_at = NULL
+                WHERE id = $1 AND worker_id = $2 AND status = 'running'
+                """,
+                job_id, worker_id, status,
+                json.dumps(snapshot, default=str) if snapshot is not None else None,
+                error
+            )
+            logger.info(f"Задание {job_id} завершено со статусом {status}: {result}")
+            return result == 'UPDATE 1'
+
+    async def release_test_job(self, job_id: str, worker_id: str) -> bool:
+        """Возврат задания в очередь при остановке воркера"""
+        async with self.pool.acquire() as conn:
+            result = await conn.execute(
+                """
+                UPDATE test_jobs
+                SET status = 'queued', worker_id = NULL, lease_expires_at = NULL,
+                    attempts = GREATEST(attempts - 1, 0)
+                WHERE id = $1 AND worker_id = $2 AND status = 'running'
+                """,
+                job_id, worker_id
+            )
+            return result == 'UPDATE 1'
+
+    async def cancel_test_jobs(self, session_key: str) -> int:
+        """
+        Отмена заданий устройства: ожидающие отменяются сразу, выполняемым
+        выставляется cancel_requested - воркер увидит его на heartbeat.
+        """
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                queued = await conn.execute(
+                    """
+                    UPDATE test_jobs SET status = 'cancelled', finished_at = now()
+                    WHERE session_key = $1 AND status = 'queued'
+                    """,
+                    session_key
+                )
+                running = await conn.execute(
+                    """
+                    UPDATE test_jobs SET cancel_requested = TRUE
+                    WHERE session_key = $1 AND status = 'running'
+                    """,
+                    session_key
+                )
+            return int(queued.split()[-1]) + int(running.split()[-1])
+
+    async def get_test_job(self, job_id: str) -> Optional[Dict]:
+        """Получение задания очереди"""
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow("SELECT * FROM test_jobs WHERE id = $1", job_id)
+            return self._job_to_dict(row)
+
+    async def get_test_jobs(self, session_key: Optional[str] = None,
+                            status: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """Получение списка заданий очереди"""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT * FROM test_jobs
+                WHERE ($1::varchar IS NULL OR session_key = $1)
+                  AND ($2::varchar IS NULL OR status = $2)
+                ORDER BY created_at DESC
+                LIMIT $3
+                """,
+                session_key, status, limit
+            )
+            return [self._job_to_dict(row) for row in rows]
+
+    async def notify(self, channel: str, payloads: List[str]):
+        """NOTIFY пачки сообщений одним обращением к пулу"""
+        async with self.pool.acquire() as conn:
+            await conn.executemany("SELECT pg_notify($1, $2)", [(channel, p) for p in payloads])
+
+    async def store_ws_event(self, payload: str) -> int:
+        """Сохраняет сообщение шины WebSocket, не помещающееся в NOTIFY"""
+        async with self.pool.acquire() as conn:
+            return await conn.fetchval(
+                "INSERT INTO ws_events (payload) VALUES ($1) RETURNING id", payload
+            )
+
+    async def get_ws_event(self, event_id: int) -> Optional[str]:
+        """Получение сохраненного сообщения шины WebSocket"""
+        async with self.pool.acquire() as conn:
+            return await conn.fetchval("SELECT payload FROM ws_events WHERE id = $1", event_id)
+
+    async def purge_ws_events(self, max_age_seconds: float) -> str:
+        """Удаление прочитанных всеми воркерами сообщений шины WebSocket"""
+        async with self.pool.acquire() as conn:
+            return await conn.execute(
+                "DELETE FROM ws_events WHERE created_at < now() - make_interval(secs => $1)",
+                max_age_seconds
+            )
+
 # Глобальный экземпляр базы данных
 db = PostgreSQLDatabase()
\ No newline at end of file
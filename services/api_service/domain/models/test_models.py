@@ -1,4 +1,5 @@
 import enum
+from typing import Dict, Optional
 from pydantic import BaseModel
 
 
@@ -14,3 +15,19 @@ class TestRequest(BaseModel):
     mac_address: str
     serial_number: str
     device_name: str
+    status: Optional[str] = None
+    # Слот стенда; если не указан, сессия определяется по серийному номеру
+    session_id: Optional[str] = None
+    # Переменные Robot Framework для конкретного стенда (ROUTER_IP, SWITCH_IP, ...)
+    bench_variables: Optional[Dict[str, str]] = None
+    # ID билда или хэш прошивки устройства - часть ключа кэша результатов
+    firmware_build: Optional[str] = None
+    # Запустить наборы, даже если есть свежий успешный результат в кэше
+    force: bool = False
+
+
+class CancelRequest(BaseModel):
+    # Сессия определяется так же, как при запуске: слот, серийный номер или MAC
+    session_id: Optional[str] = None
+    serial_number: Optional[str] = None
+    mac_address: Optional[str] = None
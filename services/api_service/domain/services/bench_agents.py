@@ -0,0 +1,238 @@
+import asyncio
+import base64
+import gzip
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from api_service.domain.services.robot_events import robot_event_server
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Общий секрет агентов стендов; без него агенты не регистрируются
+BENCH_AGENT_TOKEN = os.getenv("BENCH_AGENT_TOKEN", "")
+# Регистрация без токена - только для отладки в закрытой сети
+BENCH_AGENT_ALLOW_INSECURE = os.getenv("BENCH_AGENT_ALLOW_INSECURE", "0") == "1"
+# API принимает агентов на /ws/agent
+BENCH_AGENTS_ENABLED = bool(BENCH_AGENT_TOKEN) or BENCH_AGENT_ALLOW_INSECURE
+
+# Наборы передаются агенту путем относительно robot-tests (тот же каталог,
+# что у реестра наборов; реестр здесь не импортируется, он не нужен агенту)
+ROBOT_TESTS_DIR = os.path.abspath(
+    os.getenv(
+        "ROBOT_TESTS_DIR",
+        os.path.join(os.path.dirname(__file__), "..", "..", "..", "..", "robot-tests"),
+    )
+)
+
+# Код возврата набора, агент которого отключился во время прогона
+# (как внутренняя ошибка robot: политика повторов считает отказ unknown)
+AGENT_LOST_RETURN_CODE = 255
+
+
+def is_inside(path: str, root: str) -> bool:
+    try:
+        return os.path.commonpath([path, root]) == root
+    except ValueError:
+        # Разные диски Windows
+        return False
+
+
+def encode_file(data: bytes, compress: bool = False) -> Dict[str, Any]:
+    """Содержимое файла результатов для JSON сообщения протокола агента"""
+    if compress:
+        data = gzip.compress(data)
+    return {"data": base64.b64encode(data).decode("ascii"), "gzip": compress}
+
+
+def decode_file(payload: Dict[str, Any]) -> bytes:
+    data = base64.b64decode(payload["data"])
+    if payload.get("gzip"):
+        data = gzip.decompress(data)
+    return data
+
+
+class RemoteRun:
+    """Набор, выполняемый агентом; результат приходит сообщением result"""
+
+    def __init__(self, listener_token: Optional[str]):
+        self.run_id = uuid.uuid4().hex
+        self.listener_token = listener_token
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class BenchAgent:
+    """Подключенный агент стенда: его WebSocket и запущенные на нем наборы"""
+
+    def __init__(
+        self,
+        agent_id: str,
+        websocket,
+        hostname: str = "",
+        sessions: Optional[List[str]] = None,
+        version: str = "",
+    ):
+        self.agent_id = agent_id
+        self.websocket = websocket
+        self.hostname = hostname
+        # Слоты стенда (session_id), наборы которых выполняет агент
+        self.sessions = list(sessions or [])
+        self.version = version
+        self.connected_at = time.time()
+        self.last_seen = self.connected_at
+        self.runs: Dict[str, RemoteRun] = {}
+        self._send_lock = asyncio.Lock()
+
+    async def send(self, message: Dict[str, Any]):
+        async with self._send_lock:
+            await self.websocket.send_text(json.dumps(message, ensure_ascii=False))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "agent_id": self.agent_id,
+            "hostname": self.hostname,
+            "sessions": self.sessions,
+            "version": self.version,
+            "connected_at": self.connected_at,
+            "last_seen": self.last_seen,
+            "running": len(self.runs),
+        }
+
+
+class AgentRegistry:
+    """
+    Реестр агентов стендов, подключенных к /ws/agent.
+
+    Агент при подключении сообщает слоты стенда, которые он обслуживает;
+    наборы этих сессий execute_robot отправляет ему вместо локального
+    запуска. События listener агент пересылает по тому же WebSocket, они
+    попадают в обработчик запуска через robot_event_server, а файлы
+    результатов записываются в каталог вывода сессии - дальше результат
+    обрабатывается так же, как при локальном прогоне.
+
+    Реестр хранится в памяти процесса: наборы агента запускает только
+    воркер uvicorn, к которому агент подключен. Поэтому с агентами API
+    работает одним воркером (см. check_bench_agent_workers в app.main).
+    """
+
+    def __init__(self):
+        self.agents: Dict[str, BenchAgent] = {}
+
+    def register(self, agent: BenchAgent):
+        previous = self.agents.get(agent.agent_id)
+        if previous is not None and previous is not agent:
+            self._fail_runs(previous, "Агент переподключился")
+        self.agents[agent.agent_id] = agent
+        logger.info(
+            f"Агент стенда {agent.agent_id} ({agent.hostname}) подключен, слоты: {agent.sessions}"
+        )
+
+    def unregister(self, agent: BenchAgent):
+        if self.agents.get(agent.agent_id) is agent:
+            del self.agents[agent.agent_id]
+        self._fail_runs(agent, "Агент отключился")
+        logger.info(f"Агент стенда {agent.agent_id} отключен")
+
+    def for_session(self, session_id: str) -> Optional[BenchAgent]:
+        for agent in self.agents.values():
+            if session_id in agent.sessions:
+                return agent
+        return None
+
+    def list(self) -> List[BenchAgent]:
+        return list(self.agents.values())
+
+    async def execute(
+        self,
+        agent: BenchAgent,
+        robot_file: str,
+        output_dir: str,
+        variables: Optional[Dict[str, str]] = None,
+        listener_token: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> Tuple[int, str]:
+        """
+        Выполняет набор на агенте и возвращает (return_code, stderr).
+
+        Переменные с путями внутри output_dir (JSON_PATH) передаются
+        относительными: агент подставляет свой каталог и возвращает
+        эти файлы вместе с результатом.
+        """
+        output_dir = os.path.abspath(output_dir)
+        plain_variables = {}
+        files = {}
+        for name, value in (variables or {}).items():
+            path = os.path.abspath(str(value))
+            if is_inside(path, output_dir):
+                files[name] = os.path.relpath(path, output_dir).replace("\\", "/")
+            else:
+                plain_variables[name] = value
+
+        run = RemoteRun(listener_token)
+        agent.runs[run.run_id] = run
+        try:
+            await agent.send(
+                {
+                    "type": "run",
+                    "run_id": run.run_id,
+                    "suite": os.path.relpath(robot_file, ROBOT_TESTS_DIR).replace("\\", "/"),
+                    "variables": plain_variables,
+                    "files": files,
+                    "timeout": timeout,
+                }
+            )
+            print(f"Набор {robot_file} отправлен агенту {agent.agent_id}, run_id: {run.run_id}")
+            result = await asyncio.wait_for(asyncio.shield(run.future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            # Агент убивает robot сам; ответ на отмену не ждем
+            try:
+                await agent.send({"type": "cancel", "run_id": run.run_id})
+            except Exception as e:
+                logger.warning(f"Не удалось отменить набор на агенте {agent.agent_id}: {e}")
+            raise
+        finally:
+            agent.runs.pop(run.run_id, None)
+
+        for name, payload in (result.get("files") or {}).items():
+            path = os.path.abspath(os.path.join(output_dir, name))
+            if not is_inside(path, output_dir):
+                logger.warning(f"Агент {agent.agent_id} прислал файл вне каталога: {name}")
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(decode_file(payload))
+
+        print(
+            f"Агент {agent.agent_id}: {robot_file} за {result.get('duration')}с, код: {result.get('return_code')}"
+        )
+        return result.get("return_code", AGENT_LOST_RETURN_CODE), result.get("stderr", "")
+
+    async def handle_message(self, agent: BenchAgent, message: Dict[str, Any]):
+        agent.last_seen = time.time()
+        run = agent.runs.get(message.get("run_id"))
+        if run is None:
+            return
+        if message.get("type") == "event":
+            if run.listener_token is not None:
+                await robot_event_server.dispatch(run.listener_token, message.get("event") or {})
+        elif message.get("type") == "result":
+            if not run.future.done():
+                run.future.set_result(message)
+
+    def _fail_runs(self, agent: BenchAgent, reason: str):
+        for run in agent.runs.values():
+            if not run.future.done():
+                run.future.set_result(
+                    {
+                        "return_code": AGENT_LOST_RETURN_CODE,
+                        "stderr": f"{reason} ({agent.agent_id}) во время прогона",
+                    }
+                )
+
+
+# Глобальный реестр агентов стендов
+agent_registry = AgentRegistry()
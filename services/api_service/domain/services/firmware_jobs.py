@@ -0,0 +1,38 @@
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict
+
+from api_service.domain.services.session_service import utc_now_iso
+from api_service.websocket.backplane import backplane
+
+# Топик WebSocket с этапами всех циклов прошивки; firmware:<job_id> - одного цикла
+FIRMWARE_TOPIC = "firmware"
+# Сколько последних циклов прошивки хранится для снимка при подписке
+FIRMWARE_JOBS_LIMIT = 50
+
+# job_id -> состояние цикла прошивки (этап, статус, сообщение)
+firmware_jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+
+def new_firmware_job_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def update_firmware_job(job_id: str, **fields) -> Dict[str, Any]:
+    """Обновляет состояние цикла прошивки и публикует его подписчикам"""
+    job = firmware_jobs.get(job_id)
+    if job is None:
+        job = {"job_id": job_id, "created_at": utc_now_iso()}
+        firmware_jobs[job_id] = job
+    job.update(fields)
+    job["updated_at"] = utc_now_iso()
+    firmware_jobs.move_to_end(job_id)
+    while len(firmware_jobs) > FIRMWARE_JOBS_LIMIT:
+        firmware_jobs.popitem(last=False)
+
+    backplane.publish(
+        [FIRMWARE_TOPIC, f"{FIRMWARE_TOPIC}:{job_id}"],
+        {"type": "firmware_job", **job},
+        key=("firmware", job_id),
+    )
+    return job
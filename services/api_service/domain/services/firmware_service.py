@@ -10,6 +10,8 @@ import time
 from pydantic import BaseModel, Field
 from fastapi import HTTPException
 
+from api_service.domain.services.firmware_jobs import new_firmware_job_id, update_firmware_job
+
 
 # Настройка логгера
 logging.basicConfig(level=logging.INFO)
@@ -780,6 +782,38 @@ class FirmwareService:
         return False
 
     async def firmware_test_cycle(self, request: FirmwareTestRequest):
+        """
+        Полный цикл с прошивкой как отслеживаемое задание: этапы публикуются
+        в WebSocket топики firmware и firmware:<job_id>, job_id возвращается
+        в ответе.
+        """
+        job_id = new_firmware_job_id()
+        update_firmware_job(
+            job_id,
+            stage="start",
+            status="running",
+            build_id=request.build_id,
+            router_ip=request.router_ip,
+            test_id=request.test_id or "all",
+        )
+        try:
+            result = await self._run_test_cycle(request, job_id)
+        except Exception as e:
+            update_firmware_job(job_id, stage="done", status="error", message=str(e))
+            raise
+
+        test_details = result.get("test_details") or {}
+        update_firmware_job(
+            job_id,
+            stage="done",
+            status=result.get("status"),
+            message=result.get("message"),
+            session_id=test_details.get("session_id"),
+        )
+        result["job_id"] = job_id
+        return result
+
+    async def _run_test_cycle(self, request: FirmwareTestRequest, job_id: str):
         """
         Полный цикл: загрузка прошивки → установка → ожидание роутера → запуск тестов
 
@@ -796,14 +830,15 @@ class FirmwareService:
             dict: Результат полного цикла
         """
         # Импортируем здесь, чтобы избежать циклических импортов
-        from api_service.domain.services.test_service import run_test_simulation, run_tests_sequentially
-        from api_service.db.db_tests import tests_db
+        from api_service.domain.services.test_service import run_single_test, run_tests_sequentially
+        from api_service.domain.services.session_service import session_manager
         import datetime
 
         logger.info("Начинаем полный цикл тестирования с прошивкой")
 
         # Этап 1: Загрузка прошивки
         logger.info("Этап 1: Загрузка прошивки из OneDev")
+        update_firmware_job(job_id, stage="download")
 
         firmware_request = FirmwareInstallRequest(
             build_id=request.build_id, artifact_path=request.artifact_path
@@ -832,6 +867,7 @@ class FirmwareService:
         logger.info(f"Этап 2: Установка прошивки на устройство {request.router_ip}")
 
         # Этап 3: Ожидание поднятия роутера
+        update_firmware_job(job_id, stage="wait_router")
         logger.info(
             f"Этап 3: Ожидание поднятия роутера {request.router_ip} ({request.wait_for_router}с)"
         )
@@ -855,6 +891,7 @@ class FirmwareService:
 
         # Этап 4: Запуск тестов
         logger.info("Этап 4: Запуск тестов")
+        update_firmware_job(job_id, stage="tests")
 
         try:
             # Сбрасываем статусы тестов
@@ -862,39 +899,51 @@ class FirmwareService:
                 datetime.timezone.utc
             ).strftime("%Y-%m-%dT%H:%M:%SZ")
 
+            # Тесты устройства выполняются в его собственной сессии
+            session = session_manager.get_or_create(request.device_data)
+            if session.is_running():
+                raise Exception(f"В сессии {session.session_id} уже идут тесты")
+            # Устройство только что прошито: кэш результатов учитывает новую сборку
+            flashed_build = firmware_result.get("details", {}).get("build_id")
+            session.firmware_build = str(flashed_build) if flashed_build else None
+
             if request.test_id and request.test_id != "all":
                 # Запуск конкретного теста
-                if request.test_id not in tests_db:
+                if request.test_id not in session.tests:
                     raise HTTPException(
                         status_code=404, detail=f"Тест {request.test_id} не найден"
                     )
 
                 # Сброс статуса конкретного теста
-                tests_db[request.test_id]["status"] = "pending"
-                tests_db[request.test_id]["time_start"] = ""
-                tests_db[request.test_id]["time_end"] = ""
-                tests_db[request.test_id]["updated_at"] = current_time_utc_iso
-                tests_db[request.test_id]["result"] = None
-
-                # Запуск теста
-                test_dict = tests_db[request.test_id].copy()
-                test_dict["test_id"] = request.test_id
+                test_dict = session.update_test(
+                    request.test_id,
+                    status="pending",
+                    time_start="",
+                    time_end="",
+                    updated_at=current_time_utc_iso,
+                    result=None,
+                )
 
                 # Запускаем тест асинхронно
-                asyncio.create_task(run_test_simulation(test_dict))
+                session.task = asyncio.create_task(
+                    run_single_test(test_dict, request.device_data, session)
+                )
 
                 test_status = "started"
                 test_details = {"test_id": request.test_id, "status": "running"}
 
             else:
                 # Запуск всех тестов
-                for test_key in tests_db.keys():
+                for test_key in session.tests.keys():
                     if test_key != "all":
-                        tests_db[test_key]["status"] = "pending"
-                        tests_db[test_key]["time_start"] = ""
-                        tests_db[test_key]["time_end"] = ""
-                        tests_db[test_key]["updated_at"] = current_time_utc_iso
-                        tests_db[test_key]["result"] = None
+                        session.update_test(
+                            test_key,
+                            status="pending",
+                            time_start="",
+                            time_end="",
+                            updated_at=current_time_utc_iso,
+                            result=None,
+                        )
 
                 logger.info("device_data", request)
                 if (
@@ -914,11 +963,15 @@ class FirmwareService:
                     }
 
                 # Запускаем все тесты асинхронно
-                asyncio.create_task(run_tests_sequentially(device_data))
+                session.task = asyncio.create_task(
+                    run_tests_sequentially(device_data, session)
+                )
 
                 test_status = "started"
                 test_details = {"test_id": "all", "status": "running"}
 
+            test_details["session_id"] = session.session_id
+
             logger.info("Тесты успешно запущены")
 
             return {
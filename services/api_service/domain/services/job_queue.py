@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import os
+import socket
+from typing import Dict, Optional
+
+from api_service.db.postgres_db import db
+from api_service.domain.models.test_models import TestRequest
+from api_service.domain.services.session_service import session_manager, utc_now_iso
+from api_service.domain.services.test_service import (
+    run_single_test,
+    run_tests_sequentially,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Прогоны через очередь test_jobs вместо задач внутри процесса API
+JOB_QUEUE_ENABLED = os.getenv("TEST_JOB_QUEUE", "0") == "1"
+# Сколько заданий очереди выполняет воркер этого процесса; 0 - процесс
+# только ставит задания (воркеры запущены отдельно: python -m app.worker
+# из services/api_service)
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "2"))
+# Аренда задания и период heartbeat, секунды
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "15"))
+# Пауза между опросами пустой очереди
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+# Сколько раз задание забирается заново после потери аренды воркером
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+
+def job_queue_available() -> bool:
+    return JOB_QUEUE_ENABLED and db.pool is not None
+
+
+async def enqueue_test_run(test_request: TestRequest) -> Optional[Dict]:
+    """Ставит прогон в очередь; None - у устройства уже есть активное задание"""
+    return await db.enqueue_test_job(
+        session_manager.session_key(test_request),
+        test_request.test_id,
+        test_request.model_dump(),
+        max_attempts=JOB_MAX_ATTEMPTS,
+    )
+
+
+class JobWorker:
+    """
+    Воркер очереди test_jobs.
+
+    Забирает задания через SELECT ... FOR UPDATE SKIP LOCKED, поэтому
+    воркеров может быть сколько угодно: в процессах API и на хостах стендов.
+    Пока прогон идет, аренда продлевается heartbeat-ом вместе со снимком
+    статусов тестов - по нему API отдает состояние задания. Если аренду
+    перехватил другой воркер или запрошена отмена, прогон отменяется.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = JOB_WORKER_CONCURRENCY,
+        lease_seconds: float = JOB_LEASE_SECONDS,
+        heartbeat_interval: float = JOB_HEARTBEAT_INTERVAL,
+        poll_interval: float = JOB_POLL_INTERVAL,
+    ):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = heartbeat_interval
+        self.poll_interval = poll_interval
+        self.jobs: Dict[str, asyncio.Task] = {}
+        self._loop_task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self._loop_task is not None and not self._loop_task.done()
+
+    def start(self):
+        if self.concurrency <= 0 or self.running:
+            return
+        self._stopping = False
+        self._loop_task = asyncio.create_task(self._claim_loop())
+        logger.info(f"Воркер очереди {self.worker_id} запущен, заданий одновременно: {self.concurrency}")
+
+    async def stop(self):
+        """Останавливает прием заданий; незавершенные возвращаются в очередь"""
+        self._stopping = True
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            await asyncio.gather(self._loop_task, return_exceptions=True)
+            self._loop_task = None
+        tasks = list(self.jobs.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        logger.info(f"Воркер очереди {self.worker_id} остановлен")
+
+    async def run_forever(self):
+        """Для отдельного процесса воркера: работает до отмены"""
+        self.start()
+        try:
+            await self._loop_task
+        finally:
+            await self.stop()
+
+    async def _claim_loop(self):
+        while not self._stopping:
+            if len(self.jobs) >= self.concurrency:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            try:
+                job = await db.claim_test_job(self.worker_id, self.lease_seconds)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка получения задания из очереди: {e}")
+                job = None
+            if job is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            self.jobs[job["id"]] = asyncio.create_task(self._run_job(job))
+
+    async def _run_job(self, job: Dict):
+        job_id = job["id"]
+        test_request = TestRequest(**job["payload"])
+        session = session_manager.get_or_create(test_request)
+        print(f"Задание {job_id}: тест {test_request.test_id}, сессия {session.session_id}")
+
+        status, error = "completed", None
+        run_task = None
+        heartbeat_task = None
+        try:
+            if session.is_running():
+                raise RuntimeError(f"Сессия {session.session_id} уже выполняет тесты")
+            run_task = self._start_run(test_request, session)
+            session.task = run_task
+            heartbeat_task = asyncio.create_task(self._heartbeat(job_id, session, run_task))
+            await run_task
+        except asyncio.CancelledError:
+            if run_task is not None and not run_task.done():
+                run_task.cancel()
+                await asyncio.gather(run_task, return_exceptions=True)
+            if self._stopping and not (heartbeat_task and heartbeat_task.done()):
+                # Остановка воркера: задание заберет другой воркер
+                await self._release(job_id)
+                return
+            status = "cancelled"
+        except Exception as e:
+            logger.error(f"Задание {job_id} завершилось ошибкой: {e}")
+            status, error = "failed", str(e)
+        finally:
+            if heartbeat_task is not None:
+                heartbeat_task.cancel()
+                await asyncio.gather(heartbeat_task, return_exceptions=True)
+            self.jobs.pop(job_id, None)
+
+        try:
+            await db.finish_test_job(
+                job_id, self.worker_id, status, session.snapshot(include_all=True), error
+            )
+        except Exception as e:
+            logger.error(f"Не удалось сохранить итог задания {job_id}: {e}")
+
+    def _start_run(self, test_request: TestRequest, session) -> asyncio.Task:
+        """Тот же запуск, что POST /tests/run делает без очереди"""
+        session.reset_tests()
+        if test_request.test_id == "all":
+            return asyncio.create_task(run_tests_sequentially(test_request, session))
+
+        current_time_utc_iso = utc_now_iso()
+        test_item = session.update_test(
+            test_request.test_id,
+            status="running",
+            time_start=current_time_utc_iso,
+            updated_at=current_time_utc_iso,
+            time_end="",
+            result=None,
+        )
+        return asyncio.create_task(run_single_test(test_item, test_request, session))
+
+    async def _heartbeat(self, job_id: str, session, run_task: asyncio.Task):
+        while not run_task.done():
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                cancel_requested = await db.heartbeat_test_job(
+                    job_id, self.worker_id, self.lease_seconds, session.snapshot(include_all=True)
+                )
+            except Exception as e:
+                # Временная ошибка БД: аренда еще действует, пробуем снова
+                logger.warning(f"Heartbeat задания {job_id} не удался: {e}")
+                continue
+            if cancel_requested is None:
+                logger.warning(f"Аренда задания {job_id} потеряна, прогон отменяется")
+                run_task.cancel()
+                return
+            if cancel_requested:
+                logger.info(f"Запрошена отмена задания {job_id}")
+                run_task.cancel()
+                return
+
+    async def _release(self, job_id: str):
+        try:
+            await db.release_test_job(job_id, self.worker_id)
+            logger.info(f"Задание {job_id} возвращено в очередь")
+        except Exception as e:
+            logger.error(f"Не удалось вернуть задание {job_id} в очередь: {e}")
+
+
+# Воркер очереди процесса API
+job_worker = JobWorker()
@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import os
+import shutil
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+from api_service.api.routes.requests_1c import settings as settings_1c
+from api_service.db.postgres_db import db
+from api_service.domain.services.test_scheduler import (
+    CISCO_SWITCH,
+    ROUTER_SSH,
+    SIM_MODEM,
+    WIFI_RADIO,
+    get_suite_spec,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Проверка стенда перед прогоном; 0 - выключена
+PREFLIGHT_ENABLED = os.getenv("PREFLIGHT_ENABLED", "1") == "1"
+# Жесткий бюджет на все проверки, секунды: незавершенные к этому моменту
+# проверки считаются проваленными по таймауту
+PREFLIGHT_BUDGET = float(os.getenv("PREFLIGHT_BUDGET", "3"))
+
+# Адреса стенда по умолчанию (как в наборах); bench_variables сессии их переопределяют
+DEFAULT_ROUTER_IP = os.getenv("BENCH_ROUTER_IP", "192.168.1.1")
+DEFAULT_SWITCH_IP = os.getenv("BENCH_SWITCH_IP", "192.168.1.209")
+DEFAULT_WIFI_INTERFACE = os.getenv("BENCH_WIFI_INTERFACE", "wlan0")
+
+OK = "ok"
+FAILED = "failed"
+TIMEOUT = "timeout"
+SKIPPED = "skipped"
+CANCELLED = "cancelled"
+
+CheckHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+async def _tcp_probe(host: str, port: int, expect_banner: bytes = b"") -> str:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        if expect_banner:
+            banner = await reader.readline()
+            if not banner.startswith(expect_banner):
+                raise ConnectionError(f"неожиданный ответ {banner[:40]!r}")
+            return banner.decode("ascii", errors="replace").strip()
+        return "порт открыт"
+    finally:
+        writer.close()
+
+
+async def check_router(router_ip: str) -> str:
+    return await _tcp_probe(router_ip, 22)
+
+
+async def check_switch(switch_ip: str) -> str:
+    # Баннер SSH отличает живой sshd коммутатора от открытого, но зависшего порта
+    return await _tcp_probe(switch_ip, 22, expect_banner=b"SSH-")
+
+
+async def check_wifi(interface: str) -> str:
+    if shutil.which("nmcli") is None:
+        raise FileNotFoundError("nmcli не найден")
+    if os.path.isdir("/sys/class/net") and not os.path.exists(f"/sys/class/net/{interface}"):
+        raise FileNotFoundError(f"интерфейс {interface} отсутствует")
+    return f"nmcli и {interface} доступны"
+
+
+async def check_postgres() -> str:
+    if db.pool is None:
+        raise ConnectionError("пул PostgreSQL не создан")
+    async with db.pool.acquire() as connection:
+        await connection.fetchval("SELECT 1")
+    return "SELECT 1"
+
+
+async def check_1c(url: str) -> str:
+    parsed = urlparse(url)
+    if parsed.hostname is None:
+        # open_connection(None, ...) подключился бы к localhost и "прошел" бы
+        raise ValueError(f"в адресе 1С нет хоста: {url!r}")
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    return await _tcp_probe(parsed.hostname, port)
+
+
+def required_resources(test_ids: Iterable[str]) -> set:
+    resources = set()
+    for test_id in test_ids:
+        resources |= get_suite_spec(test_id).resources
+    return resources
+
+
+def build_checks(
+    test_ids: Iterable[str], bench_variables: Dict[str, str], remote: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Проверки, нужные прогону: по ресурсам стенда наборов, плюс PostgreSQL
+    и 1С. Провал critical-проверки отменяет прогон, остальные - предупреждение.
+    Если наборы выполняет агент стенда, сеть стенда с хоста API не проверяется.
+    """
+    resources = required_resources(test_ids)
+    router_ip = bench_variables.get("ROUTER_IP") or DEFAULT_ROUTER_IP
+    switch_ip = bench_variables.get("SWITCH_IP") or DEFAULT_SWITCH_IP
+    interface = bench_variables.get("INTERFACE") or DEFAULT_WIFI_INTERFACE
+
+    def check(name: str, target: str, critical: bool, probe) -> Dict[str, Any]:
+        return {"name": name, "target": target, "critical": critical, "probe": probe}
+
+    checks = []
+    if resources & {ROUTER_SSH, SIM_MODEM}:
+        probe = None if remote else check_router(router_ip)
+        checks.append(check("router_ssh", f"{router_ip}:22", True, probe))
+    if CISCO_SWITCH in resources:
+        probe = None if remote else check_switch(switch_ip)
+        checks.append(check("switch_ssh", f"{switch_ip}:22", True, probe))
+    if WIFI_RADIO in resources:
+        probe = None if remote else check_wifi(interface)
+        checks.append(check("wifi_interface", interface, True, probe))
+    checks.append(check("postgres", "pool", False, check_postgres()))
+    # Недоступная 1С - предупреждение, а неверный адрес 1С - ошибка настройки:
+    # результаты прогона некуда будет отправить
+    url_1c = settings_1c.BASE_1C_URL
+    checks.append(check("1c", url_1c, urlparse(url_1c).hostname is None, check_1c(url_1c)))
+    return checks
+
+
+async def run_preflight(
+    test_ids: Iterable[str],
+    bench_variables: Optional[Dict[str, str]] = None,
+    remote: bool = False,
+    on_check: Optional[CheckHandler] = None,
+    budget: float = PREFLIGHT_BUDGET,
+) -> Dict[str, Any]:
+    """
+    Параллельно выполняет проверки в пределах бюджета. Первый провал
+    critical-проверки останавливает остальные. Результат каждой проверки
+    передается в on_check сразу по готовности. Возвращает отчет; ok=False,
+    если провалена хотя бы одна critical-проверка.
+    """
+    started = time.monotonic()
+    checks = build_checks(test_ids, bench_variables or {}, remote)
+    results: List[Dict[str, Any]] = []
+
+    async def finish(check: Dict[str, Any], status: str, detail: str):
+        result = {
+            "name": check["name"],
+            "target": check["target"],
+            "critical": check["critical"],
+            "status": status,
+            "detail": detail,
+            "duration_ms": round((time.monotonic() - started) * 1000, 1),
+        }
+        results.append(result)
+        if on_check is not None:
+            try:
+                await on_check(result)
+            except Exception as e:
+                logger.warning(f"Ошибка отправки результата проверки {check['name']}: {e}")
+
+    pending = {}
+    for check in checks:
+        if check["probe"] is None:
+            await finish(check, SKIPPED, "набор выполняется агентом стенда")
+        else:
+            pending[asyncio.ensure_future(check.pop("probe"))] = check
+
+    deadline = started + budget
+    failed_fast = False
+    try:
+        while pending and not failed_fast:
+            done, _ = await asyncio.wait(
+                pending.keys(),
+                timeout=max(deadline - time.monotonic(), 0),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                break
+            for task in done:
+                check = pending.pop(task)
+                error = task.exception()
+                if error is None:
+                    await finish(check, OK, task.result())
+                else:
+                    await finish(check, FAILED, str(error) or error.__class__.__name__)
+                    failed_fast = failed_fast or check["critical"]
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending.keys(), return_exceptions=True)
+
+    for task, check in pending.items():
+        if failed_fast:
+            await finish(check, CANCELLED, "остановлена после провала другой проверки")
+        else:
+            await finish(check, TIMEOUT, f"не завершилась за {budget}с")
+
+    ok = not any(r["critical"] and r["status"] not in (OK, SKIPPED) for r in results)
+    report = {
+        "ok": ok,
+        "duration_ms": round((time.monotonic() - started) * 1000, 1),
+        "budget": budget,
+        "checks": results,
+    }
+    logger.info(f"Проверка стенда за {report['duration_ms']}мс: {'готов' if ok else 'не готов'}")
+    return report
+
+
+def failed_checks(report: Dict[str, Any]) -> List[str]:
+    """Имена проваленных critical-проверок"""
+    return [
+        c["name"] for c in report["checks"] if c["critical"] and c["status"] not in (OK, SKIPPED)
+    ]
@@ -0,0 +1,88 @@
+import hashlib
+import logging
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from api_service.db.postgres_db import db
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Сколько секунд успешный результат считается действительным; 0 - кэш выключен
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "28800"))
+
+# Файлы, от которых зависит набор: Resource/Variables и библиотеки-файлы
+_SETTING_PATTERN = re.compile(
+    r"^(?:Resource|Variables|Library)\s{2,}(\S+\.(?:robot|resource|py|json|yaml|yml))",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+# Путь набора -> (сигнатура mtime файлов, хэш)
+_hash_cache: Dict[str, Tuple[Tuple, str]] = {}
+
+
+def _suite_files(robot_file: str) -> List[str]:
+    """Набор и локальные файлы, которые он подключает (без рекурсии в ресурсы)"""
+    files = [robot_file]
+    base = os.path.dirname(robot_file)
+    try:
+        with open(robot_file, encoding="utf-8", errors="replace") as f:
+            text = f.read()
+    except OSError:
+        return files
+    for match in _SETTING_PATTERN.finditer(text):
+        path = os.path.join(base, match.group(1).replace("${CURDIR}", base))
+        if os.path.isfile(path):
+            files.append(os.path.abspath(path))
+    return files
+
+
+def suite_hash(robot_file: str) -> Optional[str]:
+    """
+    SHA-256 набора и подключаемых им файлов. Пересчитывается только при
+    изменении mtime/размера какого-либо из них.
+    """
+    robot_file = os.path.abspath(robot_file)
+    files = _suite_files(robot_file)
+    try:
+        signature = tuple((path, os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in files)
+    except OSError:
+        return None
+    cached = _hash_cache.get(robot_file)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    digest = hashlib.sha256()
+    for path in files:
+        digest.update(os.path.basename(path).encode("utf-8"))
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    value = digest.hexdigest()
+    _hash_cache[robot_file] = (signature, value)
+    return value
+
+
+async def find_cached_result(
+    test_id: str,
+    serial_number: str,
+    mac_address: str,
+    firmware_build: Optional[str],
+    suite_version: Optional[str],
+) -> Optional[Dict]:
+    """
+    Успешный результат того же набора на том же устройстве и прошивке
+    не старше RESULT_CACHE_TTL. Без известной прошивки кэш не используется:
+    перепрошитое устройство нельзя отличить от прежнего.
+    """
+    if RESULT_CACHE_TTL <= 0 or db.pool is None:
+        return None
+    if not (serial_number and mac_address and firmware_build and suite_version):
+        return None
+    try:
+        return await db.find_cached_test_execution(
+            test_id, serial_number, mac_address, firmware_build, suite_version, RESULT_CACHE_TTL
+        )
+    except Exception as e:
+        logger.error(f"Ошибка поиска результата {test_id} в кэше: {e}")
+        return None
@@ -0,0 +1,111 @@
+import codecs
+import logging
+import os
+import time
+from typing import Any, Dict, Tuple
+
+import orjson
+
+from api_service.domain.services.robot_output import parse_output_xml
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# BOM -> кодировка; UTF-32 проверяется раньше UTF-16, у них общий префикс
+_BOMS = [
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+]
+
+# Кодировка наборов, которые пишут JSON из консоли Windows не в UTF-8
+LEGACY_ENCODING = "cp1251"
+
+
+class LoadedResult:
+    """Содержимое файла результатов и стоимость его загрузки"""
+
+    def __init__(self, path: str, data: Any, encoding: str, size: int, parse_ms: float):
+        self.path = path
+        self.data = data
+        self.encoding = encoding
+        self.size = size
+        self.parse_ms = parse_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "file": os.path.basename(self.path),
+            "encoding": self.encoding,
+            "bytes": self.size,
+            "parse_ms": self.parse_ms,
+        }
+
+
+def detect_encoding(raw: bytes) -> Tuple[str, int]:
+    """Кодировка по BOM; без BOM - UTF-8. Возвращает (кодировка, длина BOM)"""
+    for bom, encoding in _BOMS:
+        if raw.startswith(bom):
+            return encoding, len(bom)
+    return "utf-8", 0
+
+
+def parse_json_bytes(raw: bytes) -> Tuple[Any, str]:
+    """
+    Разбирает JSON из уже прочитанных байт без повторного чтения файла.
+
+    Возвращает (данные, кодировка). UTF-8 разбирается orjson напрямую;
+    прочие кодировки перекодируются в UTF-8 в памяти один раз.
+    """
+    encoding, bom_length = detect_encoding(raw)
+    body = raw[bom_length:]
+    if encoding != "utf-8":
+        return orjson.loads(body.decode(encoding, errors="replace").encode("utf-8")), encoding
+
+    try:
+        return orjson.loads(body), encoding
+    except orjson.JSONDecodeError:
+        try:
+            body.decode("utf-8")
+        except UnicodeDecodeError:
+            pass
+        else:
+            # Корректный UTF-8, но некорректный JSON - перекодирование не поможет
+            raise
+
+    # Почти весь UTF-8 корректен - заменяем отдельные битые байты,
+    # иначе это файл из консоли Windows в cp1251
+    text = body.decode("utf-8", errors="replace")
+    non_ascii = sum(1 for byte in body if byte >= 0x80)
+    if text.count("\ufffd") * 4 < non_ascii:
+        return orjson.loads(text.encode("utf-8")), "utf-8 (replace)"
+    return orjson.loads(body.decode(LEGACY_ENCODING, errors="replace").encode("utf-8")), LEGACY_ENCODING
+
+
+def load_result_file(path: str) -> LoadedResult:
+    """
+    Загружает файл результатов набора за одно чтение: JSON через orjson,
+    output.xml потоковым парсером. Время разбора пишется в лог.
+    """
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Файл {path} не существует")
+
+    started = time.perf_counter()
+    if path.lower().endswith(".xml"):
+        size = os.path.getsize(path)
+        data = parse_output_xml(path)
+        encoding = "utf-8"
+    else:
+        with open(path, "rb") as f:
+            raw = f.read()
+        size = len(raw)
+        try:
+            data, encoding = parse_json_bytes(raw)
+        except orjson.JSONDecodeError as e:
+            raise ValueError(f"Не удалось загрузить JSON файл {path}: {e}")
+    parse_ms = round((time.perf_counter() - started) * 1000, 3)
+
+    logger.info(f"Загружен {path}: {size} байт, {encoding}, {parse_ms} мс")
+    return LoadedResult(path, data, encoding, size, parse_ms)
+
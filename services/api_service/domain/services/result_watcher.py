@@ -0,0 +1,48 @@
+import asyncio
+import logging
+import os
+
+from watchfiles import awatch
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Сколько ждать файл результатов после завершения процесса robot.
+# Файл пишется самим набором до выхода, поэтому ожидание обычно нулевое.
+RESULT_FILE_TIMEOUT = float(os.getenv("RESULT_FILE_TIMEOUT", "5"))
+
+
+async def wait_for_file(path: str, timeout: float = RESULT_FILE_TIMEOUT) -> bool:
+    """
+    Ждет появления файла по событиям файловой системы (inotify/FSEvents/ReadDirectoryChangesW)
+    вместо опроса раз в секунду. Возвращает True, если файл существует.
+    """
+    if os.path.isfile(path):
+        return True
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    stop_event = asyncio.Event()
+
+    async def watch() -> bool:
+        # yield_on_timeout закрывает гонку, если файл появился до старта наблюдателя
+        async for _ in awatch(
+            directory,
+            stop_event=stop_event,
+            debounce=50,
+            step=10,
+            rust_timeout=500,
+            yield_on_timeout=True,
+            recursive=False,
+        ):
+            if os.path.isfile(path):
+                return True
+        return os.path.isfile(path)
+
+    try:
+        return await asyncio.wait_for(watch(), timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Файл результатов {path} не появился за {timeout}с")
+        return os.path.isfile(path)
+    finally:
+        stop_event.set()
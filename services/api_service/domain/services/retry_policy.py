@@ -0,0 +1,325 @@
+import logging
+import os
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Классы отказов запуска robot
+SSH_CONNECT = "ssh_connect"  # не удалось подключиться/авторизоваться по SSH
+SWITCH_DOWN = "switch_down"  # недоступен сам коммутатор Cisco
+TIMEOUT = "timeout"  # таймаут команды, ожидания вывода или теста
+ASSERTION = "assertion"  # проверка набора не прошла - устройство действительно не в норме
+CONFIGURATION = "configuration"  # ошибка данных/опций robot, повтор не поможет
+UNKNOWN = "unknown"
+
+# Действия восстановления между попытками
+RECOVERY_PORTS = "ports"  # прогон ports.robot (перевключение портов коммутатора)
+
+# Общий бюджет времени на набор и на все наборы устройства, секунды
+SUITE_TIME_BUDGET = float(os.getenv("SUITE_TIME_BUDGET", "900"))
+DEVICE_TIME_BUDGET = float(os.getenv("DEVICE_TIME_BUDGET", "2700"))
+
+# Верхняя граница попыток независимо от класса отказа
+MAX_ATTEMPTS = int(os.getenv("ROBOT_MAX_ATTEMPTS", "10"))
+
+# Ключевые слова наборов, которые работают с коммутатором
+SWITCH_KEYWORD_PATTERN = re.compile(r"switch|коммутатор|cisco", re.IGNORECASE)
+
+SSH_CONNECT_PATTERN = re.compile(
+    r"connection refused|unable to connect|no route to host|network is unreachable"
+    r"|authentication failed|authentication \(password\) failed|no open connection"
+    r"|error reading ssh protocol banner|novalidconnectionserror|connection reset"
+    r"|ssh подключение не удалось|проблема с аутентификацией|timed out connecting",
+    re.IGNORECASE,
+)
+
+TIMEOUT_PATTERN = re.compile(
+    r"timeout|timed out|таймаут|no match found for .* in", re.IGNORECASE
+)
+
+# Коды возврата robot, при которых набор не выполнялся
+ROBOT_CONFIGURATION_CODES = {252}
+
+# Код возврата набора, убитого по истечении бюджета времени (как у timeout(1))
+TIMEOUT_RETURN_CODE = 124
+
+
+class RetryRule:
+    """Правило повторов для класса отказа"""
+
+    def __init__(
+        self,
+        max_attempts: int,
+        backoff: float = 0.0,
+        backoff_factor: float = 2.0,
+        max_backoff: float = 60.0,
+        recovery: Optional[str] = None,
+    ):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.recovery = recovery
+
+    def delay(self, attempt: int) -> float:
+        """Пауза перед повтором номер attempt (1 - первый повтор)"""
+        return min(self.backoff * self.backoff_factor ** (attempt - 1), self.max_backoff)
+
+
+# Повторы по классам отказов. Проваленная проверка повторяется один раз без
+# восстановления портов - перевключение портов не исправит устройство.
+RETRY_RULES: Dict[str, RetryRule] = {
+    SSH_CONNECT: RetryRule(max_attempts=4, backoff=5, max_backoff=30, recovery=RECOVERY_PORTS),
+    TIMEOUT: RetryRule(max_attempts=2, backoff=5, recovery=RECOVERY_PORTS),
+    ASSERTION: RetryRule(max_attempts=2, backoff=2),
+    SWITCH_DOWN: RetryRule(max_attempts=1),
+    CONFIGURATION: RetryRule(max_attempts=1),
+    UNKNOWN: RetryRule(max_attempts=3, backoff=5, recovery=RECOVERY_PORTS),
+}
+
+
+class RobotTestError(Exception):
+    """Набор не прошел после всех разрешенных политикой попыток"""
+
+    def __init__(self, message: str, failure_class: str, history: List[Dict[str, Any]]):
+        super().__init__(message)
+        self.failure_class = failure_class
+        self.history = history
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"failure": self.failure_class, "attempts": self.history}
+
+
+class SwitchUnavailableError(RobotTestError):
+    """Цепь коммутатора разомкнута - наборы с коммутатором не запускаются"""
+
+
+class TimeBudget:
+    """Бюджет времени, отсчитывается с момента создания"""
+
+    def __init__(self, total: float):
+        self.total = total
+        self.started_at = time.monotonic()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def remaining(self) -> float:
+        return max(self.total - self.elapsed(), 0.0)
+
+    def exhausted(self) -> bool:
+        return self.remaining() <= 0
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для общего оборудования стенда.
+
+    После failure_threshold отказов подряд цепь размыкается, и запуски
+    сразу отклоняются. Через reset_timeout пропускается одна пробная
+    попытка: успех замыкает цепь, отказ снова размыкает. Пробная попытка,
+    по которой за trial_timeout не пришло ни успеха, ни отказа, считается
+    потерянной, и пропускается следующая.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 2,
+        reset_timeout: float = 120.0,
+        trial_timeout: float = SUITE_TIME_BUDGET,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.trial_timeout = trial_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_progress = False
+        self._trial_started_at = 0.0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state != self.HALF_OPEN:
+            return False
+        now = time.monotonic()
+        if self._trial_in_progress and now - self._trial_started_at < self.trial_timeout:
+            return False
+        if self._trial_in_progress:
+            logger.warning(f"Пробная попытка цепи {self.name} не завершилась, пропускается новая")
+        self._trial_in_progress = True
+        self._trial_started_at = now
+        return True
+
+    def abort_trial(self):
+        """
+        Попытка прервана (отмена, исключение) до record_success/record_failure:
+        незавершенная пробная попытка засчитывается как отказ, иначе цепь
+        осталась бы занятой. Вне пробной попытки ничего не меняет.
+        """
+        if self._trial_in_progress:
+            self.record_failure()
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info(f"Цепь {self.name} замкнута")
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_progress = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_progress = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            logger.warning(f"Цепь {self.name} разомкнута после {self.failures} отказов")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"name": self.name, "state": self.state, "failures": self.failures}
+
+
+# Коммутатор один на стенд, поэтому предохранитель общий для всех сессий
+switch_breaker = CircuitBreaker(
+    "cisco_switch",
+    failure_threshold=int(os.getenv("SWITCH_BREAKER_THRESHOLD", "2")),
+    reset_timeout=float(os.getenv("SWITCH_BREAKER_RESET", "120")),
+)
+
+
+class FailureCollector:
+    """
+    Обработчик событий listener, который запоминает упавшие тесты и
+    ключевые слова текущей попытки и передает события дальше.
+    """
+
+    def __init__(self, forward: Optional[Callable[[dict], Awaitable[None]]] = None):
+        self.forward = forward
+        self.failures: List[Dict[str, str]] = []
+
+    def reset(self):
+        self.failures = []
+
+    async def __call__(self, event: dict):
+        if event.get("event") in ("end_test", "end_keyword", "end_suite") and event.get(
+            "status"
+        ) == "FAIL":
+            self.failures.append(
+                {
+                    "kind": event["event"],
+                    "name": event.get("name") or "",
+                    "message": event.get("message") or "",
+                }
+            )
+        if self.forward is not None:
+            await self.forward(event)
+
+
+def classify_failure(
+    return_code: int,
+    failures: List[Dict[str, str]],
+    stderr: str = "",
+    switch_only: bool = False,
+) -> str:
+    """
+    Определяет класс отказа по упавшим ключевым словам/тестам и stderr robot.
+
+    switch_only - набор работает только с коммутатором (ports.robot),
+    поэтому любой отказ подключения означает недоступный коммутатор.
+    """
+    if return_code in ROBOT_CONFIGURATION_CODES:
+        return CONFIGURATION
+    if return_code == TIMEOUT_RETURN_CODE:
+        return TIMEOUT
+
+    # Причина отказа - сообщение упавшего теста; отказы ключевых слов внутри
+    # TRY/Run Keyword And Return Status перехвачены и причиной не являются
+    tests = [f for f in failures if f["kind"] == "end_test"]
+    primary = tests or [f for f in failures if f["kind"] == "end_suite"] or failures
+
+    for failure in primary:
+        text = failure["message"]
+        if not SSH_CONNECT_PATTERN.search(text):
+            continue
+        # Ключевые слова, через которые это сообщение поднялось до теста
+        failed_keywords = [
+            f["name"] for f in failures if f["kind"] == "end_keyword" and f["message"] == text
+        ]
+        if switch_only or any(SWITCH_KEYWORD_PATTERN.search(name) for name in failed_keywords):
+            return SWITCH_DOWN
+        return SSH_CONNECT
+    if stderr and SSH_CONNECT_PATTERN.search(stderr):
+        return SWITCH_DOWN if switch_only else SSH_CONNECT
+
+    messages = [failure["message"] for failure in primary] + [stderr or ""]
+    if any(TIMEOUT_PATTERN.search(text) for text in messages):
+        return TIMEOUT
+    if tests:
+        return ASSERTION
+    return UNKNOWN
+
+
+class RetryDecision:
+    def __init__(self, retry: bool, delay: float = 0.0, recovery: Optional[str] = None, reason: str = ""):
+        self.retry = retry
+        self.delay = delay
+        self.recovery = recovery
+        self.reason = reason
+
+
+class RetryPolicy:
+    """Решает, повторять ли набор после отказа, с какой паузой и восстановлением"""
+
+    def __init__(
+        self,
+        suite_budget: Optional[TimeBudget] = None,
+        device_budget: Optional[TimeBudget] = None,
+        rules: Optional[Dict[str, RetryRule]] = None,
+        max_attempts: int = MAX_ATTEMPTS,
+    ):
+        self.suite_budget = suite_budget or TimeBudget(SUITE_TIME_BUDGET)
+        self.device_budget = device_budget
+        self.rules = rules or RETRY_RULES
+        self.max_attempts = max_attempts
+        self.attempts = 0
+        self.class_attempts: Dict[str, int] = {}
+
+    def remaining(self) -> float:
+        """Сколько времени осталось на набор с учетом бюджета устройства"""
+        budgets = [b for b in (self.suite_budget, self.device_budget) if b is not None]
+        return min(budget.remaining() for budget in budgets)
+
+    def next_retry(self, failure_class: str) -> RetryDecision:
+        self.attempts += 1
+        self.class_attempts[failure_class] = self.class_attempts.get(failure_class, 0) + 1
+        rule = self.rules.get(failure_class, self.rules[UNKNOWN])
+        class_attempts = self.class_attempts[failure_class]
+
+        if class_attempts >= rule.max_attempts:
+            return RetryDecision(False, reason=f"исчерпаны попытки для {failure_class}")
+        if self.attempts >= self.max_attempts:
+            return RetryDecision(False, reason="исчерпан общий лимит попыток")
+
+        delay = rule.delay(class_attempts)
+        # Повтор не начинается, если на него не остается времени
+        for name, budget in (("набора", self.suite_budget), ("устройства", self.device_budget)):
+            if budget is not None and budget.remaining() <= delay:
+                return RetryDecision(False, reason=f"исчерпан бюджет времени {name}")
+        return RetryDecision(True, delay=delay, recovery=rule.recovery)
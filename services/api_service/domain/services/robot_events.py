@@ -0,0 +1,134 @@
+import asyncio
+import json
+import logging
+import os
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Каталог с robot_listener.py, передается в robot через --pythonpath
+LISTENER_DIR = os.path.dirname(os.path.abspath(__file__))
+LISTENER_CLASS = "robot_listener.RobotProgressListener"
+
+EventHandler = Callable[[dict], Awaitable[None]]
+
+
+class RobotEventServer:
+    """
+    Локальный TCP сервер, на который listener каждого запуска robot
+    отправляет события (по строке JSON на событие). События маршрутизируются
+    обработчикам по токену запуска.
+    """
+
+    def __init__(self, host: str = "127.0.0.1"):
+        self.host = host
+        self.port: Optional[int] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._handlers: Dict[str, EventHandler] = {}
+        # Состояние соединения listener по токену: set() после события close
+        self._closed: Dict[str, asyncio.Event] = {}
+        self._start_lock = asyncio.Lock()
+
+    async def start(self):
+        async with self._start_lock:
+            if self._server is not None:
+                return
+            self._server = await asyncio.start_server(self._handle_connection, self.host, 0)
+            self.port = self._server.sockets[0].getsockname()[1]
+            logger.info(f"Сервер событий Robot Framework слушает {self.host}:{self.port}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+            self.port = None
+
+    async def register(self, handler: EventHandler) -> str:
+        """Регистрирует обработчик и возвращает токен запуска"""
+        await self.start()
+        token = uuid.uuid4().hex
+        self._handlers[token] = handler
+        return token
+
+    async def unregister(self, token: str, drain_timeout: float = 2.0):
+        """
+        Снимает обработчик. Если listener подключался, сначала ждем его
+        события close, чтобы не потерять последние события из сокета.
+        """
+        # Событие удаляется только после ожидания: соединение, закрытое
+        # без close (robot убит), отмечает его в _handle_connection
+        closed = self._closed.get(token)
+        if closed is not None:
+            try:
+                await asyncio.wait_for(closed.wait(), drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Listener {token} не прислал close за {drain_timeout}с")
+        self._closed.pop(token, None)
+        self._handlers.pop(token, None)
+
+    async def dispatch(self, token: str, event: dict):
+        """Передает обработчику запуска событие, пришедшее не через сокет (от агента стенда)"""
+        handler = self._handlers.get(token)
+        if handler is None:
+            return
+        try:
+            await handler(event)
+        except Exception as e:
+            logger.error(f"Ошибка обработки события Robot Framework: {e}")
+
+    def listener_spec(self, token: str, max_keyword_depth: int = 2) -> str:
+        """Значение опции listener для robot.run/командной строки"""
+        return f"{LISTENER_CLASS}:{self.host}:{self.port}:{token}:{max_keyword_depth}"
+
+    def robot_args(self, token: str, max_keyword_depth: int = 2) -> List[str]:
+        """Аргументы командной строки robot для подключения listener"""
+        return [
+            "--pythonpath",
+            LISTENER_DIR,
+            "--listener",
+            self.listener_spec(token, max_keyword_depth),
+        ]
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        seen_tokens = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Некорректное событие от listener: {line[:200]!r}")
+                    continue
+                token = event.pop("token", None)
+                handler = self._handlers.get(token)
+                if handler is None:
+                    continue
+                if event.get("event") == "open":
+                    seen_tokens.add(token)
+                    self._closed.setdefault(token, asyncio.Event()).clear()
+                    continue
+                if event.get("event") == "close":
+                    if token in self._closed:
+                        self._closed[token].set()
+                    continue
+                try:
+                    await handler(event)
+                except Exception as e:
+                    logger.error(f"Ошибка обработки события Robot Framework: {e}")
+        finally:
+            # Процесс robot мог умереть без close - не заставляем ждать drain
+            for token in seen_tokens:
+                if token in self._closed:
+                    self._closed[token].set()
+            writer.close()
+
+
+# Глобальный сервер событий
+robot_event_server = RobotEventServer()
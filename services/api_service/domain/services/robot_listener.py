@@ -0,0 +1,132 @@
+"""
+Listener Robot Framework (API v3), который стримит события выполнения в сервис.
+
+Загружается в процесс robot через
+--pythonpath <этот каталог> --listener robot_listener.RobotProgressListener:<host>:<port>:<token>:<max_keyword_depth>
+и не должен импортировать модули api_service.
+"""
+
+import json
+import socket
+
+# Префикс лог-сообщений, которые наборы используют для промежуточного прогресса
+PROGRESS_PREFIX = "PROGRESS "
+
+
+def _seconds(value):
+    return round(value.total_seconds(), 3) if value is not None else None
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+class RobotProgressListener:
+    ROBOT_LISTENER_API_VERSION = 3
+
+    def __init__(self, host, port, token, max_keyword_depth=2):
+        self.token = token
+        self.max_keyword_depth = int(max_keyword_depth)
+        self._keyword_depth = 0
+        self._socket = None
+        try:
+            self._socket = socket.create_connection((host, int(port)), timeout=5)
+        except OSError:
+            # Без сервиса набор должен выполняться как обычно
+            self._socket = None
+        self._send("open")
+
+    def _send(self, event, **fields):
+        if self._socket is None:
+            return
+        message = {"token": self.token, "event": event, **fields}
+        try:
+            self._socket.sendall(
+                (json.dumps(message, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+            )
+        except OSError:
+            self._socket = None
+
+    def start_suite(self, data, result):
+        self._send(
+            "start_suite",
+            name=data.name,
+            longname=result.full_name,
+            tests=data.test_count,
+            start=_iso(result.start_time),
+        )
+
+    def end_suite(self, data, result):
+        stats = result.statistics
+        self._send(
+            "end_suite",
+            name=data.name,
+            longname=result.full_name,
+            status=result.status,
+            message=result.message,
+            elapsed=_seconds(result.elapsed_time),
+            passed=stats.passed,
+            failed=stats.failed,
+            skipped=stats.skipped,
+            total=stats.total,
+        )
+
+    def start_test(self, data, result):
+        self._send(
+            "start_test",
+            name=data.name,
+            longname=result.full_name,
+            start=_iso(result.start_time),
+        )
+
+    def end_test(self, data, result):
+        self._send(
+            "end_test",
+            name=data.name,
+            longname=result.full_name,
+            status=result.status,
+            message=result.message,
+            elapsed=_seconds(result.elapsed_time),
+        )
+
+    def start_keyword(self, data, result):
+        self._keyword_depth += 1
+        if self._keyword_depth <= self.max_keyword_depth:
+            self._send(
+                "start_keyword",
+                name=result.full_name,
+                args=[str(arg) for arg in result.args],
+                depth=self._keyword_depth,
+                start=_iso(result.start_time),
+            )
+
+    def end_keyword(self, data, result):
+        if self._keyword_depth <= self.max_keyword_depth:
+            self._send(
+                "end_keyword",
+                name=result.full_name,
+                status=result.status,
+                message=result.message,
+                depth=self._keyword_depth,
+                elapsed=_seconds(result.elapsed_time),
+            )
+        self._keyword_depth -= 1
+
+    def log_message(self, message):
+        text = message.message or ""
+        if not text.startswith(PROGRESS_PREFIX):
+            return
+        try:
+            progress = json.loads(text[len(PROGRESS_PREFIX):])
+        except ValueError:
+            return
+        self._send("progress", data=progress)
+
+    def close(self):
+        self._send("close")
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            except OSError:
+                pass
+            self._socket = None
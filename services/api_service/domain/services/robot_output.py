@@ -0,0 +1,168 @@
+import codecs
+import datetime
+import logging
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Размер блока чтения output.xml
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class _Utf8Reader:
+    """
+    Читает файл блоками и заменяет некорректные UTF-8 последовательности,
+    чтобы один битый байт в логе SSH не ломал разбор всего файла.
+    """
+
+    def __init__(self, file):
+        self._file = file
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._started = False
+
+    def read(self, size=READ_CHUNK_SIZE):
+        data = self._file.read(size)
+        text = self._decoder.decode(data, final=not data)
+        if not self._started and text:
+            self._started = True
+            text = text.lstrip("\ufeff")
+        return text.encode("utf-8")
+
+
+def _parse_rf6_time(value: str) -> Optional[datetime.datetime]:
+    try:
+        return datetime.datetime.strptime(value, "%Y%m%d %H:%M:%S.%f")
+    except (TypeError, ValueError):
+        return None
+
+
+def _elapsed(status: Optional[ET.Element]) -> float:
+    """Длительность из status: elapsed (RF 7) или starttime/endtime (RF 6)"""
+    if status is None:
+        return 0.0
+    if status.get("elapsed") is not None:
+        try:
+            return float(status.get("elapsed"))
+        except ValueError:
+            return 0.0
+    start = _parse_rf6_time(status.get("starttime"))
+    end = _parse_rf6_time(status.get("endtime"))
+    if start and end:
+        return (end - start).total_seconds()
+    return 0.0
+
+
+def _status_of(elem: ET.Element) -> Optional[ET.Element]:
+    for child in elem:
+        if child.tag == "status":
+            return child
+    return None
+
+
+def _not_run(elem: ET.Element) -> bool:
+    """Ключевое слово из невыполненной ветки IF/TRY"""
+    status = _status_of(elem)
+    return status is not None and status.get("status") == "NOT RUN"
+
+
+def parse_output_xml(path: str) -> Dict[str, Any]:
+    """
+    Один потоковый проход по output.xml Robot Framework.
+
+    Возвращает статистику, статусы тестов и суммарные тайминги ключевых
+    слов. Обработанные элементы удаляются из дерева сразу после закрытия,
+    поэтому память не растет с размером логов. Обрезанный файл (robot
+    упал во время записи) разбирается до места обрыва, incomplete=True.
+    """
+    tests = []
+    keywords: Dict[str, Dict[str, Any]] = {}
+    totals: Optional[Dict[str, int]] = None
+    incomplete = False
+
+    stack = []
+    in_statistics = False
+    in_total = False
+
+    with open(path, "rb") as f:
+        try:
+            for event, elem in ET.iterparse(_Utf8Reader(f), events=("start", "end")):
+                tag = elem.tag
+                if event == "start":
+                    stack.append(elem)
+                    if tag == "statistics":
+                        in_statistics = True
+                    elif tag == "total" and in_statistics:
+                        in_total = True
+                    continue
+
+                stack.pop()
+                parent = stack[-1] if stack else None
+
+                if tag == "kw" and not _not_run(elem):
+                    status = _status_of(elem)
+                    name = elem.get("name") or ""
+                    if elem.get("owner"):
+                        name = f"{elem.get('owner')}.{name}"
+                    elapsed = _elapsed(status)
+                    stats = keywords.setdefault(
+                        name, {"count": 0, "failed": 0, "elapsed": 0.0, "max": 0.0}
+                    )
+                    stats["count"] += 1
+                    stats["elapsed"] += elapsed
+                    stats["max"] = max(stats["max"], elapsed)
+                    if status is not None and status.get("status") == "FAIL":
+                        stats["failed"] += 1
+                elif tag == "test":
+                    status = _status_of(elem)
+                    tests.append(
+                        {
+                            "name": elem.get("name"),
+                            "status": status.get("status") if status is not None else None,
+                            "message": (status.text or "") if status is not None else "",
+                            "elapsed": round(_elapsed(status), 3),
+                        }
+                    )
+                elif tag == "stat" and in_total and totals is None:
+                    totals = {
+                        "pass": int(elem.get("pass", 0)),
+                        "fail": int(elem.get("fail", 0)),
+                        "skip": int(elem.get("skip", 0)),
+                    }
+                elif tag == "total":
+                    in_total = False
+                elif tag == "statistics":
+                    in_statistics = False
+
+                # status нужен родителю до его закрытия, остальное уже учтено
+                if tag != "status" and parent is not None:
+                    parent.remove(elem)
+        except ET.ParseError as e:
+            incomplete = True
+            logger.warning(f"output.xml {path} разобран частично: {e}")
+
+    if totals is None:
+        # Статистики нет (файл обрезан) - считаем по разобранным тестам
+        totals = {
+            "pass": sum(1 for t in tests if t["status"] == "PASS"),
+            "fail": sum(1 for t in tests if t["status"] == "FAIL"),
+            "skip": sum(1 for t in tests if t["status"] == "SKIP"),
+        }
+
+    total = totals["pass"] + totals["fail"] + totals["skip"]
+    for stats in keywords.values():
+        stats["elapsed"] = round(stats["elapsed"], 3)
+        stats["max"] = round(stats["max"], 3)
+
+    return {
+        "passed_tests": totals["pass"],
+        "failed_tests": totals["fail"],
+        "skipped_tests": totals["skip"],
+        "total_tests": total,
+        "progress": int((totals["pass"] / total) * 100) if total > 0 else 0,
+        "test_status": "COMPLETED" if totals["fail"] == 0 and not incomplete else "FAILED",
+        "tests": tests,
+        "keywords": keywords,
+        "incomplete": incomplete,
+    }
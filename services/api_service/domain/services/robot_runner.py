@@ -0,0 +1,72 @@
+import asyncio
+import subprocess
+import sys
+
+from api_service.domain.services.robot_events import LISTENER_DIR, robot_event_server
+from api_service.domain.services.robot_worker_pool import kill_process_tree, robot_worker_pool
+
+
+# robot запускается лидером своей группы процессов, чтобы при отмене
+# убить его вместе с дочерними процессами (ping, nmcli, ssh)
+if sys.platform == "win32":
+    PROCESS_GROUP_KWARGS = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+else:
+    PROCESS_GROUP_KWARGS = {"start_new_session": True}
+
+
+async def execute_robot_local(
+    robot_file, output_dir, variables=None, listener_token=None, timeout=None
+):
+    """
+    Запускает один набор robot на этом хосте и возвращает (return_code, stderr).
+
+    При включенном пуле набор выполняется в прогретом воркере,
+    иначе - отдельным процессом robot. По истечении timeout или при
+    отмене задачи robot убивается вместе с группой своих процессов
+    (asyncio.TimeoutError / asyncio.CancelledError).
+    """
+    variables = variables or {}
+    if robot_worker_pool.enabled:
+        listener = None
+        pythonpath = []
+        if listener_token is not None:
+            listener = robot_event_server.listener_spec(listener_token)
+            pythonpath = [LISTENER_DIR]
+        result = await robot_worker_pool.run(
+            robot_file,
+            output_dir,
+            variables=variables,
+            listener=listener,
+            pythonpath=pythonpath,
+            timeout=timeout,
+        )
+        print(f"robot worker: {robot_file} за {result.get('duration')}с")
+        return result["return_code"], result.get("stderr", "")
+
+    # Переменные стенда/сессии передаются в robot через --variable
+    variable_args = []
+    for name, value in variables.items():
+        variable_args.extend(["--variable", f"{name}:{value}"])
+    listener_args = []
+    if listener_token is not None:
+        listener_args = robot_event_server.robot_args(listener_token)
+
+    process = await asyncio.create_subprocess_exec(
+        "robot",
+        "--outputdir",
+        output_dir,
+        *variable_args,
+        *listener_args,
+        robot_file,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        **PROCESS_GROUP_KWARGS,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        print(f"Прерывание robot {robot_file} (pid {process.pid})")
+        await asyncio.get_running_loop().run_in_executor(None, kill_process_tree, process.pid)
+        await process.wait()
+        raise
+    return process.returncode, stderr.decode("utf-8", errors="replace") if stderr else ""
@@ -0,0 +1,109 @@
+# Процесс воркера пула Robot Framework (robot_worker_pool).
+# Запускается как отдельный скрипт, а не через multiprocessing spawn: spawn
+# заново импортирует __main__ родителя (run_fastapi.py -> app.main), и каждый
+# воркер поднимал бы приложение API. Здесь импортируются только stdlib и robot.
+import io
+import os
+import sys
+import time
+from multiprocessing.connection import Listener
+from typing import Any, Dict
+
+# Каталог скрипта не должен попадать в sys.path: модули domain/services
+# (test_service, preflight, ...) перекрыли бы одноименные модули библиотек
+if sys.path and sys.path[0] == os.path.dirname(os.path.abspath(__file__)):
+    del sys.path[0]
+
+# Библиотеки, которые импортируются в воркере заранее
+PRELOAD_MODULES = [
+    "robot",
+    "robot.api",
+    "robot.libraries.BuiltIn",
+    "robot.libraries.Collections",
+    "robot.libraries.DateTime",
+    "robot.libraries.OperatingSystem",
+    "robot.libraries.Process",
+    "robot.libraries.String",
+    "SSHLibrary",
+    "JSONLibrary",
+]
+
+
+def _preload():
+    import importlib
+
+    for module_name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(module_name)
+        except ImportError as e:
+            print(f"[robot worker {os.getpid()}] не удалось импортировать {module_name}: {e}")
+
+
+def _run_suite(request: Dict[str, Any]) -> Dict[str, Any]:
+    import robot
+
+    started = time.monotonic()
+    stdout, stderr = io.StringIO(), io.StringIO()
+    options = {
+        "outputdir": request["output_dir"],
+        "variable": [f"{name}:{value}" for name, value in request.get("variables", {}).items()],
+        "stdout": stdout,
+        "stderr": stderr,
+    }
+    if request.get("pythonpath"):
+        options["pythonpath"] = request["pythonpath"]
+    if request.get("listener"):
+        options["listener"] = request["listener"]
+    for option in ("output", "log", "report"):
+        if request.get(option):
+            options[option] = request[option]
+
+    return_code = robot.run(request["robot_file"], **options)
+
+    return {
+        "return_code": return_code,
+        "output": os.path.join(request["output_dir"], request.get("output") or "output.xml"),
+        "log": os.path.join(request["output_dir"], request.get("log") or "log.html"),
+        "report": os.path.join(request["output_dir"], request.get("report") or "report.html"),
+        "stdout": stdout.getvalue(),
+        "stderr": stderr.getvalue(),
+        "duration": round(time.monotonic() - started, 3),
+    }
+
+
+def _worker_main(conn):
+    """Цикл воркера: импорты один раз, затем наборы по запросу"""
+    _preload()
+    conn.send({"ready": True, "pid": os.getpid()})
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if request is None:
+            break
+        try:
+            response = _run_suite(request)
+        except Exception as e:
+            response = {"return_code": 255, "stderr": f"{e.__class__.__name__}: {e}"}
+        conn.send(response)
+
+
+def main():
+    if hasattr(os, "setsid"):
+        # Своя группа процессов, чтобы воркер можно было убить вместе с детьми
+        os.setsid()
+    # Ключ соединения приходит через stdin, чтобы не светиться в списке процессов
+    authkey = bytes.fromhex(sys.stdin.readline().strip())
+    with Listener(authkey=authkey) as listener:
+        # Адрес - единственная строка в stdout; дальше stdout идет в stderr,
+        # чтобы вывод библиотек не заполнил канал, который родитель не читает
+        print(listener.address, flush=True)
+        os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+        conn = listener.accept()
+    with conn:
+        _worker_main(conn)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+import asyncio
+import logging
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import threading
+from multiprocessing.connection import Client
+from typing import Any, Dict, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Размер пула; 0 отключает пул и возвращает запуск robot отдельным процессом
+ROBOT_WORKER_POOL_SIZE = int(os.getenv("ROBOT_WORKER_POOL_SIZE", "2"))
+
+# Скрипт процесса воркера; импортирует только stdlib и robot
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "robot_worker.py")
+
+
+def _descendants(pid: int) -> List[int]:
+    """PID всех потомков процесса (по таблице ps), сначала ближайшие"""
+    try:
+        output = subprocess.run(
+            ["ps", "-A", "-o", "pid=,ppid="], capture_output=True, text=True, timeout=5
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return []
+    children: Dict[int, List[int]] = {}
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) == 2 and parts[0].isdigit() and parts[1].isdigit():
+            children.setdefault(int(parts[1]), []).append(int(parts[0]))
+    result, queue = [], [pid]
+    while queue:
+        for child in children.get(queue.pop(0), []):
+            result.append(child)
+            queue.append(child)
+    return result
+
+
+def kill_process_tree(pid: int):
+    """
+    Убивает процесс вместе со всеми его потомками. Блокирующий вызов
+    (ps, taskkill): из асинхронного кода - через executor.
+
+    На POSIX убивается группа процесса (он запускается лидером группы) и
+    отдельно каждый потомок: Process library Robot Framework запускает
+    команды в своих сессиях, и сигнал группе до них не доходит.
+    На Windows дерево процессов завершает taskkill /T.
+    """
+    if sys.platform == "win32":
+        subprocess.run(
+            ["taskkill", "/F", "/T", "/PID", str(pid)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        return
+
+    # Дерево собирается до сигналов: после смерти родителя потомки теряют ppid
+    descendants = _descendants(pid)
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError) as e:
+        logger.warning(f"Не удалось завершить группу процессов {pid}: {e}")
+    for child in descendants:
+        try:
+            os.kill(child, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+class RobotWorker:
+    """Процесс с прогретым Robot Framework и соединение к нему"""
+
+    def __init__(self):
+        authkey = secrets.token_bytes(32)
+        self.process = subprocess.Popen(
+            [sys.executable, WORKER_SCRIPT], stdin=subprocess.PIPE, stdout=subprocess.PIPE
+        )
+        self.process.stdin.write(authkey.hex().encode("ascii") + b"\n")
+        self.process.stdin.close()
+        self._authkey = authkey
+        self.conn = None
+        self.ready = False
+        self._ready_lock = threading.Lock()
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid
+
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def wait_ready(self):
+        """Подключается к воркеру и ждет прогрева; выполняется ровно один раз"""
+        with self._ready_lock:
+            if self.ready:
+                return
+            address = self.process.stdout.readline().decode("utf-8").strip()
+            self.process.stdout.close()
+            if not address:
+                raise EOFError(f"воркер {self.pid} завершился до подключения")
+            self.conn = Client(address, authkey=self._authkey)
+            self.conn.recv()
+            self.ready = True
+
+    def execute(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Блокирующий вызов, выполняется в потоке executor"""
+        self.wait_ready()
+        self.conn.send(request)
+        return self.conn.recv()
+
+    def kill(self):
+        """Немедленно убивает воркер и запущенные им процессы; блокирующий вызов"""
+        kill_process_tree(self.process.pid)
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+
+    def stop(self):
+        if self.conn is None:
+            # Воркер еще не подключился и сам не завершится
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except (OSError, BrokenPipeError):
+                pass
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        if self.conn is not None:
+            self.conn.close()
+
+
+class RobotWorkerPool:
+    """
+    Пул заранее запущенных процессов, которые выполняют наборы через robot.run
+    без старта интерпретатора и повторного импорта библиотек на каждый запуск.
+    """
+
+    def __init__(self, size: int = ROBOT_WORKER_POOL_SIZE):
+        self.size = size
+        self._idle: Optional[asyncio.Queue] = None
+        self._workers: List[RobotWorker] = []
+        self._start_lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    async def start(self):
+        async with self._start_lock:
+            if self._idle is not None or not self.enabled:
+                return
+            self._idle = asyncio.Queue()
+            for _ in range(self.size):
+                worker = self._spawn()
+                self._workers.append(worker)
+                await self._idle.put(worker)
+            logger.info(f"Пул Robot Framework запущен: {self.size} воркеров")
+
+    async def stop(self):
+        if self._idle is None:
+            return
+        loop = asyncio.get_running_loop()
+        for worker in self._workers:
+            await loop.run_in_executor(None, worker.stop)
+        self._workers = []
+        self._idle = None
+        logger.info("Пул Robot Framework остановлен")
+
+    def _spawn(self) -> RobotWorker:
+        worker = RobotWorker()
+        # Ждем прогрева в фоне, чтобы не задерживать старт сервиса и замену воркера
+        asyncio.get_running_loop().run_in_executor(None, self._warm_up, worker)
+        return worker
+
+    @staticmethod
+    def _warm_up(worker: RobotWorker):
+        try:
+            worker.wait_ready()
+        except (EOFError, OSError) as e:
+            logger.error(f"Воркер Robot Framework {worker.pid} не запустился: {e}")
+
+    async def _replace(self, worker: RobotWorker) -> RobotWorker:
+        """Заменяет упавший воркер новым; остановка старого (join) идет в executor"""
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, worker.stop)
+        except Exception:
+            pass
+        new_worker = self._spawn()
+        self._workers = [new_worker if w is worker else w for w in self._workers]
+        return new_worker
+
+    async def run(
+        self,
+        robot_file: str,
+        output_dir: str,
+        variables: Optional[Dict[str, str]] = None,
+        listener: Optional[str] = None,
+        pythonpath: Optional[List[str]] = None,
+        output: Optional[str] = None,
+        log: Optional[str] = None,
+        report: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Выполняет набор в свободном воркере.
+
+        Возвращает return_code, пути к output/log/report и stdout/stderr;
+        output.xml разбирает вызывающая сторона (сохранение результатов).
+        timeout считается вместе с ожиданием свободного воркера. При превышении
+        timeout (asyncio.TimeoutError) или отмене задачи воркер убивается
+        вместе с дочерними процессами и заменяется новым.
+        """
+        await self.start()
+        request = {
+            "robot_file": robot_file,
+            "output_dir": os.path.abspath(output_dir),
+            "variables": variables or {},
+            "listener": listener,
+            "pythonpath": pythonpath or [],
+            "output": output,
+            "log": log,
+            "report": report,
+        }
+        loop = asyncio.get_running_loop()
+        # Ожидание свободного воркера входит в timeout: один срок на весь запуск
+        deadline = loop.time() + timeout if timeout is not None else None
+        worker = await asyncio.wait_for(self._idle.get(), timeout)
+        try:
+            if not worker.is_alive():
+                worker = await self._replace(worker)
+            try:
+                return await asyncio.wait_for(
+                    loop.run_in_executor(None, worker.execute, request),
+                    max(deadline - loop.time(), 0) if deadline is not None else None,
+                )
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                logger.warning(f"Прерывание набора {robot_file} в воркере {worker.pid}")
+                # ps, сигналы и join блокируют, поэтому не в цикле событий
+                await loop.run_in_executor(None, worker.kill)
+                worker = await self._replace(worker)
+                raise
+            except (EOFError, OSError) as e:
+                logger.error(f"Воркер Robot Framework {worker.pid} упал: {e}")
+                worker = await self._replace(worker)
+                return {"return_code": 255, "stderr": str(e)}
+        finally:
+            await self._idle.put(worker)
+
+
+# Глобальный пул воркеров
+robot_worker_pool = RobotWorkerPool()
@@ -0,0 +1,248 @@
+import asyncio
+import datetime
+import gzip
+import logging
+import os
+import shutil
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Корневой каталог для артефактов Robot Framework всех сессий
+OUTPUT_ROOT = os.getenv("ROBOT_OUTPUT_ROOT", "output")
+# Каталог для работающих прогонов, например tmpfs (/dev/shm/robot); пусто -
+# robot пишет сразу в OUTPUT_ROOT. Готовые артефакты переносятся в OUTPUT_ROOT
+SCRATCH_ROOT = os.getenv("ROBOT_SCRATCH_ROOT", "")
+# Сжатие готовых артефактов: gzip, zstd (нужен пакет zstandard) или none
+ARTIFACT_COMPRESSION = os.getenv("ROBOT_ARTIFACT_COMPRESSION", "gzip")
+# Ретеншн: прогоны старше N дней удаляются, затем самые старые - пока
+# общий размер больше лимита
+ARTIFACT_MAX_AGE_DAYS = float(os.getenv("ROBOT_ARTIFACT_MAX_AGE_DAYS", "14"))
+ARTIFACT_MAX_TOTAL_MB = float(os.getenv("ROBOT_ARTIFACT_MAX_TOTAL_MB", "2048"))
+ARTIFACT_SWEEP_INTERVAL = float(os.getenv("ROBOT_ARTIFACT_SWEEP_INTERVAL", "600"))
+
+# Прогон, маркер которого старше этого времени, считается брошенным
+# (процесс API или воркера упал, не закончив его), часы
+ARTIFACT_ACTIVE_TTL_HOURS = float(os.getenv("ROBOT_ARTIFACT_ACTIVE_TTL_HOURS", "24"))
+
+# Сжимаются только логи robot; JSON результатов остается как есть, а
+# log.html и report.html - чтобы работали ссылки report.html на log.html
+COMPRESS_SUFFIXES = (".xml", ".log", ".txt")
+COMPRESS_MIN_BYTES = 4096
+
+# Маркер каталога прогона, который еще пишется или сжимается: по нему
+# очистка любого процесса (API, воркер очереди) каталог не трогает
+ACTIVE_MARKER = ".active"
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class RunDir:
+    """Каталог одного прогона набора"""
+
+    def __init__(self, run_id: str, test_id: str, path: str, final_path: str):
+        self.run_id = run_id
+        self.test_id = test_id
+        # Куда пишет robot (на tmpfs, если задан SCRATCH_ROOT)
+        self.path = path
+        # Где артефакты хранятся после завершения
+        self.final_path = final_path
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"run_id": self.run_id, "path": self.final_path}
+
+
+class ArtifactStore:
+    """
+    Каталоги прогонов robot: отдельный каталог на каждый запуск, перенос
+    с tmpfs и сжатие готовых артефактов в фоне, периодическая очистка
+    по возрасту и общему размеру.
+    """
+
+    def __init__(
+        self,
+        root: str = OUTPUT_ROOT,
+        scratch_root: str = SCRATCH_ROOT,
+        compression: str = ARTIFACT_COMPRESSION,
+        max_age_days: float = ARTIFACT_MAX_AGE_DAYS,
+        max_total_mb: float = ARTIFACT_MAX_TOTAL_MB,
+        sweep_interval: float = ARTIFACT_SWEEP_INTERVAL,
+        active_ttl_hours: float = ARTIFACT_ACTIVE_TTL_HOURS,
+    ):
+        self.root = root
+        self.scratch_root = scratch_root
+        if compression == "zstd" and zstandard is None:
+            logger.warning("Пакет zstandard не установлен, артефакты сжимаются gzip")
+            compression = "gzip"
+        self.compression = compression
+        self.max_age = max_age_days * 86400
+        self.max_total_bytes = int(max_total_mb * 1024 * 1024)
+        self.sweep_interval = sweep_interval
+        self.active_ttl = active_ttl_hours * 3600
+        self._pending: Set[asyncio.Task] = set()
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def create_run_dir(self, session_dir: str, test_id: str) -> RunDir:
+        """Новый каталог прогона <root>/<сессия>/<тест>/<run_id>"""
+        stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        run_id = f"{stamp}-{uuid.uuid4().hex[:8]}"
+        final_path = os.path.abspath(os.path.join(self.root, session_dir, test_id, run_id))
+        path = final_path
+        if self.scratch_root:
+            path = os.path.abspath(os.path.join(self.scratch_root, session_dir, test_id, run_id))
+        os.makedirs(path, exist_ok=True)
+        # Маркер в итоговом каталоге: очистка смотрит только на OUTPUT_ROOT
+        os.makedirs(final_path, exist_ok=True)
+        with open(os.path.join(final_path, ACTIVE_MARKER), "w") as f:
+            f.write(str(os.getpid()))
+        return RunDir(run_id, test_id, path, final_path)
+
+    def schedule_finalize(self, run: RunDir) -> asyncio.Task:
+        """Перенос и сжатие артефактов в фоне, не задерживая статус теста"""
+        task = asyncio.create_task(self.finalize(run))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        return task
+
+    async def finalize(self, run: RunDir):
+        try:
+            saved = await asyncio.to_thread(self._finalize_sync, run)
+            logger.info(f"Артефакты прогона {run.run_id} сохранены в {run.final_path}, сжатием сэкономлено {saved} байт")
+        except Exception as e:
+            logger.error(f"Ошибка обработки артефактов прогона {run.run_id}: {e}")
+        finally:
+            try:
+                os.remove(os.path.join(run.final_path, ACTIVE_MARKER))
+            except OSError:
+                pass
+
+    def _finalize_sync(self, run: RunDir) -> int:
+        saved = 0
+        os.makedirs(run.final_path, exist_ok=True)
+        for root, _, files in os.walk(run.path):
+            target_dir = os.path.join(run.final_path, os.path.relpath(root, run.path))
+            os.makedirs(target_dir, exist_ok=True)
+            for name in files:
+                if name == ACTIVE_MARKER:
+                    continue
+                source = os.path.join(root, name)
+                size = os.path.getsize(source)
+                if (
+                    self.compression != "none"
+                    and name.lower().endswith(COMPRESS_SUFFIXES)
+                    and size >= COMPRESS_MIN_BYTES
+                ):
+                    target = self._compress(source, os.path.join(target_dir, name))
+                    saved += size - os.path.getsize(target)
+                    os.remove(source)
+                elif source != os.path.join(target_dir, name):
+                    shutil.move(source, os.path.join(target_dir, name))
+        if run.path != run.final_path:
+            shutil.rmtree(run.path, ignore_errors=True)
+        return saved
+
+    def _compress(self, source: str, target: str) -> str:
+        if self.compression == "zstd":
+            target += ".zst"
+            with open(source, "rb") as src, open(target, "wb") as dst:
+                zstandard.ZstdCompressor(level=3).copy_stream(src, dst)
+        else:
+            target += ".gz"
+            with open(source, "rb") as src, gzip.open(target, "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        return target
+
+    def _run_dirs(self) -> List[Tuple[float, str]]:
+        """(mtime, путь) всех каталогов прогонов <root>/<сессия>/<тест>/<run_id>"""
+        runs = []
+        if not os.path.isdir(self.root):
+            return runs
+        for session_entry in os.scandir(self.root):
+            if not session_entry.is_dir():
+                continue
+            for test_entry in os.scandir(session_entry.path):
+                if not test_entry.is_dir():
+                    continue
+                for run_entry in os.scandir(test_entry.path):
+                    if run_entry.is_dir():
+                        runs.append((run_entry.stat().st_mtime, os.path.abspath(run_entry.path)))
+        runs.sort()
+        return runs
+
+    def _is_active(self, path: str, now: float) -> bool:
+        try:
+            marked_at = os.path.getmtime(os.path.join(path, ACTIVE_MARKER))
+        except OSError:
+            return False
+        return not self.active_ttl or now - marked_at < self.active_ttl
+
+    def sweep(self) -> Dict[str, int]:
+        """Удаляет старые прогоны, затем самые старые сверх лимита размера"""
+        now = time.time()
+        removed = 0
+        freed = 0
+        kept = []
+        for mtime, path in self._run_dirs():
+            if self._is_active(path, now):
+                continue
+            if self.max_age and now - mtime > self.max_age:
+                freed += _dir_size(path)
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+            else:
+                kept.append((path, _dir_size(path)))
+
+        total = sum(size for _, size in kept)
+        for path, size in kept:
+            if not self.max_total_bytes or total <= self.max_total_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            freed += size
+            removed += 1
+
+        if removed:
+            logger.info(f"Очистка артефактов: удалено прогонов {removed}, освобождено {freed} байт")
+        return {"removed": removed, "freed": freed, "total": total}
+
+    async def _sweep_loop(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                logger.error(f"Ошибка очистки артефактов: {e}")
+            await asyncio.sleep(self.sweep_interval)
+
+    def start(self):
+        if self._sweeper is None and self.sweep_interval > 0:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+        # Артефакты завершенных прогонов дописываются до выхода
+        if self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+
+
+# Глобальное хранилище артефактов прогонов
+artifact_store = ArtifactStore()
@@ -0,0 +1,219 @@
+import asyncio
+import datetime
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from api_service.db.db_tests import create_tests_state, state_version, tests_db
+from api_service.domain.services.retry_policy import DEVICE_TIME_BUDGET, TimeBudget
+from api_service.domain.services.run_artifacts import OUTPUT_ROOT, RunDir, artifact_store
+from api_service.domain.services.test_scheduler import SessionResources, host_resources
+
+
+def utc_now_iso() -> str:
+    """Текущее время UTC в формате, который используется в статусах тестов"""
+    return datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _get_field(payload: Any, name: str, default: Any = None) -> Any:
+    """Достает поле из pydantic модели или словаря"""
+    if isinstance(payload, dict):
+        return payload.get(name, default)
+    return getattr(payload, name, default)
+
+
+def _safe_dir_name(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", value) or "default"
+
+
+class TestSession:
+    """
+    Сессия тестирования одного устройства (DUT) на одном стенде.
+
+    У каждой сессии свое состояние тестов, свой каталог вывода
+    и свой WebSocket топик, поэтому несколько устройств могут
+    тестироваться параллельно.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        serial_number: str = "",
+        mac_address: str = "",
+        device_name: str = "",
+        bench_variables: Optional[Dict[str, str]] = None,
+    ):
+        self.session_id = session_id
+        self.serial_number = serial_number
+        self.mac_address = mac_address
+        self.device_name = device_name
+        self.bench_variables: Dict[str, str] = dict(bench_variables or {})
+        # Прошивка устройства (если известна) и запрет на результаты из кэша
+        self.firmware_build: Optional[str] = None
+        self.force_run = False
+        # Отчет последней проверки стенда перед прогоном
+        self.preflight: Optional[Dict[str, Any]] = None
+        self.tests: Dict[str, Dict] = create_tests_state()
+        self.dir_name = _safe_dir_name(session_id)
+        self.output_dir = os.path.join(OUTPUT_ROOT, self.dir_name)
+        self.topic = f"session:{session_id}"
+        self.task: Optional[asyncio.Task] = None
+        # Ресурсы стенда: роутер и модем - свои у устройства, коммутатор
+        # и WiFi хоста - общие с другими сессиями
+        self.resources = SessionResources(session_id, host_resources)
+        # Общий бюджет времени на повторы всех наборов устройства
+        self.device_budget = TimeBudget(DEVICE_TIME_BUDGET)
+        self.created_at = utc_now_iso()
+
+    def is_running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def device_payload(self) -> Dict[str, str]:
+        return {
+            "serial_number": self.serial_number,
+            "mac_address": self.mac_address,
+            "device_name": self.device_name,
+        }
+
+    def apply_device(self, payload: Any):
+        """Данные устройства из запроса на запуск; обновляются при каждом запуске"""
+        self.serial_number = _get_field(payload, "serial_number", "") or ""
+        self.mac_address = _get_field(payload, "mac_address", "") or ""
+        self.device_name = _get_field(payload, "device_name", "") or ""
+        bench_variables = _get_field(payload, "bench_variables")
+        if bench_variables:
+            self.bench_variables = dict(bench_variables)
+        # Прошивка известна только из текущего запроса: без нее результаты
+        # прежней прошивки из кэша не подставляются
+        firmware_build = _get_field(payload, "firmware_build")
+        self.firmware_build = str(firmware_build) if firmware_build else None
+        self.force_run = bool(_get_field(payload, "force", False))
+
+    def get_test(self, test_id: str) -> Dict:
+        """Запись теста сессии с заполненными test_id и session_id"""
+        test_item = self.tests[test_id]
+        test_item["test_id"] = test_id
+        test_item["session_id"] = self.session_id
+        return test_item
+
+    def update_test(self, test_id: str, **fields) -> Dict:
+        """
+        Обновляет запись теста сессии и зеркалирует ее в общий tests_db,
+        который остается представлением для клиентов с одним стендом.
+        """
+        test_item = self.get_test(test_id)
+        test_item.update(fields)
+        if "updated_at" not in fields:
+            test_item["updated_at"] = utc_now_iso()
+        if test_id in tests_db:
+            tests_db[test_id].update(test_item)
+        state_version.bump()
+        return test_item
+
+    def start_run(self):
+        """Начало прогона устройства: новый бюджет времени на повторы"""
+        self.device_budget = TimeBudget(DEVICE_TIME_BUDGET)
+
+    def reset_tests(self):
+        """Сбрасывает все тесты сессии (кроме записи "all") в idle"""
+        for test_id in self.tests.keys():
+            if test_id != "all":
+                self.update_test(
+                    test_id,
+                    status="idle",
+                    time_start="",
+                    time_end="",
+                    updated_at="",
+                    result=None,
+                    live=None,
+                )
+
+    def sync_tests(self):
+        """
+        Приводит список тестов сессии к tests_db после изменения реестра
+        наборов: новые наборы добавляются в idle, удаленные убираются.
+        """
+        state = create_tests_state()
+        if state.keys() == self.tests.keys():
+            return
+        for test_id, test_item in self.tests.items():
+            if test_id in state:
+                state[test_id] = test_item
+        self.tests = state
+        state_version.bump()
+
+    def snapshot(self, include_all: bool = False) -> List[Dict]:
+        tests = []
+        for test_id in self.tests.keys():
+            if test_id == "all" and not include_all:
+                continue
+            tests.append(self.get_test(test_id).copy())
+        return tests
+
+    def create_run_dir(self, test_id: str) -> RunDir:
+        """Отдельный каталог вывода на каждый запуск теста"""
+        return artifact_store.create_run_dir(self.dir_name, test_id)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            **self.device_payload(),
+            "firmware_build": self.firmware_build,
+            "topic": self.topic,
+            "output_dir": self.output_dir,
+            "running": self.is_running(),
+            "preflight": self.preflight,
+            "created_at": self.created_at,
+            "tests": self.snapshot(),
+        }
+
+
+class SessionManager:
+    """Реестр сессий тестирования, ключ - слот стенда или серийный номер"""
+
+    def __init__(self):
+        self.sessions: Dict[str, TestSession] = {}
+
+    @staticmethod
+    def session_key(payload: Any) -> str:
+        return (
+            _get_field(payload, "session_id")
+            or _get_field(payload, "serial_number")
+            or _get_field(payload, "mac_address")
+            or "default"
+        )
+
+    def ensure(self, payload: Any) -> TestSession:
+        """Сессия по ключу запроса без изменения данных устройства"""
+        session_id = self.session_key(payload)
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = TestSession(session_id)
+            self.sessions[session_id] = session
+            state_version.bump()
+        elif not session.is_running():
+            session.sync_tests()
+        return session
+
+    def get_or_create(self, payload: Any) -> TestSession:
+        session = self.ensure(payload)
+        session.apply_device(payload)
+        return session
+
+    def get(self, session_id: str) -> Optional[TestSession]:
+        return self.sessions.get(session_id)
+
+    def list(self) -> List[TestSession]:
+        return list(self.sessions.values())
+
+    def remove(self, session_id: str) -> bool:
+        session = self.sessions.get(session_id)
+        if session is None or session.is_running():
+            return False
+        del self.sessions[session_id]
+        state_version.bump()
+        return True
+
+
+# Глобальный реестр сессий
+session_manager = SessionManager()
@@ -0,0 +1,241 @@
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from robot.api import get_model
+from robot.parsing.model.statements import (
+    Documentation,
+    LibraryImport,
+    Metadata,
+    ResourceImport,
+    TestTags,
+    Variable,
+    VariablesImport,
+)
+from watchfiles import awatch
+
+from api_service.db.db_tests import state_version, tests_db
+from api_service.domain.services.test_scheduler import ROUTER_SSH, SUITE_SPECS, SuiteSpec
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Каталог наборов Robot Framework
+ROBOT_TESTS_DIR = os.path.abspath(
+    os.getenv(
+        "ROBOT_TESTS_DIR",
+        os.path.join(os.path.dirname(__file__), "..", "..", "..", "..", "robot-tests"),
+    )
+).replace("\\", "/")
+
+# Порядок по умолчанию для наборов без Metadata Order
+DEFAULT_ORDER = 1000
+
+
+def _split(value: str) -> List[str]:
+    return [item.strip() for item in value.replace(";", ",").split(",") if item.strip()]
+
+
+class SuiteInfo:
+    """
+    Набор из robot-tests/ и его метаданные из секции Settings:
+
+        Documentation   Описание набора
+        Test Tags       router    smoke
+        Metadata        Resources      router_ssh, sim_modem
+        Metadata        Depends On     ethernets
+        Metadata        Timeout        600
+        Metadata        Order          2
+        Metadata        Result File    sim.json
+        Metadata        Platform Suite    no
+
+    Файл результатов по умолчанию - имя из ${JSON_PATH} набора, иначе <test_id>.json.
+    Platform Suite: no - вспомогательный набор (ports.robot), в списке тестов его нет.
+    """
+
+    def __init__(self, test_id: str, path: str, mtime: float):
+        self.test_id = test_id
+        self.path = path
+        self.mtime = mtime
+        self.documentation = ""
+        self.tags: List[str] = []
+        self.metadata: Dict[str, str] = {}
+        self.libraries: List[str] = []
+        self.imports: List[str] = []
+        self.result_file = f"{test_id}.json"
+        self.resources: List[str] = []
+        self.depends_on: List[str] = []
+        self.timeout: Optional[float] = None
+        self.order = DEFAULT_ORDER
+        self.platform_suite = True
+
+    @classmethod
+    def parse(cls, path: str) -> "SuiteInfo":
+        test_id = os.path.splitext(os.path.basename(path))[0]
+        suite = cls(test_id, path, os.stat(path).st_mtime)
+        json_path = None
+        for section in get_model(path).sections:
+            for statement in section.body:
+                if isinstance(statement, Documentation):
+                    suite.documentation = statement.value
+                elif isinstance(statement, TestTags):
+                    suite.tags = list(statement.values)
+                elif isinstance(statement, Metadata):
+                    suite.metadata[statement.name.strip().lower()] = statement.value.strip()
+                elif isinstance(statement, LibraryImport):
+                    suite.libraries.append(statement.name)
+                elif isinstance(statement, (ResourceImport, VariablesImport)):
+                    suite.imports.append(statement.name)
+                elif isinstance(statement, Variable) and statement.name == "${JSON_PATH}":
+                    json_path = statement.value[0] if statement.value else None
+
+        meta = suite.metadata
+        if meta.get("result file"):
+            suite.result_file = meta["result file"]
+        elif json_path:
+            suite.result_file = json_path.replace("${/}", "/").rsplit("/", 1)[-1]
+        suite.resources = _split(meta.get("resources", ""))
+        suite.depends_on = _split(meta.get("depends on", ""))
+        try:
+            suite.timeout = float(meta["timeout"]) if meta.get("timeout") else None
+        except ValueError:
+            logger.warning(f"Набор {test_id}: некорректный Timeout {meta['timeout']!r}")
+        try:
+            suite.order = int(meta.get("order", DEFAULT_ORDER))
+        except ValueError:
+            logger.warning(f"Набор {test_id}: некорректный Order {meta['order']!r}")
+        suite.platform_suite = meta.get("platform suite", "yes").lower() not in ("no", "false", "0")
+        return suite
+
+    def to_spec(self) -> Optional[SuiteSpec]:
+        """Спецификация для планировщика; без метаданных - поведение по умолчанию"""
+        if not self.resources and not self.depends_on and self.timeout is None:
+            return None
+        # Без объявленных ресурсов набор, как и раньше, занимает роутер целиком
+        return SuiteSpec(
+            self.test_id, self.resources or {ROUTER_SSH}, self.depends_on, self.timeout
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "test_id": self.test_id,
+            "file": os.path.basename(self.path),
+            "documentation": self.documentation,
+            "tags": self.tags,
+            "resources": self.resources,
+            "depends_on": self.depends_on,
+            "timeout": self.timeout,
+            "result_file": self.result_file,
+            "platform_suite": self.platform_suite,
+        }
+
+
+class SuiteRegistry:
+    """
+    Реестр наборов из robot-tests/*.robot. Метаданные разбираются один раз
+    и кэшируются по mtime файла; при изменении каталога реестр обновляет
+    SUITE_SPECS планировщика и список тестов tests_db без перезапуска API.
+    """
+
+    def __init__(self, directory: str = ROBOT_TESTS_DIR):
+        self.directory = directory
+        self.suites: Dict[str, SuiteInfo] = {}
+        self._watcher: Optional[asyncio.Task] = None
+        self._stop_event: Optional[asyncio.Event] = None
+
+    def scan(self) -> Tuple[List[str], List[str]]:
+        """Перечитывает измененные наборы; возвращает (добавленные/измененные, удаленные)"""
+        found: Dict[str, SuiteInfo] = {}
+        changed = []
+        try:
+            entries = sorted(os.scandir(self.directory), key=lambda e: e.name)
+        except OSError as e:
+            logger.error(f"Каталог наборов {self.directory} недоступен: {e}")
+            entries = []
+        for entry in entries:
+            if not entry.name.endswith(".robot") or not entry.is_file():
+                continue
+            test_id = entry.name[: -len(".robot")]
+            cached = self.suites.get(test_id)
+            if cached is not None and cached.mtime == entry.stat().st_mtime:
+                found[test_id] = cached
+                continue
+            try:
+                found[test_id] = SuiteInfo.parse(entry.path.replace("\\", "/"))
+                changed.append(test_id)
+            except Exception as e:
+                logger.error(f"Не удалось разобрать набор {entry.name}: {e}")
+                if cached is not None:
+                    found[test_id] = cached
+        removed = [test_id for test_id in self.suites if test_id not in found]
+        self.suites = found
+        if changed or removed:
+            self._apply()
+            logger.info(f"Реестр наборов: обновлены {changed}, удалены {removed}")
+        return changed, removed
+
+    def _apply(self):
+        """Синхронизирует SUITE_SPECS и tests_db с реестром"""
+        platform_suites = self.list()
+        SUITE_SPECS.clear()
+        for suite in platform_suites:
+            spec = suite.to_spec()
+            if spec is not None:
+                SUITE_SPECS[suite.test_id] = spec
+
+        # Записи сохраняются, чтобы не терять статус; "all" всегда последний
+        state = {}
+        for test_id in [suite.test_id for suite in platform_suites] + ["all"]:
+            state[test_id] = tests_db.get(test_id) or {
+                "status": "idle",
+                "time_start": "",
+                "time_end": "",
+                "updated_at": "",
+                "result": None,
+            }
+        tests_db.clear()
+        tests_db.update(state)
+        state_version.bump()
+
+    def get(self, test_id: str) -> Optional[SuiteInfo]:
+        """Набор по test_id, включая вспомогательные"""
+        return self.suites.get(test_id)
+
+    def list(self) -> List[SuiteInfo]:
+        """Наборы платформы в порядке Metadata Order, затем по имени"""
+        suites = [suite for suite in self.suites.values() if suite.platform_suite]
+        return sorted(suites, key=lambda suite: (suite.order, suite.test_id))
+
+    async def _watch(self):
+        async for _ in awatch(
+            self.directory,
+            stop_event=self._stop_event,
+            watch_filter=lambda change, path: path.endswith(".robot"),
+            recursive=False,
+        ):
+            # Разбор нескольких файлов занимает миллисекунды; SUITE_SPECS и
+            # tests_db меняются в цикле событий, а не из другого потока
+            try:
+                self.scan()
+            except Exception as e:
+                logger.error(f"Ошибка обновления реестра наборов: {e}")
+
+    def start(self):
+        """Следит за каталогом наборов и перечитывает измененные файлы"""
+        if self._watcher is None and os.path.isdir(self.directory):
+            self._stop_event = asyncio.Event()
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._watcher is not None:
+            self._stop_event.set()
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+
+
+# Глобальный реестр наборов; первичное сканирование при импорте, чтобы
+# список тестов был готов до первого запроса
+suite_registry = SuiteRegistry()
+suite_registry.scan()
@@ -0,0 +1,376 @@
+import asyncio
+import logging
+import time
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Ресурсы стенда, которые захватывают тестовые наборы
+ROUTER_SSH = "router_ssh"  # SSH/LAN линк до роутера (192.168.1.1)
+CISCO_SWITCH = "cisco_switch"  # управление портами коммутатора Cisco
+WIFI_RADIO = "wifi_radio"  # WiFi интерфейс хоста
+SIM_MODEM = "sim_modem"  # модем роутера
+
+# Ресурсы, которые нужны восстановлению портов (ports.robot)
+RECOVERY_RESOURCES = {CISCO_SWITCH, ROUTER_SSH}
+# Ресурсы хоста, общие для всех сессий (слотов стенда); остальные у каждого
+# устройства свои
+HOST_RESOURCES = {CISCO_SWITCH, WIFI_RADIO}
+
+
+class SuiteSpec:
+    """Описание тестового набора для планировщика"""
+
+    def __init__(
+        self,
+        test_id: str,
+        resources: Iterable[str] = (),
+        depends_on: Iterable[str] = (),
+        timeout: Optional[float] = None,
+    ):
+        self.test_id = test_id
+        self.resources: Set[str] = set(resources)
+        self.depends_on: Set[str] = set(depends_on)
+        # Предельное время набора вместе с повторами; None - общий SUITE_TIME_BUDGET
+        self.timeout = timeout
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "test_id": self.test_id,
+            "resources": sorted(self.resources),
+            "depends_on": sorted(self.depends_on),
+            "timeout": self.timeout,
+        }
+
+
+# Объявленные зависимости и ресурсы тестовых наборов. Заполняется реестром
+# наборов (suite_registry) из строк Metadata Resources/Depends On/Timeout
+# в секции Settings файлов robot-tests/*.robot.
+SUITE_SPECS: Dict[str, SuiteSpec] = {}
+
+
+def get_suite_spec(test_id: str) -> SuiteSpec:
+    """Спецификация набора; для необъявленных наборов - эксклюзивный доступ к роутеру"""
+    return SUITE_SPECS.get(test_id) or SuiteSpec(test_id, resources={ROUTER_SSH})
+
+
+class ResourcePool:
+    """
+    Захват ресурсов стенда владельцами (тестами).
+
+    Захват атомарный: владелец получает либо все запрошенные ресурсы, либо ждет.
+    Ресурсы, которыми владелец уже владеет, повторно не захватываются, поэтому
+    восстановление внутри теста не блокирует само себя.
+    """
+
+    def __init__(self):
+        self._owners: Dict[str, str] = {}
+        self._condition = asyncio.Condition()
+        # Выставляется при каждом освобождении: планировщик пробует стартовать
+        # ожидающие наборы, даже если ресурсы отпустило восстановление, а не набор
+        self._released = asyncio.Event()
+        # События сессий, которые захватывают ресурсы через SessionResources
+        self._watchers: "weakref.WeakSet[asyncio.Event]" = weakref.WeakSet()
+
+    def holders(self) -> Dict[str, str]:
+        return dict(self._owners)
+
+    def can_claim(self, owner: str, resources: Iterable[str]) -> bool:
+        return all(self._owners.get(r, owner) == owner for r in resources)
+
+    def try_claim(self, owner: str, resources: Iterable[str]) -> Optional[Set[str]]:
+        """Захватывает ресурсы без ожидания; возвращает новые захваченные или None"""
+        resources = set(resources)
+        if not self.can_claim(owner, resources):
+            return None
+        acquired = {r for r in resources if r not in self._owners}
+        for resource in acquired:
+            self._owners[resource] = owner
+        return acquired
+
+    async def claim(self, owner: str, resources: Iterable[str]) -> Set[str]:
+        resources = set(resources)
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.can_claim(owner, resources))
+            return self.try_claim(owner, resources)
+
+    async def release(self, owner: str, resources: Iterable[str]):
+        async with self._condition:
+            for resource in resources:
+                if self._owners.get(resource) == owner:
+                    del self._owners[resource]
+            self._condition.notify_all()
+        self._released.set()
+        for released in list(self._watchers):
+            released.set()
+
+    def clear_released(self):
+        self._released.clear()
+
+    async def wait_released(self):
+        """Ждет освобождения ресурсов после последнего clear_released"""
+        await self._released.wait()
+
+
+class SessionResources:
+    """
+    Ресурсы стенда одной сессии поверх общего пула хоста.
+
+    Ресурсы из HOST_RESOURCES (коммутатор, WiFi хоста) захватываются под
+    своими именами и разделяются всеми сессиями; остальные получают префикс
+    сессии и остаются локальными для устройства. Владельцы тоже получают
+    префикс, поэтому одинаковые test_id разных сессий не считаются одним
+    владельцем. Интерфейс совпадает с ResourcePool.
+    """
+
+    def __init__(self, session_id: str, pool: ResourcePool):
+        self.session_id = session_id
+        self.pool = pool
+        self._prefix = f"{session_id}:"
+        # Свое событие освобождения: планировщик другой сессии его не сбросит
+        self._released = asyncio.Event()
+        pool._watchers.add(self._released)
+
+    def _owner(self, owner: str) -> str:
+        return self._prefix + owner
+
+    def _names(self, resources: Iterable[str]) -> Set[str]:
+        return {r if r in HOST_RESOURCES else self._prefix + r for r in resources}
+
+    def _local_name(self, name: str) -> str:
+        return name[len(self._prefix):] if name.startswith(self._prefix) else name
+
+    def _local(self, names: Iterable[str]) -> Set[str]:
+        return {self._local_name(name) for name in names}
+
+    def holders(self) -> Dict[str, str]:
+        """Ресурсы, которые держат тесты этой сессии"""
+        return {
+            self._local_name(resource): self._local_name(owner)
+            for resource, owner in self.pool.holders().items()
+            if owner.startswith(self._prefix)
+        }
+
+    def can_claim(self, owner: str, resources: Iterable[str]) -> bool:
+        return self.pool.can_claim(self._owner(owner), self._names(resources))
+
+    def try_claim(self, owner: str, resources: Iterable[str]) -> Optional[Set[str]]:
+        acquired = self.pool.try_claim(self._owner(owner), self._names(resources))
+        return None if acquired is None else self._local(acquired)
+
+    async def claim(self, owner: str, resources: Iterable[str]) -> Set[str]:
+        return self._local(await self.pool.claim(self._owner(owner), self._names(resources)))
+
+    async def release(self, owner: str, resources: Iterable[str]):
+        await self.pool.release(self._owner(owner), self._names(resources))
+
+    def clear_released(self):
+        self._released.clear()
+
+    async def wait_released(self):
+        """Ждет освобождения ресурсов хоста после последнего clear_released"""
+        await self._released.wait()
+
+
+# Общий пул ресурсов хоста, как и предохранитель коммутатора switch_breaker
+host_resources = ResourcePool()
+
+
+class ScheduleReport:
+    """Фактическое расписание прогона: тайминги наборов и критический путь"""
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.suites: Dict[str, Dict[str, Any]] = {}
+        self.critical_path: List[str] = []
+        self.makespan = 0.0
+
+    def _offset(self) -> float:
+        return round(time.monotonic() - self.started_at, 3)
+
+    def suite_started(self, test_id: str, gated_by: Optional[str], resources: Set[str]):
+        self.suites[test_id] = {
+            "start": self._offset(),
+            "end": None,
+            "duration": None,
+            "gated_by": gated_by,
+            "resources": sorted(resources),
+            "result": None,
+        }
+
+    def suite_skipped(self, test_id: str, failed_dependencies: Set[str]):
+        offset = self._offset()
+        self.suites[test_id] = {
+            "start": offset,
+            "end": offset,
+            "duration": 0.0,
+            "gated_by": min(failed_dependencies),
+            "resources": [],
+            "result": "skipped",
+            "failed_dependencies": sorted(failed_dependencies),
+        }
+
+    def suite_finished(self, test_id: str, result: Any):
+        suite = self.suites[test_id]
+        suite["end"] = self._offset()
+        suite["duration"] = round(suite["end"] - suite["start"], 3)
+        suite["result"] = getattr(result, "value", result)
+
+    def finish(self):
+        self.makespan = self._offset()
+        finished = [t for t, s in self.suites.items() if s["end"] is not None]
+        if not finished:
+            return
+        # Идем от последнего завершившегося набора по цепочке "кто его задержал"
+        current = max(finished, key=lambda t: self.suites[t]["end"])
+        path = []
+        while current is not None and current not in path:
+            path.append(current)
+            current = self.suites[current]["gated_by"]
+        self.critical_path = list(reversed(path))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "makespan": self.makespan,
+            "critical_path": self.critical_path,
+            "suites": self.suites,
+        }
+
+
+def validate_specs(specs: Dict[str, SuiteSpec]):
+    """Проверяет граф зависимостей на циклы"""
+    visiting, done = set(), set()
+
+    def visit(test_id: str, chain: List[str]):
+        if test_id in done or test_id not in specs:
+            return
+        if test_id in visiting:
+            raise ValueError(f"Циклическая зависимость тестов: {' -> '.join(chain + [test_id])}")
+        visiting.add(test_id)
+        for dependency in specs[test_id].depends_on:
+            visit(dependency, chain + [test_id])
+        visiting.discard(test_id)
+        done.add(test_id)
+
+    for test_id in specs:
+        visit(test_id, [])
+
+
+async def run_schedule(
+    test_ids: List[str],
+    run_suite: Callable[[str], Awaitable[Any]],
+    resources: Optional[ResourcePool] = None,
+    specs: Optional[Dict[str, SuiteSpec]] = None,
+    is_success: Optional[Callable[[Any], bool]] = None,
+    skip_suite: Optional[Callable[[str, Set[str]], Awaitable[Any]]] = None,
+) -> ScheduleReport:
+    """
+    Запускает наборы параллельно с учетом зависимостей и ресурсов.
+
+    Набор стартует, как только успешно завершены все его зависимости и
+    свободны все его ресурсы. Порядок test_ids используется как приоритет.
+    Набор, зависимость которого не прошла (is_success вернул False, набор
+    упал с исключением или сам пропущен), не запускается: для него
+    вызывается skip_suite(test_id, непрошедшие зависимости).
+    """
+    if specs is None:
+        specs = {test_id: get_suite_spec(test_id) for test_id in test_ids}
+    if resources is None:
+        resources = ResourcePool()
+    validate_specs(specs)
+
+    report = ScheduleReport()
+    pending = list(test_ids)
+    finished: Set[str] = set()
+    # Завершившиеся неуспешно и пропущенные: их зависимые тоже пропускаются
+    failed: Set[str] = set()
+    running: Dict[asyncio.Task, str] = {}
+    claimed: Dict[str, Set[str]] = {}
+    finish_order: List[str] = []
+
+    while pending or running:
+        # Освобождения после этой точки разбудят планировщик
+        resources.clear_released()
+        skipped = False
+        for test_id in list(pending):
+            spec = specs[test_id]
+            # Зависимости вне текущего прогона считаются выполненными
+            dependencies = {d for d in spec.depends_on if d in specs}
+            if not dependencies <= finished:
+                continue
+            failed_dependencies = dependencies & failed
+            if failed_dependencies:
+                pending.remove(test_id)
+                logger.warning(
+                    f"Планировщик: {test_id} пропущен, не прошли зависимости {sorted(failed_dependencies)}"
+                )
+                report.suite_skipped(test_id, failed_dependencies)
+                finished.add(test_id)
+                failed.add(test_id)
+                finish_order.append(test_id)
+                skipped = True
+                if skip_suite is not None:
+                    await skip_suite(test_id, failed_dependencies)
+                continue
+            acquired = resources.try_claim(test_id, spec.resources)
+            if acquired is None:
+                continue
+            claimed[test_id] = acquired
+            pending.remove(test_id)
+            # Набор задержал последний завершившийся из его зависимостей
+            # или конкурентов за те же ресурсы
+            gated_by = None
+            for other_id in reversed(finish_order):
+                if other_id in dependencies or specs[other_id].resources & spec.resources:
+                    gated_by = other_id
+                    break
+            report.suite_started(test_id, gated_by, spec.resources)
+            logger.info(f"Планировщик: старт {test_id}, ресурсы {sorted(spec.resources)}")
+            running[asyncio.create_task(run_suite(test_id))] = test_id
+
+        if not running:
+            if skipped:
+                # Пропуск мог разблокировать зависимые наборы выше по списку
+                continue
+            # Ничего не запущено и ничего не может стартовать
+            raise RuntimeError(f"Невозможно запланировать тесты: {pending}")
+
+        released = asyncio.ensure_future(resources.wait_released())
+        try:
+            done, _ = await asyncio.wait(
+                [*running.keys(), released], return_when=asyncio.FIRST_COMPLETED
+            )
+        except asyncio.CancelledError:
+            # Отмена прогона останавливает и все запущенные наборы
+            released.cancel()
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running.keys(), return_exceptions=True)
+            raise
+        released.cancel()
+        for task in done:
+            if task is released:
+                continue
+            test_id = running.pop(task)
+            try:
+                result = task.result()
+                succeeded = is_success(result) if is_success is not None else True
+            except Exception as e:
+                logger.error(f"Планировщик: набор {test_id} завершился с ошибкой: {e}")
+                result = e.__class__.__name__
+                succeeded = False
+            await resources.release(test_id, claimed.pop(test_id))
+            report.suite_finished(test_id, result)
+            finished.add(test_id)
+            if not succeeded:
+                failed.add(test_id)
+            finish_order.append(test_id)
+
+    report.finish()
+    logger.info(
+        f"Планировщик: прогон за {report.makespan}с, критический путь {report.critical_path}"
+    )
+    return report
@@ -1,227 +1,467 @@
-from api_service.db.db_tests import tests_db
 from api_service.db.postgres_db import db
-from api_service.app.config import connected_clients
+from api_service.websocket.backplane import backplane
 from api_service.domain.models.test_models import TestRequest, TestStatus
+from api_service.domain.services.result_cache import find_cached_result, suite_hash
+from api_service.domain.services.result_loader import load_result_file
+from api_service.domain.services.result_watcher import wait_for_file
+from api_service.domain.services.bench_agents import agent_registry
+from api_service.domain.services.robot_events import EventHandler, robot_event_server
+from api_service.domain.services.robot_runner import execute_robot_local
+from api_service.domain.services.preflight import PREFLIGHT_ENABLED, failed_checks, run_preflight
+from api_service.domain.services.run_artifacts import artifact_store
+from api_service.domain.services.suite_registry import ROBOT_TESTS_DIR, suite_registry
+from api_service.domain.services.retry_policy import (
+    RECOVERY_PORTS,
+    SWITCH_DOWN,
+    FailureCollector,
+    RetryPolicy,
+    SUITE_TIME_BUDGET,
+    TIMEOUT_RETURN_CODE,
+    RobotTestError,
+    SwitchUnavailableError,
+    TimeBudget,
+    classify_failure,
+    switch_breaker,
+)
+from api_service.domain.services.session_service import (
+    TestSession,
+    session_manager,
+    utc_now_iso,
+)
+from api_service.domain.services.test_scheduler import (
+    CISCO_SWITCH,
+    RECOVERY_RESOURCES,
+    ResourcePool,
+    get_suite_spec,
+    run_schedule,
+)
 import asyncio
 import datetime
+import logging
+import time
 import os
-import json
-import re
+import orjson
+from typing import List
 
 from api_service.api.routes.requests_1c import patch_one_device_1c
 
-
-# Безопасная загрузка JSON-данных с обработкой различных кодировок
-def safe_load_json(file_path):
-    encodings = ["utf-8", "utf-8-sig", "cp1251", "latin1", "windows-1252", "iso-8859-1"]
-
-    # Проверяем существование файла
-    if not os.path.exists(file_path):
-        raise Exception(f"Файл {file_path} не существует")
-
-    # Пробуем разные кодировки
-    for encoding in encodings:
-        try:
-            with open(file_path, "r", encoding=encoding) as f:
-                content = f.read()
-                # Убираем BOM если есть
-                if content.startswith("\ufeff"):
-                    content = content[1:]
-                return json.loads(content)
-        except (UnicodeDecodeError, json.JSONDecodeError) as e:
-            print(f"Не удалось прочитать {file_path} в кодировке {encoding}: {e}")
-            continue
-
-    # Fallback: читаем как бинарные данные и очищаем проблемные байты
-    try:
-        with open(file_path, "rb") as f:
-            raw_data = f.read()
-
-        # Очищаем проблемные байты
-        # Удаляем или заменяем известные проблемные байты
-        problem_bytes = [
-            b"\x97",
-            b"\xce",
-            b"\x81",
-            b"\x82",
-            b"\x83",
-            b"\x84",
-            b"\x85",
-            b"\x86",
-            b"\x87",
-        ]
-        clean_data = raw_data
-        for pb in problem_bytes:
-            clean_data = clean_data.replace(pb, b"?")
-
-        # Декодируем с заменой проблемных символов
-        text_data = clean_data.decode("utf-8", errors="replace")
-
-        # Пытаемся распарсить JSON
-        return json.loads(text_data)
-
-    except Exception as e:
-        raise Exception(f"Не удалось загрузить JSON файл {file_path}: {e}")
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 
 # Функция для отправки статуса
 async def broadcast_status(test_dict: dict, status_to_broadcast: str):
     test_id = test_dict.get("test_id")
     if not test_id:
-        print(f"Ошибка: 'test_id' не найден в словаре теста: {test_dict}")
+        logger.warning(f"'test_id' не найден в словаре теста: {test_dict}")
         return
 
-    print(f"Изменение статуса теста-отправка через websocket для test_id: {test_id}")
-    print(
-        f"broadcast_status test_dict: {test_dict}, status_to_broadcast: {status_to_broadcast}"
+    # Статусы рассылаются на каждом шаге прогона: полный словарь теста только в debug
+    logger.debug(f"broadcast_status {test_id}: {status_to_broadcast}, test_dict: {test_dict}")
+
+    # Подписчики конкретного теста и подписчики сессии устройства
+    topics = [test_id]
+    if test_dict.get("session_id"):
+        topics.append(f"session:{test_dict['session_id']}")
+    # Отправляем полный объект теста вместе со статусом. Неотправленное
+    # отстающему клиенту состояние того же теста заменяется новым
+    send_to_topics(topics, test_dict, key=("status", test_dict.get("session_id"), test_id))
+
+
+def send_to_topics(topics, message: dict, key=None):
+    """
+    Публикует сообщение в топики всех процессов API: оно получает seq,
+    сохраняется для переподключившихся клиентов и ставится в очереди подписчиков.
+    Сеть не ожидается: медленный клиент не задерживает прогон тестов.
+    """
+    backplane.publish(topics, message, key=key)
+
+
+async def execute_robot(
+    robot_file, output_dir, variables=None, listener_token=None, timeout=None, session_id=None
+):
+    """
+    Запускает один набор robot и возвращает (return_code, stderr).
+
+    Если стенд сессии обслуживает подключенный агент, набор выполняется
+    на его хосте, иначе - локально. Семантика таймаута и отмены одинакова.
+    """
+    agent = agent_registry.for_session(session_id) if session_id else None
+    if agent is not None:
+        return await agent_registry.execute(
+            agent, robot_file, output_dir, variables, listener_token, timeout=timeout
+        )
+    return await execute_robot_local(
+        robot_file, output_dir, variables, listener_token, timeout=timeout
     )
 
-    print("connected_clients:", connected_clients)
-    if test_id in connected_clients:
-        clients_to_notify = list(connected_clients[test_id])
-        for client in clients_to_notify:
-            try:
-                # Отправляем полный объект теста вместе со статусом
-                print("await client.send_json()", test_dict)
-                await client.send_json(test_dict)
-            except Exception as e:
-                print(f"Ошибка отправки сообщения клиенту: {e}")
-                if (
-                    test_id in connected_clients
-                    and client in connected_clients[test_id]
-                ):
-                    connected_clients[test_id].remove(client)
-
-
-# Имитация выполнения теста (замените на запуск Robot Framework)
-async def run_robot_test(robot_file, test_id):
-    max_retries = 10
-    return_code = 1
-    attempt = 0
-    # Создаем уникальную директорию для каждого теста
-    output_dir = f"output_{test_id}"
+
+PORTS_ROBOT_FILE = f"{ROBOT_TESTS_DIR}/ports.robot"
+
+
+async def run_ports_recovery(
+    test_id,
+    output_dir,
+    variables,
+    resources: ResourcePool = None,
+    timeout=None,
+    session_id=None,
+):
+    """Перевключение портов коммутатора (ports.robot); возвращает True при успехе"""
+    if not switch_breaker.allow():
+        logger.warning(f"Коммутатор недоступен ({switch_breaker.state}), ports.robot пропущен")
+        return False
+
+    collector = FailureCollector()
+    token = await robot_event_server.register(collector)
+    # Восстановление дергает порты коммутатора - ждем, пока их
+    # не освободят параллельно идущие тесты
+    claimed = set()
+    if resources is not None:
+        claimed = await resources.claim(test_id, RECOVERY_RESOURCES)
+    try:
+        ports_return_code, stderr = await execute_robot(
+            PORTS_ROBOT_FILE, output_dir, variables, token, timeout=timeout, session_id=session_id
+        )
+    except asyncio.TimeoutError:
+        ports_return_code, stderr = TIMEOUT_RETURN_CODE, "ports.robot прерван по таймауту"
+    except BaseException:
+        # Отмена или ошибка запуска: пробная попытка предохранителя не должна зависнуть
+        switch_breaker.abort_trial()
+        raise
+    finally:
+        if resources is not None:
+            await resources.release(test_id, claimed)
+        await robot_event_server.unregister(token)
+
+    logger.debug(f"ports.robot завершился с кодом: {ports_return_code}")
+    if stderr:
+        logger.warning(f"ports.robot stderr: {stderr}")
+    if ports_return_code == 0:
+        switch_breaker.record_success()
+        return True
+    failure_class = classify_failure(
+        ports_return_code, collector.failures, stderr, switch_only=True
+    )
+    if failure_class == SWITCH_DOWN:
+        switch_breaker.record_failure()
+    else:
+        switch_breaker.record_success()
+    return False
+
+
+async def run_robot_test(
+    robot_file,
+    test_id,
+    output_dir=None,
+    variables=None,
+    resources: ResourcePool = None,
+    on_event: EventHandler = None,
+    device_budget: TimeBudget = None,
+    session_id: str = None,
+):
+    # Без каталога сессии - отдельный каталог прогона в общем хранилище
+    own_run_dir = None
+    if output_dir is None:
+        own_run_dir = artifact_store.create_run_dir("default", test_id)
+        output_dir = own_run_dir.path
     os.makedirs(output_dir, exist_ok=True)
-    print(f"Используется директория вывода: {output_dir} для теста {test_id}")
+    logger.debug(f"Используется директория вывода: {output_dir} для теста {test_id}")
 
     # Нормализуем путь к robot файлу для избежания проблем с escape-последовательностями
     normalized_robot_file = robot_file.replace("\\", "/")
 
-    while return_code != 0 and attempt < max_retries:
-        process = await asyncio.create_subprocess_exec(
-            "robot",
-            "--outputdir",
-            output_dir,
-            normalized_robot_file,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-        stdout, stderr = await process.communicate()
-        return_code = process.returncode
-        print(f"Attempt {attempt + 1}: robot_file: {robot_file}")
-        print(f"return_code: {return_code}")
-        if stderr:
-            stderr_decoded = stderr.decode("utf-8", errors="replace")
-            print(f"stderr: {stderr_decoded}")
-        attempt += 1
-        if return_code != 0:
-            print(f"Основной тест {robot_file} не удался, запуск ports.robot...")
-            ports_robot_file = os.path.abspath(
-                os.path.join(
-                    os.path.dirname(__file__), "..", "..", "..", "..", "robot-tests", "ports.robot"
+    # ports.robot пишет свой JSON отдельно, чтобы не затирать результаты теста
+    ports_variables = {
+        **(variables or {}),
+        "JSON_PATH": os.path.join(output_dir, "ports.json"),
+    }
+
+    spec = get_suite_spec(test_id)
+    uses_switch = CISCO_SWITCH in spec.resources
+    policy = RetryPolicy(
+        suite_budget=TimeBudget(spec.timeout or SUITE_TIME_BUDGET),
+        device_budget=device_budget,
+    )
+    history = []
+
+    # Listener стримит события suite/test/keyword основного набора в on_event,
+    # по ним же классифицируется отказ
+    collector = FailureCollector(on_event)
+    listener_token = await robot_event_server.register(collector)
+
+    try:
+        while True:
+            if uses_switch and not switch_breaker.allow():
+                raise SwitchUnavailableError(
+                    f"Коммутатор недоступен, тест {test_id} не запускался",
+                    SWITCH_DOWN,
+                    history,
                 )
+
+            collector.reset()
+            started = time.monotonic()
+            try:
+                return_code, stderr = await execute_robot(
+                    normalized_robot_file,
+                    output_dir,
+                    variables,
+                    listener_token,
+                    timeout=policy.remaining(),
+                    session_id=session_id,
+                )
+            except asyncio.TimeoutError:
+                return_code = TIMEOUT_RETURN_CODE
+                stderr = f"Набор {test_id} прерван: исчерпан бюджет времени"
+            except BaseException:
+                if uses_switch:
+                    switch_breaker.abort_trial()
+                raise
+            logger.debug(f"Attempt {len(history) + 1}: robot_file: {robot_file}")
+            logger.debug(f"return_code: {return_code}")
+            if stderr:
+                logger.warning(f"stderr: {stderr}")
+
+            if return_code == 0:
+                if uses_switch:
+                    switch_breaker.record_success()
+                break
+
+            failure_class = classify_failure(return_code, collector.failures, stderr)
+            if failure_class == SWITCH_DOWN:
+                switch_breaker.record_failure()
+            elif uses_switch:
+                # Коммутатор ответил, упало что-то другое
+                switch_breaker.record_success()
+            decision = policy.next_retry(failure_class)
+            history.append(
+                {
+                    "attempt": len(history) + 1,
+                    "return_code": return_code,
+                    "failure": failure_class,
+                    "duration": round(time.monotonic() - started, 3),
+                    "retry": decision.retry,
+                    "reason": decision.reason,
+                }
             )
-            # Нормализуем путь для избежания проблем с escape-последовательностями
-            ports_robot_file = ports_robot_file.replace("\\", "/")
-            process = await asyncio.create_subprocess_exec(
-                "robot",
-                "--outputdir",
-                output_dir,
-                ports_robot_file,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
+            logger.warning(f"Отказ теста {test_id}: {failure_class}, повтор: {decision.retry} {decision.reason}")
+            if not decision.retry:
+                raise RobotTestError(
+                    f"Robot Framework failed ({failure_class}) after {len(history)} attempts: {decision.reason}",
+                    failure_class,
+                    history,
+                )
+
+            if decision.recovery == RECOVERY_PORTS:
+                logger.warning(f"Основной тест {robot_file} не удался, запуск ports.robot...")
+                await run_ports_recovery(
+                    test_id,
+                    output_dir,
+                    ports_variables,
+                    resources,
+                    timeout=policy.remaining(),
+                    session_id=session_id,
+                )
+            if decision.delay:
+                await asyncio.sleep(decision.delay)
+    finally:
+        await robot_event_server.unregister(listener_token)
+        if own_run_dir is not None:
+            artifact_store.schedule_finalize(own_run_dir)
+
+    logger.info(f"Тест завершён: {robot_file}")
+    return return_code
+
+
+def apply_robot_event(live: dict, event: dict) -> dict:
+    """Обновляет сводку живого прогресса теста по событию listener"""
+    live = dict(live or {})
+    kind = event.get("event")
+    if kind == "start_suite":
+        live.update(
+            suite=event.get("name"),
+            tests_total=event.get("tests"),
+            tests_passed=0,
+            tests_failed=0,
+        )
+    elif kind == "start_test":
+        live["test"] = event.get("name")
+    elif kind == "end_test":
+        if event.get("status") == "PASS":
+            live["tests_passed"] = live.get("tests_passed", 0) + 1
+        elif event.get("status") == "FAIL":
+            live["tests_failed"] = live.get("tests_failed", 0) + 1
+    elif kind == "start_keyword":
+        live["keyword"] = event.get("name")
+    elif kind == "end_keyword":
+        live["last_keyword"] = {
+            "name": event.get("name"),
+            "status": event.get("status"),
+            "elapsed": event.get("elapsed"),
+        }
+    elif kind == "progress":
+        data = event.get("data") or {}
+        live["data"] = data
+        if "progress" in data:
+            live["progress"] = data["progress"]
+    elif kind == "end_suite":
+        live["suite_status"] = event.get("status")
+        live["elapsed"] = event.get("elapsed")
+    return live
+
+
+def make_robot_event_handler(session: TestSession, test_id: str) -> EventHandler:
+    """Обработчик событий listener, который транслирует их в broadcast_status"""
+
+    async def handle_robot_event(event: dict):
+        live = apply_robot_event(session.tests[test_id].get("live"), event)
+        test_item = session.update_test(test_id, live=live)
+        await broadcast_status({**test_item, "event": event}, test_item["status"])
+
+    return handle_robot_event
+
+
+async def run_bench_preflight(session: TestSession, test_ids: List[str]) -> bool:
+    """
+    Проверка стенда перед прогоном. Результат каждой проверки и итоговый
+    отчет отправляются подписчикам сессии и тестов. Если стенд не готов,
+    тесты сразу получают статус error с отчетом, наборы не запускаются.
+    """
+    if not PREFLIGHT_ENABLED or not test_ids:
+        return True
+    topics = [session.topic] + list(test_ids)
+
+    async def on_check(check: dict):
+        send_to_topics(
+            topics, {"type": "preflight_check", "session_id": session.session_id, **check}
+        )
+
+    remote = agent_registry.for_session(session.session_id) is not None
+    report = await run_preflight(
+        test_ids, session.bench_variables, remote=remote, on_check=on_check
+    )
+    session.preflight = report
+    send_to_topics(
+        topics, {"type": "preflight", "session_id": session.session_id, **report}
+    )
+    if report["ok"]:
+        return True
+
+    details = f"Стенд не готов: {', '.join(failed_checks(report))}"
+    print(f"Сессия {session.session_id}: {details}")
+    for test_id in test_ids:
+        if test_id in session.tests:
+            test_item = session.update_test(
+                test_id,
+                status="error",
+                time_end=utc_now_iso(),
+                result={"passed": False, "details": details, "preflight": report},
             )
-            stdout, stderr = await process.communicate()
-            ports_return_code = process.returncode
-            print(f"ports.robot завершился с кодом: {ports_return_code}")
-            if stderr:
-                stderr_decoded = stderr.decode("utf-8", errors="replace")
-                print(f"ports.robot stderr: {stderr_decoded}")
+            await broadcast_status(test_item, "error")
+    return False
 
-    if return_code != 0:
-        raise Exception(f"Robot Framework failed with error after {attempt} attempts")
 
-    print("Тест завершён: ", robot_file)
-    return return_code
+async def run_single_test(test_dict: dict, test_request_payload, session: TestSession):
+    """Запуск одного теста с предварительной проверкой стенда"""
+    session.start_run()
+    if not await run_bench_preflight(session, [test_dict["test_id"]]):
+        return TestStatus.ERROR
+    return await run_test_simulation(test_dict, test_request_payload, session)
+
 
+async def run_tests_sequentially(
+    test_request_payload: TestRequest, session: TestSession = None
+):
+    # Название историческое: наборы запускаются планировщиком параллельно,
+    # насколько позволяют их зависимости и ресурсы стенда
+    print("Запуск всех тестов через планировщик из test_service.py...")
 
-async def run_tests_sequentially(test_request_payload: TestRequest):
-    print("Последовательный запуск всех тестов из test_service.py...")
+    if session is None:
+        session = session_manager.get_or_create(test_request_payload)
+    session.start_run()
 
-    test_status = TestStatus.FAIL
-    wifi_task = None
+    test_order = [test_key for test_key in session.tests.keys() if test_key != "all"]
+    print(f"Тесты для запуска: {test_order}")
 
-    # Определяем порядок тестов: WiFi первым, затем остальные
-    test_order = []
-    other_tests = []
-    
-    for test_key in tests_db.keys():
-        if test_key != "all":
-            if test_key == "wifi":
-                test_order.insert(0, test_key)  # WiFi первым
-            else:
-                other_tests.append(test_key)
-    
-    test_order.extend(other_tests)  # Добавляем остальные тесты
-    
-    print(f"Порядок выполнения тестов: {test_order}")
+    # Неготовый стенд - не ошибка устройства, поэтому статус в 1С не меняется
+    if not await run_bench_preflight(session, test_order):
+        return
 
-    for test_key in test_order:
-        test_item_in_db = tests_db[test_key]
-        test_item_in_db["test_id"] = test_key
+    results = {}
 
+    async def run_scheduled_test(test_key: str):
         current_time_utc_iso = datetime.datetime.now(
             datetime.timezone.utc
         ).strftime("%Y-%m-%dT%H:%M:%SZ")
 
-        test_item_in_db["status"] = "running"
-        test_item_in_db["time_start"] = current_time_utc_iso
-        test_item_in_db["updated_at"] = current_time_utc_iso
-        test_item_in_db["time_end"] = ""
-        test_item_in_db["result"] = None
-
+        test_item_in_db = session.update_test(
+            test_key,
+            status="running",
+            time_start=current_time_utc_iso,
+            updated_at=current_time_utc_iso,
+            time_end="",
+            result=None,
+        )
         await broadcast_status(test_item_in_db, "running")
 
-        # Специальная обработка для WiFi теста - запускаем асинхронно
-        if test_key == "wifi":
-            print("Запуск WiFi теста асинхронно...")
-            wifi_task = asyncio.create_task(
-                run_test_simulation(test_item_in_db, test_request_payload)
-            )
-            # Даем WiFi тесту время на инициализацию
-            await asyncio.sleep(5)
-            print("WiFi тест запущен в фоновом режиме, продолжаем с другими тестами")
-        else:
-            # Обычные тесты выполняем синхронно
-            result = await run_test_simulation(test_item_in_db, test_request_payload)
-
-            if test_status != TestStatus.ERROR or test_status != TestStatus.FAIL:
-                test_status = result
-
-            print(f"Тест завершён: {test_key}")
+        result = await run_test_simulation(
+            test_item_in_db, test_request_payload, session
+        )
+        results[test_key] = result
+        print(f"Тест завершён: {test_key}")
+        return result
+
+    async def skip_scheduled_test(test_key: str, failed_dependencies):
+        test_item = session.update_test(
+            test_key,
+            status="skipped",
+            time_end=utc_now_iso(),
+            result={
+                "passed": False,
+                "details": f"Не запускался: не прошли зависимости {', '.join(sorted(failed_dependencies))}",
+            },
+        )
+        await broadcast_status(test_item, "skipped")
 
-    # Ожидаем завершения WiFi теста, если он был запущен
-    if wifi_task:
-        print("Ожидание завершения WiFi теста...")
-        try:
-            wifi_result = await wifi_task
-            print(f"WiFi тест завершён с результатом: {wifi_result}")
-            
-            # Обновляем общий статус с учетом результата WiFi теста
-            if test_status != TestStatus.ERROR or test_status != TestStatus.FAIL:
-                test_status = wifi_result
-        except Exception as e:
-            print(f"Ошибка при выполнении WiFi теста: {e}")
-            test_status = TestStatus.ERROR
+    try:
+        schedule = await run_schedule(
+            test_order,
+            run_scheduled_test,
+            resources=session.resources,
+            is_success=lambda result: result == TestStatus.SUCCESS,
+            skip_suite=skip_scheduled_test,
+        )
+        session.update_test("all", result={"schedule": schedule.to_dict()})
+        print(
+            f"Все тесты завершены за {schedule.makespan}с, критический путь: {schedule.critical_path}"
+        )
+    except asyncio.CancelledError:
+        # Наборы, которые не успели стартовать, тоже отменены
+        print(f"Прогон тестов сессии {session.session_id} отменен")
+        for test_key in test_order:
+            if session.tests[test_key]["status"] == "idle":
+                test_item = session.update_test(
+                    test_key,
+                    status="cancelled",
+                    result={"passed": False, "details": "Прогон отменен"},
+                )
+                await broadcast_status(test_item, "cancelled")
+        test_item = session.update_test("all", status="cancelled", time_end=utc_now_iso())
+        await broadcast_status(test_item, "cancelled")
+        raise
+    except Exception as e:
+        print(f"Ошибка планировщика тестов: {e}")
+        results["all"] = TestStatus.ERROR
+
+    # Итоговый статус - худший из результатов тестов
+    if TestStatus.ERROR in results.values():
+        test_status = TestStatus.ERROR
+    elif TestStatus.FAIL in results.values():
+        test_status = TestStatus.FAIL
+    elif TestStatus.SUCCESS in results.values():
+        test_status = TestStatus.SUCCESS
+    else:
+        test_status = TestStatus.FAIL
 
     # Преобразуем статус для 1C
     if test_status == TestStatus.ERROR:
@@ -233,18 +473,26 @@ async def run_tests_sequentially(test_request_payload: TestRequest):
 
     await patch_one_device(
         {
-            "serial_number": test_request_payload["serial_number"],
-            "mac_address": [test_request_payload["mac_address"]],
+            "serial_number": session.serial_number,
+            "mac_address": [session.mac_address],
             "change_status_to": test_status,
         }
     )
 
 
-async def run_test_simulation(test_dict: dict, test_request_payload: dict):
+async def run_test_simulation(
+    test_dict: dict, test_request_payload: dict, session: TestSession = None
+):
+    run_dir = None
+    # Итоговый статус теста для записи в finally
+    final_status = None
     try:
-        # Получаем данные из payload
-        mac_address = test_request_payload["mac_address"]
-        serial_number = test_request_payload["serial_number"]
+        if session is None:
+            session = session_manager.get_or_create(test_request_payload)
+
+        # Получаем данные устройства из сессии
+        mac_address = session.mac_address
+        serial_number = session.serial_number
 
         if not mac_address or not serial_number:
             raise ValueError("MAC адрес и серийный номер обязательны")
@@ -252,250 +500,232 @@ async def run_test_simulation(test_dict: dict, test_request_payload: dict):
         test_id = test_dict.get("test_id")
 
         if not test_id:
-            print(f"Ошибка: 'test_id' не найден в словаре: {test_dict}")
+            logger.error(f"Ошибка: 'test_id' не найден в словаре: {test_dict}")
             return
 
-        print(f"run_test_simulation для test_id: {test_id}, data: {test_dict}")
+        logger.debug(f"run_test_simulation для test_id: {test_id}, data: {test_dict}")
         try:
-            # Устанавливаем статус "executing" после начальной фазы
-            await asyncio.sleep(2)
+            # Устанавливаем статус "executing"
             current_time_utc_iso = datetime.datetime.now(
                 datetime.timezone.utc
             ).strftime("%Y-%m-%dT%H:%M:%SZ")
-            if test_id in tests_db:
-                tests_db[test_id]["status"] = "executing"
-                tests_db[test_id]["updated_at"] = current_time_utc_iso
-                print(
-                    f"action await broadcast_status() для test_id: {test_id}, data: {tests_db[test_id]}"
+            if test_id in session.tests:
+                test_item = session.update_test(
+                    test_id, status="executing", updated_at=current_time_utc_iso
                 )
-                await broadcast_status(tests_db[test_id], "executing")
+                logger.debug(
+                    f"action await broadcast_status() для test_id: {test_id}, data: {test_item}"
+                )
+                await broadcast_status(test_item, "executing")
             else:
-                print(f"Ошибка: Тест {test_id} не найден в tests_db (executing).")
+                logger.error(f"Ошибка: Тест {test_id} не найден в сессии {session.session_id} (executing).")
                 return
 
-            # Получаем данные устройства из payload
-            mac_address = test_request_payload["mac_address"]
-            serial_number = test_request_payload["serial_number"]
+            suite = suite_registry.get(test_id)
+            if suite is None:
+                logger.error(f"Ошибка: набор {test_id}.robot не найден в {ROBOT_TESTS_DIR}")
+                raise Exception(f"Файл теста {test_id}.robot не найден")
+            robot_file = suite.path
+
+            # Свежий успешный результат того же устройства, прошивки и версии
+            # набора повторяется без запуска robot
+            suite_version = suite_hash(robot_file)
+            if not session.force_run:
+                cached_execution = await find_cached_result(
+                    test_id, serial_number, mac_address, session.firmware_build, suite_version
+                )
+                if cached_execution is not None:
+                    final_status = "completed"
+                    return await replay_cached_result(session, test_id, cached_execution)
+
+            # Каталог вывода и JSON результаты у каждого запуска свои
+            run_dir = session.create_run_dir(test_id)
+            output_dir = run_dir.path
 
             # Запуск теста Robot Framework
-            print("Запуск Robot Framework...")
-            # Для wifi теста используем wifi_results.json, для остальных - стандартное имя
-            json_filename = f"{test_id}_results.json" if test_id == "wifi" else f"{test_id}.json"
-            json_file = os.path.abspath(
-                os.path.join(
-                    os.path.dirname(__file__),
-                    "..",
-                    "..",
-                    "..",
-                    "..",
-                    "robot-tests",
-                    json_filename,
-                )
-            )
+            logger.info("Запуск Robot Framework...")
+            # Имя файла результатов объявлено в наборе (${JSON_PATH} или Metadata Result File)
+            json_file = os.path.abspath(os.path.join(output_dir, suite.result_file))
             if os.path.isfile(json_file):
                 try:
                     os.remove(json_file)
-                    print(f"Удален файл: {json_file}")
+                    logger.debug(f"Удален файл: {json_file}")
                 except Exception as e:
-                    print(f"Не удалось удалить файл {json_file}: {e}")
+                    logger.warning(f"Не удалось удалить файл {json_file}: {e}")
             else:
-                print(f"Файл {json_file} не существует (это нормально)")
-
-            robot_file = os.path.abspath(
-                os.path.join(
-                    os.path.dirname(__file__),
-                    "..",
-                    "..",
-                    "..",
-                    "..",
-                    "robot-tests",
-                    f"{test_id}.robot",
-                )
-            )
-            if not os.path.isfile(robot_file):
-                print(f"Ошибка: файл {robot_file} не существует")
-                raise Exception(f"Файл теста {robot_file} не найден")
+                logger.debug(f"Файл {json_file} не существует (это нормально)")
 
             # return_code, stdout_decoded, stderr_decoded = await run_robot_test(robot_file, test_id)
-            return_code = await run_robot_test(robot_file, test_id)
+            return_code = await run_robot_test(
+                robot_file,
+                test_id,
+                output_dir=output_dir,
+                variables={**session.bench_variables, "JSON_PATH": json_file},
+                resources=session.resources,
+                on_event=make_robot_event_handler(session, test_id),
+                device_budget=session.device_budget,
+                session_id=session.session_id,
+            )
             # print("Результат выполнения Robot Framework:")
             # print(f"stdout: {stdout_decoded}")
             # if stderr_decoded:
             #     print(f"stderr: {stderr_decoded}")
             #     raise Exception(stderr_decoded)
 
-            # Ожидаем создания JSON файла тестом Robot Framework
-            json_file_check_attempts = 0
-            max_json_check_attempts = 30  # 30 секунд ожидания
-
-            while (
-                not os.path.isfile(json_file)
-                and json_file_check_attempts < max_json_check_attempts
-            ):
-                await asyncio.sleep(1)
-                json_file_check_attempts += 1
-                print(
-                    f"Ожидание создания JSON файла: {json_file} (попытка {json_file_check_attempts})"
-                )
+            # JSON пишется набором до выхода robot, поэтому обычно уже на месте;
+            # иначе ждем событие файловой системы, а не опрашиваем раз в секунду
+            # Файл результатов читается один раз: JSON набора или,
+            # если его нет, output.xml
+            result_file = json_file
+            if not await wait_for_file(json_file):
+                logger.error(f"Ошибка: файл {json_file} не был создан тестом")
+                result_file = os.path.join(output_dir, "output.xml")
 
-            if not os.path.isfile(json_file):
-                print(f"Ошибка: файл {json_file} не был создан тестом")
-                # Создаем базовый JSON файл на основе output.xml как fallback
-                output_xml_file = f"output_{test_id}/output.xml"
-                if os.path.isfile(output_xml_file):
-                    # Безопасное чтение XML файла с обработкой различных кодировок
-                    xml_content = None
-                    encodings = [
-                        "utf-8",
-                        "utf-8-sig",
-                        "cp1251",
-                        "windows-1252",
-                        "iso-8859-1",
-                        "latin1",
-                    ]
-
-                    for encoding in encodings:
-                        try:
-                            with open(output_xml_file, "r", encoding=encoding) as f:
-                                xml_content = f.read()
-                                # Убираем BOM если есть
-                                if xml_content.startswith("\ufeff"):
-                                    xml_content = xml_content[1:]
-                            break
-                        except UnicodeDecodeError as e:
-                            print(
-                                f"Не удалось прочитать XML в кодировке {encoding}: {e}"
-                            )
-                            continue
-
-                    if xml_content is None:
-                        # Fallback: читаем как бинарные данные и очищаем проблемные символы
-                        with open(output_xml_file, "rb") as f:
-                            raw_data = f.read()
-                            # Очищаем проблемные байты
-                            problem_bytes = [
-                                b"\x97",
-                                b"\xce",
-                                b"\x81",
-                                b"\x82",
-                                b"\x83",
-                                b"\x84",
-                                b"\x85",
-                                b"\x86",
-                                b"\x87",
-                            ]
-                            clean_data = raw_data
-                            for pb in problem_bytes:
-                                clean_data = clean_data.replace(pb, b"?")
-                            xml_content = clean_data.decode("utf-8", errors="replace")
-
-                    # Извлекаем статистику тестов из XML
-                    passed_match = re.search(r"(\d+) passed", xml_content)
-                    failed_match = re.search(r"(\d+) failed", xml_content)
-                    total_match = re.search(r"(\d+) test", xml_content)
-
-                    passed_tests = int(passed_match.group(1)) if passed_match else 0
-                    failed_tests = int(failed_match.group(1)) if failed_match else 0
-                    total_tests = int(total_match.group(1)) if total_match else 0
-
-                    progress = (
-                        int((passed_tests / total_tests) * 100)
-                        if total_tests > 0
-                        else 0
-                    )
-
-                    json_data = {
-                        "passed_tests": passed_tests,
-                        "failed_tests": failed_tests,
-                        "total_tests": total_tests,
-                        "progress": progress,
-                        "test_status": "COMPLETED" if failed_tests == 0 else "FAILED",
-                    }
-
-                    # Создаем JSON файл
-                    try:
-                        with open(json_file, "w", encoding="utf-8") as f:
-                            json.dump(json_data, f, indent=4, ensure_ascii=False)
-                        print(f"Создан fallback JSON файл: {json_file}")
-                    except Exception as e:
-                        print(f"Ошибка создания fallback JSON файла: {e}")
-                        json_data = {}  # fallback к пустому словарю
-                else:
-                    print(f"XML файл {output_xml_file} также не найден")
-                    json_data = {}  # fallback к пустому словарю
-
-            # Безопасная загрузка JSON данных
+            ingest = None
             try:
-                json_data = safe_load_json(json_file)
-                print(f"Успешно загружен JSON файл: {json_file}")
+                loaded = load_result_file(result_file)
+                json_data = loaded.data
+                ingest = loaded.to_dict()
+                logger.info(f"Успешно загружен файл результатов: {result_file} за {loaded.parse_ms} мс")
             except Exception as e:
-                print(f"Ошибка загрузки JSON файла {json_file}: {e}")
+                logger.error(f"Ошибка загрузки файла результатов {result_file}: {e}")
                 json_data = {}  # fallback к пустому словарю
 
-            # Сохранение результатов в PostgreSQL
-            test_status_for_1c = await save_test_results_to_db(
-                test_id, json_data, mac_address, serial_number
+            if result_file != json_file and json_data:
+                # Создаем JSON файл на основе output.xml как fallback
+                try:
+                    with open(json_file, "wb") as f:
+                        f.write(orjson.dumps(json_data, option=orjson.OPT_INDENT_2))
+                    logger.info(f"Создан fallback JSON файл: {json_file}")
+                except Exception as e:
+                    logger.error(f"Ошибка создания fallback JSON файла: {e}")
+
+            # Статус набора - из файла результатов; сохранение в PostgreSQL
+            # может не удаться, но прошедший набор от этого не становится упавшим
+            test_status_for_1c, _, _ = evaluate_test_result(test_id, json_data)
+            await save_test_results_to_db(
+                test_id,
+                json_data,
+                mac_address,
+                serial_number,
+                firmware_build=session.firmware_build,
+                suite_version=suite_version,
             )
 
             # Завершение и обновление статуса
-            await asyncio.sleep(3)
             current_time_utc_iso = datetime.datetime.now(
                 datetime.timezone.utc
             ).strftime("%Y-%m-%dT%H:%M:%SZ")
-            if test_id in tests_db:
-                tests_db[test_id]["status"] = "completed"
-                tests_db[test_id]["time_end"] = current_time_utc_iso
-                tests_db[test_id]["updated_at"] = current_time_utc_iso
+            if test_id in session.tests:
                 # Извлекаем progress из json_data, если он есть
                 progress = (
                     json_data.get("progress", 0) if isinstance(json_data, dict) else 0
                 )
 
-                tests_db[test_id]["result"] = {
-                    "passed": True,
-                    "details": f"Test {test_id} completed",
-                    "data": json_data,
-                    "progress": progress,
-                }
-                print(
-                    f"actions await broadcast_status() для test_id: {test_id}, data: {tests_db[test_id]}"
+                # Без файла результатов прогон - ошибка, а не успех
+                has_results = isinstance(json_data, dict) and bool(json_data)
+                status = "completed" if has_results else "error"
+                final_status = status
+                test_item = session.update_test(
+                    test_id,
+                    status=status,
+                    time_end=current_time_utc_iso,
+                    updated_at=current_time_utc_iso,
+                    result={
+                        "passed": has_results,
+                        "details": (
+                            f"Test {test_id} completed"
+                            if has_results
+                            else f"Test {test_id} error - results missing"
+                        ),
+                        "data": json_data,
+                        "progress": progress,
+                        "ingest": ingest,
+                        "artifacts": run_dir.to_dict(),
+                    },
+                )
+                logger.debug(
+                    f"actions await broadcast_status() для test_id: {test_id}, data: {test_item}"
                 )
-                await broadcast_status(tests_db[test_id], "completed")
+                await broadcast_status(test_item, status)
                 return test_status_for_1c  # Сделать возврат в зависимости от прогресса
             else:
-                print(f"Ошибка: Тест {test_id} не найден в tests_db (completed).")
+                logger.error(f"Ошибка: Тест {test_id} не найден в сессии {session.session_id} (completed).")
+                final_status = "error"
                 return TestStatus.ERROR
 
+        except asyncio.CancelledError:
+            logger.info(f"Тест {test_id} отменен")
+            final_status = "cancelled"
+            if test_id in session.tests:
+                test_item = session.update_test(
+                    test_id,
+                    status="cancelled",
+                    time_end=utc_now_iso(),
+                    result={"passed": False, "details": "Тест отменен"},
+                )
+                await broadcast_status(test_item, "cancelled")
+            raise
         except Exception as e:
-            print(f"Ошибка во время теста {test_id}: {str(e)}")
-            import traceback
-
-            traceback.print_exc()  # Для отладки
-            if test_id in tests_db:
+            logger.exception(f"Ошибка во время теста {test_id}: {str(e)}")
+            final_status = "error"
+            if test_id in session.tests:
                 current_time_utc_iso = datetime.datetime.now(
                     datetime.timezone.utc
                 ).strftime("%Y-%m-%dT%H:%M:%SZ")
 
-                tests_db[test_id]["status"] = "error"
-                tests_db[test_id]["time_end"] = current_time_utc_iso
-                tests_db[test_id]["updated_at"] = current_time_utc_iso
-                tests_db[test_id]["result"] = {"passed": False, "details": str(e)}
-                print(
-                    f"actions await broadcast_status() error для test_id: {test_id}, data: {tests_db[test_id]}"
+                result = {"passed": False, "details": str(e)}
+                if isinstance(e, RobotTestError):
+                    # Класс отказа и история попыток для оператора стенда
+                    result["retry"] = e.to_dict()
+                test_item = session.update_test(
+                    test_id,
+                    status="error",
+                    time_end=current_time_utc_iso,
+                    updated_at=current_time_utc_iso,
+                    result=result,
                 )
-                await broadcast_status(tests_db[test_id], "error")
+                logger.debug(
+                    f"actions await broadcast_status() error для test_id: {test_id}, data: {test_item}"
+                )
+                await broadcast_status(test_item, "error")
                 return TestStatus.ERROR
         finally:
-            print(f"Устройство обновлено со статусом COMPLETED")
+            if run_dir is not None:
+                # output.xml сжимается, артефакты переносятся с tmpfs в фоне
+                artifact_store.schedule_finalize(run_dir)
+            if final_status is not None:
+                logger.info(f"Тест {test_id} завершен со статусом {final_status}")
     except Exception as e:
+        logger.exception(f"Критическая ошибка в run_test_simulation: {str(e)}")
+        return TestStatus.ERROR
 
-        print(f"Критическая ошибка в run_test_simulation: {str(e)}")
-        import traceback
 
-        traceback.print_exc()  # Для отладки
-
-        print(f"Устройство обновлено со статусом ERROR")
-        return TestStatus.ERROR
+async def replay_cached_result(session: TestSession, test_id: str, execution: dict):
+    """Завершает тест результатом из test_executions вместо нового прогона"""
+    print(f"Тест {test_id}: используется результат из кэша (execution_id: {execution['id']})")
+    current_time_utc_iso = utc_now_iso()
+    created_at = execution.get("created_at")
+    test_item = session.update_test(
+        test_id,
+        status="completed",
+        time_end=current_time_utc_iso,
+        updated_at=current_time_utc_iso,
+        result={
+            "passed": True,
+            "details": f"Test {test_id} completed (результат из кэша)",
+            "data": execution.get("result_data") or {},
+            "progress": execution.get("progress") or 0,
+            "cached": {
+                "execution_id": execution["id"],
+                "created_at": created_at.isoformat() if created_at else None,
+                "firmware_build": execution.get("firmware_build"),
+                "suite_hash": execution.get("suite_hash"),
+            },
+        },
+    )
+    await broadcast_status(test_item, "completed")
+    return TestStatus.SUCCESS
 
 
 async def patch_one_device(device_for_1C):
@@ -507,8 +737,81 @@ async def patch_one_device(device_for_1C):
         print(f"Ошибка при обновлении статуса устройства в 1С: {e}")
 
 
+def evaluate_test_result(test_id: str, json_data: dict):
+    """
+    Статус набора по его файлу результатов: (статус для 1С, passed, details).
+    Не зависит от того, удалось ли сохранить результаты в PostgreSQL.
+    """
+    result_missing = not isinstance(json_data, dict) or not json_data
+    test_status = (
+        "ERROR" if result_missing else json_data.get("test_status", "COMPLETED")
+    )
+
+    # Определяем успешность теста
+    test_status_for_1C = TestStatus.SUCCESS
+    result_passed = True
+    result_details = f"Test {test_id} completed successfully"
+
+    if test_status in ["FAILED", "ERROR"]:
+        result_passed = False
+        result_details = (
+            f"Test {test_id} error - results missing"
+            if result_missing
+            else f"Test {test_id} failed"
+        )
+
+        if test_status == "FAILED":
+            test_status_for_1C = TestStatus.FAIL
+        elif test_status == "ERROR":
+            test_status_for_1C = TestStatus.ERROR
+
+    elif isinstance(json_data, dict):
+        # Для SIM тестов проверяем результаты слотов
+        if test_id == "sim":
+            for key, value in json_data.items():
+                if key.startswith("slot_") and isinstance(value, dict):
+                    if (
+                        value.get("ping_result") == "fail"
+                        or value.get("connected") == "error"
+                    ):
+                        result_passed = False
+                        result_details = (
+                            f"Test {test_id} failed - slot issues detected"
+                        )
+                        test_status_for_1C = TestStatus.FAIL
+                        break
+
+        # Для Ethernet тестов проверяем интерфейсы
+        elif test_id == "ethernets":
+            interfaces = json_data.get("interfaces", [])
+            # Добавляем дополнительную проверку типа interfaces
+            if isinstance(interfaces, list):
+                for interface in interfaces:
+                    if (
+                        isinstance(interface, dict)
+                        and interface.get("ping_result") == "fail"
+                    ):
+                        result_passed = False
+                        result_details = (
+                            f"Test {test_id} failed - interface ping failures"
+                        )
+                        test_status_for_1C = TestStatus.FAIL
+                        break
+            else:
+                print(
+                    f"Предупреждение: interfaces не является списком в тесте {test_id}"
+                )
+
+    return test_status_for_1C, result_passed, result_details
+
+
 async def save_test_results_to_db(
-    test_id: str, json_data: dict, mac_address: str, serial_number: str
+    test_id: str,
+    json_data: dict,
+    mac_address: str,
+    serial_number: str,
+    firmware_build: str = None,
+    suite_version: str = None,
 ):
     """Сохранение результатов тестов в PostgreSQL базу данных"""
     try:
@@ -516,9 +819,22 @@ async def save_test_results_to_db(
         if db.pool is None:
             print(f"Предупреждение: PostgreSQL недоступен, результаты теста {test_id} не сохранены")
             return
-            
+
+        # Файл результатов не прочитан или пуст - прогон считается ошибкой
+        # и в кэш результатов не попадает (без suite_hash он не находится)
+        result_missing = not isinstance(json_data, dict) or not json_data
+        if result_missing:
+            print(f"Результаты теста {test_id} отсутствуют, выполнение сохраняется как ошибка")
+
         # Создаем запись выполнения теста
-        execution_id = await db.create_test_execution(test_id, "completed")
+        execution_id = await db.create_test_execution(
+            test_id,
+            "error" if result_missing else "completed",
+            serial_number=serial_number,
+            mac_address=mac_address,
+            firmware_build=firmware_build,
+            suite_hash=None if result_missing else suite_version,
+        )
 
         # Определяем время выполнения и статус
         time_start = datetime.datetime.now(datetime.timezone.utc)
@@ -535,63 +851,10 @@ async def save_test_results_to_db(
         except (ValueError, TypeError):
             progress = 0
 
-        test_status = (
-            json_data.get("test_status", "COMPLETED")
-            if isinstance(json_data, dict)
-            else "COMPLETED"
+        test_status_for_1C, result_passed, result_details = evaluate_test_result(
+            test_id, json_data
         )
 
-        # Определяем успешность теста
-        test_status_for_1C = TestStatus.SUCCESS
-        result_passed = True
-        result_details = f"Test {test_id} completed successfully"
-
-        if test_status in ["FAILED", "ERROR"]:
-            result_passed = False
-            result_details = f"Test {test_id} failed"
-
-            if test_status == "FAILED":
-                test_status_for_1C = TestStatus.FAIL
-            elif test_status == "ERROR":
-                test_status_for_1C = TestStatus.ERROR
-
-        elif isinstance(json_data, dict):
-            # Для SIM тестов проверяем результаты слотов
-            if test_id == "sim":
-                for key, value in json_data.items():
-                    if key.startswith("slot_") and isinstance(value, dict):
-                        if (
-                            value.get("ping_result") == "fail"
-                            or value.get("connected") == "error"
-                        ):
-                            result_passed = False
-                            result_details = (
-                                f"Test {test_id} failed - slot issues detected"
-                            )
-                            test_status_for_1C = TestStatus.FAIL
-                            break
-
-            # Для Ethernet тестов проверяем интерфейсы
-            elif test_id == "ethernets":
-                interfaces = json_data.get("interfaces", [])
-                # Добавляем дополнительную проверку типа interfaces
-                if isinstance(interfaces, list):
-                    for interface in interfaces:
-                        if (
-                            isinstance(interface, dict)
-                            and interface.get("ping_result") == "fail"
-                        ):
-                            result_passed = False
-                            result_details = (
-                                f"Test {test_id} failed - interface ping failures"
-                            )
-                            test_status_for_1C = TestStatus.FAIL
-                            break
-                else:
-                    print(
-                        f"Предупреждение: interfaces не является списком в тесте {test_id}"
-                    )
-
         # Обновляем основную запись выполнения
         if db.pool is not None:
             await db.update_test_execution(
@@ -0,0 +1,11 @@
+# Модули сервиса импортируются и как api_service.*, и от каталога api_service
+# (api.routes.*), как при запуске main.py/run_fastapi.py
+import os
+import sys
+
+API_SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVICES_DIR = os.path.dirname(API_SERVICE_DIR)
+
+for path in (API_SERVICE_DIR, SERVICES_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,73 @@
+import asyncio
+import socket
+
+import orjson
+
+from api_service.websocket import backplane as backplane_module
+from api_service.websocket.backplane import Backplane
+
+
+class FakeDb:
+    """ws_events с медленным чтением"""
+
+    def __init__(self, events):
+        self.events = events
+
+    async def get_ws_event(self, event_id):
+        await asyncio.sleep(0.05)
+        return self.events.get(event_id)
+
+
+class FakeConnection:
+    """Advisory locks в памяти"""
+
+    def __init__(self, locks):
+        self.locks = locks
+
+    async def fetchval(self, query, name):
+        if name in self.locks:
+            return False
+        self.locks.add(name)
+        return True
+
+
+def event(n):
+    return orjson.dumps({"origin": "other", "topics": ["tests"], "message": {"n": n}, "key": None}).decode()
+
+
+def test_stored_message_keeps_notify_order(monkeypatch):
+    delivered = []
+    monkeypatch.setattr(backplane_module, "db", FakeDb({7: event(1)}))
+    monkeypatch.setattr(
+        backplane_module.broadcaster,
+        "publish",
+        lambda topics, message, key=None: delivered.append(message["n"]),
+    )
+
+    async def main():
+        bus = Backplane(mode="local")
+        bus._inbox = asyncio.Queue()
+        receiver = asyncio.create_task(bus._receive_loop())
+        bus._on_notify(None, 0, bus.channel, "ref:other:7")
+        bus._on_notify(None, 0, bus.channel, event(2))
+        await asyncio.sleep(0.2)
+        receiver.cancel()
+
+    asyncio.run(main())
+    assert delivered == [1, 2]
+
+
+def test_lock_is_per_host_and_retaken_after_reconnect():
+    async def main():
+        locks = set()
+        bus = Backplane(mode="local")
+        bus._connection = FakeConnection(locks)
+        assert await bus.try_lock("gpio_monitor")
+        assert f"{socket.gethostname()}:gpio_monitor" in locks
+
+        # Обрыв соединения снимает блокировки в PostgreSQL
+        locks.clear()
+        await bus._relock()
+        return locks
+
+    assert asyncio.run(main()) == {f"{socket.gethostname()}:gpio_monitor"}
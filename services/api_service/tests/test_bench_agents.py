@@ -0,0 +1,128 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from app import main
+from api_service.domain.services.bench_agents import (
+    ROBOT_TESTS_DIR,
+    AgentRegistry,
+    BenchAgent,
+    encode_file,
+    is_inside,
+)
+
+
+def test_second_worker_with_agents_does_not_start(monkeypatch):
+    async def try_lock(name):
+        # Блокировку держит первый воркер
+        return False
+
+    monkeypatch.setattr(main.backplane, "try_lock", try_lock)
+    with pytest.raises(RuntimeError):
+        asyncio.run(main.check_bench_agent_workers())
+
+
+def test_web_concurrency_with_agents_is_refused(monkeypatch):
+    async def try_lock(name):
+        return True
+
+    monkeypatch.setattr(main.backplane, "try_lock", try_lock)
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    with pytest.raises(RuntimeError):
+        asyncio.run(main.check_bench_agent_workers())
+
+    monkeypatch.setenv("WEB_CONCURRENCY", "1")
+    asyncio.run(main.check_bench_agent_workers())
+
+
+class FakeAgentSocket:
+    """WebSocket агента: отвечает на run заранее заданным результатом"""
+
+    def __init__(self, registry, files):
+        self.registry = registry
+        self.files = files
+        self.sent = []
+
+    async def send_text(self, data):
+        message = json.loads(data)
+        self.sent.append(message)
+        if message["type"] == "run":
+            agent = self.registry.agents["bench-1"]
+            asyncio.get_running_loop().call_soon(
+                asyncio.ensure_future,
+                self.registry.handle_message(
+                    agent,
+                    {"type": "result", "run_id": message["run_id"], "return_code": 0, "files": self.files},
+                ),
+            )
+
+
+def test_agent_files_stay_inside_output_dir(tmp_path):
+    output_dir = tmp_path / "run"
+    output_dir.mkdir()
+    files = {
+        "result.json": encode_file(b'{"test_status": "COMPLETED"}', compress=True),
+        "../escape.txt": encode_file(b"x"),
+    }
+
+    async def main():
+        registry = AgentRegistry()
+        websocket = FakeAgentSocket(registry, files)
+        agent = BenchAgent("bench-1", websocket, sessions=["slot1"])
+        registry.register(agent)
+        suite = os.path.join(ROBOT_TESTS_DIR, "wifi.robot")
+        result = await registry.execute(
+            agent,
+            suite,
+            str(output_dir),
+            variables={"JSON_PATH": str(output_dir / "result.json"), "ROUTER_IP": "192.168.1.1"},
+            timeout=5,
+        )
+        return result, websocket.sent[0]
+
+    (return_code, _), run_message = asyncio.run(main())
+    assert return_code == 0
+    # Путь внутри каталога прогона уходит агенту относительным
+    assert run_message["suite"] == "wifi.robot"
+    assert run_message["files"] == {"JSON_PATH": "result.json"}
+    assert run_message["variables"] == {"ROUTER_IP": "192.168.1.1"}
+    assert (output_dir / "result.json").read_bytes() == b'{"test_status": "COMPLETED"}'
+    assert not (tmp_path / "escape.txt").exists()
+
+
+def test_is_inside():
+    root = os.path.abspath("robot-tests")
+    assert is_inside(os.path.join(root, "wifi.robot"), root)
+    assert not is_inside(os.path.abspath(os.path.join(root, "..", "secret.robot")), root)
+    assert not is_inside(root + "-other", root)
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, data):
+        self.sent.append(json.loads(data))
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        {"run_id": "r1", "suite": "../../etc/passwd.robot"},
+        {"run_id": "../r1", "suite": "wifi.robot"},
+        {"run_id": "r1", "suite": "wifi.robot", "files": {"JSON_PATH": "../../result.json"}},
+    ],
+)
+def test_agent_rejects_paths_outside_its_dirs(message, tmp_path, monkeypatch):
+    pytest.importorskip("websockets")
+    import bench_agent
+
+    monkeypatch.setattr(bench_agent, "OUTPUT_ROOT", str(tmp_path))
+    client = bench_agent.BenchAgentClient()
+    websocket = RecordingSocket()
+    asyncio.run(client._run(websocket, message))
+
+    assert websocket.sent[0]["return_code"] == bench_agent.INVALID_SUITE_RETURN_CODE
+    assert list(tmp_path.iterdir()) == []
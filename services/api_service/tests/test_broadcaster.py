@@ -0,0 +1,138 @@
+import asyncio
+
+import orjson
+from starlette.websockets import WebSocketState
+
+from api_service.websocket.broadcaster import Broadcaster, ClientSender, Frame
+
+
+class FakeWebSocket:
+    """Клиент, который запоминает seq полученных кадров"""
+
+    application_state = WebSocketState.CONNECTED
+    client_state = WebSocketState.CONNECTED
+    client = ("127.0.0.1", 0)
+
+    def __init__(self):
+        self.received = []
+
+    async def send_text(self, data):
+        self.received.append(orjson.loads(data))
+
+
+class StuckWebSocket(FakeWebSocket):
+    """Клиент, который не принимает данные"""
+
+    async def send_text(self, data):
+        await asyncio.Event().wait()
+
+
+def seqs(frames):
+    return [frame.message["seq"] for frame in frames]
+
+
+def test_publish_assigns_increasing_seq():
+    broadcaster = Broadcaster({})
+    first = broadcaster.publish(["tests"], {"status": "running"})
+    second = broadcaster.publish(["tests"], {"status": "done"})
+    assert second == first + 1 == broadcaster.seq
+
+
+def test_replay_returns_missed_frames_in_order():
+    broadcaster = Broadcaster({})
+    since = broadcaster.publish(["a"], {"n": 1})
+    broadcaster.publish(["b"], {"n": 2})
+    broadcaster.publish(["a"], {"n": 3})
+    broadcaster.publish(["c"], {"n": 4})
+
+    assert seqs(broadcaster.replay(["a", "b"], since)) == [since + 1, since + 2]
+    assert broadcaster.replay(["a"], broadcaster.seq) == []
+
+
+def test_replay_outside_buffer_needs_snapshot():
+    broadcaster = Broadcaster({})
+    started = broadcaster.seq
+    # since от прежнего процесса или из будущего
+    assert broadcaster.replay(["a"], started - 1) is None
+    assert broadcaster.replay(["a"], started + 1) is None
+
+
+def test_replay_after_pruned_topic_needs_snapshot():
+    broadcaster = Broadcaster({})
+    since = broadcaster.seq
+    broadcaster.publish(["firmware:1"], {"stage": "flash"})
+    assert broadcaster.prune_history(ttl=-1) == 1
+
+    assert broadcaster.replay(["firmware:1"], since) is None
+    assert broadcaster.replay(["firmware:1"], broadcaster.seq) == []
+    # Новый буфер топика помнит, что было до него
+    broadcaster.publish(["firmware:1"], {"stage": "test"})
+    assert broadcaster.replay(["firmware:1"], since) is None
+
+
+def test_prune_keeps_topics_with_subscribers():
+    async def main():
+        websocket = FakeWebSocket()
+        broadcaster = Broadcaster({"tests": {websocket}})
+        broadcaster.publish(["tests"], {"n": 1})
+        pruned = broadcaster.prune_history(ttl=-1)
+        broadcaster.discard(websocket)
+        return pruned
+
+    assert asyncio.run(main()) == 0
+
+
+def test_coalesced_state_keeps_seq_order():
+    async def main():
+        websocket = FakeWebSocket()
+        broadcaster = Broadcaster({"tests": {websocket}})
+        broadcaster.publish(["tests"], {"status": "running"}, key="wifi")
+        broadcaster.publish(["tests"], {"event": "log"})
+        broadcaster.publish(["tests"], {"status": "done"}, key="wifi")
+        await asyncio.sleep(0.05)
+        broadcaster.discard(websocket)
+        return websocket.received, broadcaster.stats()
+
+    received, stats = asyncio.run(main())
+    assert [message.get("status") for message in received] == [None, "done"]
+    assert received[0]["seq"] < received[1]["seq"]
+    assert stats["coalesced"] == 1
+    assert stats["sent"] == 2
+
+
+def test_stuck_client_does_not_delay_others():
+    async def main():
+        fast, stuck = FakeWebSocket(), StuckWebSocket()
+        broadcaster = Broadcaster({"tests": {fast, stuck}})
+        for n in range(5):
+            broadcaster.publish(["tests"], {"n": n})
+        await asyncio.sleep(0.05)
+        broadcaster.discard(fast)
+        broadcaster.discard(stuck)
+        return fast.received
+
+    assert [message["n"] for message in asyncio.run(main())] == [0, 1, 2, 3, 4]
+
+
+def test_full_queue_drops_messages_but_coalesces_state():
+    async def main():
+        sender = ClientSender(StuckWebSocket(), max_queue=2)
+        # Писатель забирает первый кадр и зависает на его отправке
+        sender.push(Frame({"n": 0}))
+        await asyncio.sleep(0)
+        results = [
+            sender.push(Frame({"status": "running"}), key="wifi"),
+            sender.push(Frame({"n": 1})),
+            sender.push(Frame({"n": 2})),
+            # Очередь полна, но состояние теста заменяет уже стоящее
+            sender.push(Frame({"status": "done"}), key="wifi"),
+        ]
+        sender.stop()
+        return results, sender
+
+    results, sender = asyncio.run(main())
+    # Клиент отстает меньше WS_SLOW_CLIENT_TIMEOUT - не отключается
+    assert all(results)
+    assert sender.dropped == 1
+    assert sender.coalesced == 1
+    assert sender.queued == 2
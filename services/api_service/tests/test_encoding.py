@@ -0,0 +1,74 @@
+import orjson
+import pytest
+
+from api_service.websocket import encoding
+from api_service.websocket.encoding import (
+    FORMAT_COMPACT,
+    FORMAT_JSON,
+    FORMAT_MSGPACK,
+    compact,
+    encode_frame,
+    negotiate,
+)
+
+GPIO_SUMMARY = {
+    "type": "gpio_event",
+    "pin": 33,
+    "event": "rising",
+    "value": 1,
+    "raw_message": "Событие: rising, Пин: 33, Значение: 1",
+    "event_display": "Пин 33: подъем",
+    "timestamp": "2024-01-01T00:00:01Z",
+    "last_timestamp": "2024-01-01T00:00:01Z",
+    "count": 3,
+    "error": None,
+}
+
+
+class FakeWebSocket:
+    def __init__(self, subprotocols=(), query=None):
+        self.scope = {"subprotocols": list(subprotocols)}
+        self.query_params = query or {}
+
+
+def test_compact_drops_redundant_fields():
+    assert compact({"events": [GPIO_SUMMARY]}) == {
+        "events": [
+            {
+                "type": "gpio_event",
+                "pin": 33,
+                "event": "rising",
+                "value": 1,
+                "last_timestamp": "2024-01-01T00:00:01Z",
+                "count": 3,
+            }
+        ]
+    }
+
+
+def test_compact_frame_is_smaller_than_json():
+    full = encode_frame(GPIO_SUMMARY, FORMAT_JSON)
+    small = encode_frame(GPIO_SUMMARY, FORMAT_COMPACT)
+    assert isinstance(small, str)
+    assert len(small.encode()) < len(full.encode()) / 2
+    assert orjson.loads(small) == compact(GPIO_SUMMARY)
+
+
+def test_negotiate_prefers_subprotocol_then_query():
+    assert negotiate(FakeWebSocket(["compact.v1"])) == (FORMAT_COMPACT, "compact.v1")
+    assert negotiate(FakeWebSocket(query={"format": "compact"})) == (FORMAT_COMPACT, None)
+    assert negotiate(FakeWebSocket(query={"format": "xml"})) == (FORMAT_JSON, None)
+    assert negotiate(FakeWebSocket()) == (FORMAT_JSON, None)
+
+
+def test_msgpack_falls_back_to_compact_without_package(monkeypatch):
+    monkeypatch.setattr(encoding, "msgpack", None)
+    assert negotiate(FakeWebSocket(["msgpack.v1", "compact.v1"])) == (FORMAT_COMPACT, "compact.v1")
+    assert negotiate(FakeWebSocket(query={"format": "msgpack"})) == (FORMAT_COMPACT, None)
+
+
+def test_msgpack_frame_roundtrip():
+    msgpack = pytest.importorskip("msgpack")
+    frame = encode_frame(GPIO_SUMMARY, FORMAT_MSGPACK)
+    assert isinstance(frame, bytes)
+    assert msgpack.unpackb(frame) == compact(GPIO_SUMMARY)
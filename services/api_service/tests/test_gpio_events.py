@@ -0,0 +1,30 @@
+import asyncio
+
+from api_service.websocket import gpio_events
+from api_service.websocket.gpio_events import GpioCoalescer
+
+
+def test_pin_summaries_keep_every_event(monkeypatch):
+    published = []
+    monkeypatch.setattr(
+        gpio_events.backplane,
+        "publish",
+        lambda topics, message, key=None: published.append((topics, message, key)),
+    )
+
+    async def main():
+        coalescer = GpioCoalescer(interval=60, debounce=0)
+        for _ in range(3):
+            for n in range(4):
+                coalescer.submit({"pin": 5, "event": "rising" if n % 2 else "falling"})
+            coalescer.flush()
+        if coalescer._timer is not None:
+            coalescer._timer.cancel()
+
+    asyncio.run(main())
+    pin_frames = [(message, key) for topics, message, key in published if topics == ["gpio:5"]]
+    assert len(pin_frames) == 3
+    # Сводки пина - приращения: без ключа они не сливаются у клиента
+    assert all(key is None for _, key in pin_frames)
+    assert sum(message["count"] for message, _ in pin_frames) == 12
+    assert sum(message["rising"] for message, _ in pin_frames) == 6
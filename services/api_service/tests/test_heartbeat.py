@@ -0,0 +1,52 @@
+import asyncio
+
+import orjson
+from starlette.websockets import WebSocketState
+
+from api_service.app.config import connected_clients
+from api_service.websocket.heartbeat import CLOSE_GOING_AWAY, Heartbeat
+from api_service.websocket.subscriptions import client_topics, disconnect, subscribe
+
+
+class FakeWebSocket:
+    application_state = WebSocketState.CONNECTED
+    client = ("127.0.0.1", 0)
+
+    def __init__(self, connected=True):
+        self.client_state = WebSocketState.CONNECTED if connected else WebSocketState.DISCONNECTED
+        self.received = []
+        self.close_code = None
+
+    async def send_text(self, data):
+        self.received.append(orjson.loads(data))
+
+    async def close(self, code=1000, reason=""):
+        self.close_code = code
+        self.client_state = WebSocketState.DISCONNECTED
+
+
+def test_sweep_reaps_dead_closes_idle_and_pings_live():
+    async def main():
+        heartbeat = Heartbeat(interval=60, idle_timeout=0.05)
+        dead, idle, live = FakeWebSocket(connected=False), FakeWebSocket(), FakeWebSocket()
+        for websocket in (dead, idle, live):
+            subscribe(websocket, ["hb-topic"])
+        heartbeat.track(idle)
+        heartbeat.track(live)
+        await asyncio.sleep(0.1)
+        heartbeat.touch(live)
+
+        heartbeat.sweep()
+        await asyncio.sleep(0.05)
+        stats = heartbeat.stats()
+        topics = {websocket: websocket in client_topics for websocket in (dead, idle, live)}
+        disconnect(live)
+        return dead, idle, live, stats, topics
+
+    dead, idle, live, stats, topics = asyncio.run(main())
+    assert stats["reaped"] == 1
+    assert stats["idle_closed"] == 1
+    assert topics == {dead: False, idle: False, live: True}
+    assert idle.close_code == CLOSE_GOING_AWAY
+    assert [message["type"] for message in live.received] == ["ping"]
+    assert "hb-topic" not in connected_clients
@@ -0,0 +1,119 @@
+import asyncio
+
+from api.routes import post
+from api_service.domain.services import job_queue
+from api_service.domain.services.job_queue import JobWorker
+from api_service.domain.services.session_service import session_manager
+
+
+class FakeQueueDb:
+    """Очередь test_jobs в памяти: задание забирает ровно один воркер"""
+
+    def __init__(self, jobs, cancel_requested=False):
+        self.queued = list(jobs)
+        self.claimed = {}
+        self.finished = {}
+        self.cancel_requested = cancel_requested
+
+    async def claim_test_job(self, worker_id, lease_seconds):
+        if not self.queued:
+            return None
+        job = self.queued.pop(0)
+        self.claimed[job["id"]] = worker_id
+        return job
+
+    async def heartbeat_test_job(self, job_id, worker_id, lease_seconds, snapshot=None):
+        if self.claimed.get(job_id) != worker_id:
+            return None
+        return self.cancel_requested
+
+    async def finish_test_job(self, job_id, worker_id, status, snapshot=None, error=None):
+        self.finished[job_id] = (worker_id, status)
+
+    async def release_test_job(self, job_id, worker_id):
+        self.queued.append({"id": job_id})
+
+
+def make_job(n):
+    return {
+        "id": f"job-{n}",
+        "payload": {
+            "test_id": "all",
+            "mac_address": "",
+            "serial_number": f"SN-queue-{n}",
+            "device_name": "",
+        },
+    }
+
+
+def run_workers(queue_db, monkeypatch, run_seconds, workers=2, wait=0.5):
+    monkeypatch.setattr(job_queue, "db", queue_db)
+    peak = []
+
+    def start_run(self, test_request, session):
+        peak.append(len(self.jobs))
+        return asyncio.create_task(asyncio.sleep(run_seconds))
+
+    monkeypatch.setattr(JobWorker, "_start_run", start_run)
+
+    async def main():
+        pool = [
+            JobWorker(concurrency=1, heartbeat_interval=0.02, poll_interval=0.01)
+            for _ in range(workers)
+        ]
+        for n, worker in enumerate(pool):
+            worker.worker_id = f"worker-{n}"
+            worker.start()
+        await asyncio.sleep(wait)
+        for worker in pool:
+            await worker.stop()
+        return max(peak, default=0)
+
+    try:
+        return asyncio.run(main())
+    finally:
+        for n in range(4):
+            session_manager.sessions.pop(f"SN-queue-{n}", None)
+
+
+def test_each_job_runs_once_within_concurrency(monkeypatch):
+    queue_db = FakeQueueDb([make_job(n) for n in range(4)])
+    peak = run_workers(queue_db, monkeypatch, run_seconds=0.05)
+
+    assert sorted(queue_db.finished) == [f"job-{n}" for n in range(4)]
+    assert all(status == "completed" for _, status in queue_db.finished.values())
+    assert {worker for worker, _ in queue_db.finished.values()} == {"worker-0", "worker-1"}
+    # concurrency=1: воркер не берет второе задание, пока идет первое
+    assert peak == 1
+
+
+def test_cancel_request_stops_the_run(monkeypatch):
+    queue_db = FakeQueueDb([make_job(0)], cancel_requested=True)
+    run_workers(queue_db, monkeypatch, run_seconds=5, workers=1, wait=0.3)
+    assert queue_db.finished == {"job-0": ("worker-0", "cancelled")}
+
+
+def test_stopped_worker_returns_job_to_queue(monkeypatch):
+    queue_db = FakeQueueDb([make_job(0)])
+    run_workers(queue_db, monkeypatch, run_seconds=5, workers=1, wait=0.1)
+    assert queue_db.finished == {}
+    assert queue_db.queued == [{"id": "job-0"}]
+
+
+def test_duplicate_enqueue_leaves_session_untouched(monkeypatch):
+    async def enqueue_test_run(test_request):
+        # У устройства уже есть задание в очереди
+        return None
+
+    monkeypatch.setattr(post, "job_queue_available", lambda: True)
+    monkeypatch.setattr(post, "enqueue_test_run", enqueue_test_run)
+    request = job_queue.TestRequest(**make_job(0)["payload"])
+    session = session_manager.ensure(request)
+    test_id = next(test_id for test_id in session.tests if test_id != "all")
+    session.tests[test_id]["status"] = "running"
+    try:
+        response = asyncio.run(post.run_test(request))
+    finally:
+        session_manager.sessions.pop(session.session_id, None)
+    assert response["message"] == "Тесты уже запущены"
+    assert session.tests[test_id]["status"] == "running"
@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+import pytest
+
+from api_service.domain.services import preflight
+
+
+async def passes(detail="ok", delay=0.0):
+    await asyncio.sleep(delay)
+    return detail
+
+
+async def fails(message, delay=0.0):
+    await asyncio.sleep(delay)
+    raise ConnectionError(message)
+
+
+def use_checks(monkeypatch, *checks):
+    def build_checks(test_ids, bench_variables, remote=False):
+        return [
+            {"name": name, "target": name, "critical": critical, "probe": probe}
+            for name, critical, probe in checks
+        ]
+
+    monkeypatch.setattr(preflight, "build_checks", build_checks)
+
+
+def statuses(report):
+    return {check["name"]: check["status"] for check in report["checks"]}
+
+
+def test_slow_check_times_out_within_budget(monkeypatch):
+    use_checks(monkeypatch, ("router_ssh", True, passes()), ("switch_ssh", True, passes(delay=5)))
+    began = time.monotonic()
+    report = asyncio.run(preflight.run_preflight(["wifi"], budget=0.2))
+
+    assert time.monotonic() - began < 1
+    assert statuses(report) == {"router_ssh": preflight.OK, "switch_ssh": preflight.TIMEOUT}
+    assert not report["ok"]
+    assert preflight.failed_checks(report) == ["switch_ssh"]
+
+
+def test_critical_failure_cancels_remaining_checks(monkeypatch):
+    use_checks(
+        monkeypatch,
+        ("router_ssh", True, fails("connection refused")),
+        ("switch_ssh", True, passes(delay=5)),
+    )
+    began = time.monotonic()
+    report = asyncio.run(preflight.run_preflight(["wifi"], budget=3))
+
+    assert time.monotonic() - began < 1
+    assert statuses(report) == {"router_ssh": preflight.FAILED, "switch_ssh": preflight.CANCELLED}
+
+
+def test_non_critical_failure_is_a_warning(monkeypatch):
+    use_checks(monkeypatch, ("postgres", False, fails("no pool")), ("router_ssh", True, passes(delay=0.05)))
+    report = asyncio.run(preflight.run_preflight(["wifi"], budget=1))
+
+    assert statuses(report) == {"postgres": preflight.FAILED, "router_ssh": preflight.OK}
+    assert report["ok"]
+
+
+def test_remote_run_skips_bench_network_checks(monkeypatch):
+    use_checks(monkeypatch, ("router_ssh", True, None))
+    report = asyncio.run(preflight.run_preflight(["wifi"], remote=True, budget=1))
+    assert statuses(report) == {"router_ssh": preflight.SKIPPED}
+    assert report["ok"]
+
+
+def test_1c_url_without_host_fails():
+    with pytest.raises(ValueError):
+        asyncio.run(preflight.check_1c("http:///api/devices"))
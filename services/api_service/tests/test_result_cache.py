@@ -0,0 +1,45 @@
+import os
+
+from api_service.domain.services.result_cache import suite_hash
+
+
+def write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def bump_mtime(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_hash_is_stable(tmp_path):
+    suite = tmp_path / "wifi.robot"
+    write(suite, "*** Test Cases ***\nT\n    Log    1\n")
+    assert suite_hash(str(suite)) == suite_hash(str(suite))
+    assert len(suite_hash(str(suite))) == 64
+
+
+def test_hash_changes_with_suite(tmp_path):
+    suite = tmp_path / "wifi.robot"
+    write(suite, "*** Test Cases ***\nT\n    Log    1\n")
+    before = suite_hash(str(suite))
+    write(suite, "*** Test Cases ***\nT\n    Log    2\n")
+    bump_mtime(suite)
+    assert suite_hash(str(suite)) != before
+
+
+def test_hash_covers_resources(tmp_path):
+    write(tmp_path / "common.resource", "*** Keywords ***\nK\n    Log    1\n")
+    suite = tmp_path / "wifi.robot"
+    write(suite, "*** Settings ***\nResource    ${CURDIR}/common.resource\n")
+    before = suite_hash(str(suite))
+
+    resource = tmp_path / "common.resource"
+    write(resource, "*** Keywords ***\nK\n    Log    2\n")
+    bump_mtime(resource)
+    assert suite_hash(str(suite)) != before
+
+
+def test_missing_suite_has_no_hash(tmp_path):
+    assert suite_hash(str(tmp_path / "missing.robot")) is None
@@ -0,0 +1,34 @@
+import asyncio
+import time
+
+from api_service.domain.services.result_watcher import wait_for_file
+
+
+def test_existing_file_returns_immediately(tmp_path):
+    path = tmp_path / "result.json"
+    path.write_text("{}")
+    assert asyncio.run(wait_for_file(str(path), timeout=0.1)) is True
+
+
+def test_file_written_later_wakes_waiter(tmp_path):
+    path = tmp_path / "result.json"
+
+    async def main():
+        async def write_later():
+            await asyncio.sleep(0.2)
+            path.write_text("{}")
+
+        writer = asyncio.create_task(write_later())
+        began = time.monotonic()
+        found = await wait_for_file(str(path), timeout=5)
+        await writer
+        return found, time.monotonic() - began
+
+    found, waited = asyncio.run(main())
+    assert found is True
+    # Ожидание заканчивается по событию, а не по таймауту
+    assert waited < 2
+
+
+def test_missing_file_times_out(tmp_path):
+    assert asyncio.run(wait_for_file(str(tmp_path / "result.json"), timeout=0.2)) is False
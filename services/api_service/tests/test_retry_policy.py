@@ -0,0 +1,126 @@
+import time
+
+from api_service.domain.services.retry_policy import (
+    ASSERTION,
+    CONFIGURATION,
+    SSH_CONNECT,
+    SWITCH_DOWN,
+    TIMEOUT,
+    TIMEOUT_RETURN_CODE,
+    UNKNOWN,
+    CircuitBreaker,
+    RetryPolicy,
+    RetryRule,
+    TimeBudget,
+    classify_failure,
+)
+
+
+def failure(kind, message, name=""):
+    return {"kind": kind, "name": name, "message": message}
+
+
+def test_classify_by_return_code():
+    assert classify_failure(252, []) == CONFIGURATION
+    assert classify_failure(TIMEOUT_RETURN_CODE, []) == TIMEOUT
+
+
+def test_classify_ssh_failure_of_test():
+    failures = [
+        failure("end_keyword", "Connection refused", "Open Connection"),
+        failure("end_test", "Connection refused"),
+    ]
+    assert classify_failure(1, failures) == SSH_CONNECT
+
+
+def test_classify_switch_keyword_as_switch_down():
+    failures = [
+        failure("end_keyword", "Unable to connect", "Connect To Cisco Switch"),
+        failure("end_test", "Unable to connect"),
+    ]
+    assert classify_failure(1, failures) == SWITCH_DOWN
+    # ports.robot работает только с коммутатором
+    assert classify_failure(1, [failure("end_test", "Unable to connect")], switch_only=True) == SWITCH_DOWN
+
+
+def test_classify_caught_keyword_failure_is_not_the_cause():
+    # SSH отказ перехвачен внутри TRY, тест упал на проверке
+    failures = [
+        failure("end_keyword", "Connection refused", "Open Connection"),
+        failure("end_test", "'0' != '1'"),
+    ]
+    assert classify_failure(1, failures) == ASSERTION
+
+
+def test_classify_timeout_and_unknown():
+    assert classify_failure(1, [failure("end_test", "Timeout 30 seconds exceeded")]) == TIMEOUT
+    assert classify_failure(1, [], stderr="Traceback: boom") == UNKNOWN
+
+
+def test_policy_limits_attempts_per_class():
+    rules = {ASSERTION: RetryRule(max_attempts=2, backoff=1), UNKNOWN: RetryRule(max_attempts=1)}
+    policy = RetryPolicy(suite_budget=TimeBudget(100), rules=rules)
+
+    first = policy.next_retry(ASSERTION)
+    assert first.retry and first.delay == 1
+    assert not policy.next_retry(ASSERTION).retry
+
+
+def test_policy_backoff_grows_and_is_capped():
+    rule = RetryRule(max_attempts=5, backoff=5, backoff_factor=2, max_backoff=12)
+    assert [rule.delay(attempt) for attempt in (1, 2, 3)] == [5, 10, 12]
+
+
+def test_policy_stops_when_budget_is_spent():
+    rules = {UNKNOWN: RetryRule(max_attempts=5, backoff=10)}
+    policy = RetryPolicy(suite_budget=TimeBudget(100), device_budget=TimeBudget(5), rules=rules)
+    decision = policy.next_retry(UNKNOWN)
+    assert not decision.retry
+    assert "устройства" in decision.reason
+    assert policy.remaining() <= 5
+
+
+def test_breaker_opens_after_threshold_and_allows_one_trial():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.01)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.02)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_breaker_aborted_trial_reopens():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.abort_trial()
+    assert breaker.state == CircuitBreaker.OPEN
+    time.sleep(0.02)
+    assert breaker.allow()
+
+
+def test_breaker_abort_outside_trial_changes_nothing():
+    breaker = CircuitBreaker("test", failure_threshold=1)
+    assert breaker.allow()
+    breaker.abort_trial()
+    assert breaker.failures == 0
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_stale_trial_expires():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.01, trial_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
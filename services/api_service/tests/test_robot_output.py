@@ -0,0 +1,92 @@
+from api_service.domain.services.robot_output import parse_output_xml
+
+OUTPUT_XML = b"""<?xml version="1.0" encoding="UTF-8"?>
+<robot generator="Robot 7.0" rpa="false" schemaversion="5">
+<suite id="s1" name="Wifi">
+<test id="s1-t1" name="Connect">
+<kw name="Open Connection" owner="SSHLibrary">
+<status status="PASS" start="2024-01-01T00:00:00.000000" elapsed="1.500"/>
+</kw>
+<kw name="Log">
+<msg level="INFO">\xff\xfe broken bytes</msg>
+<status status="PASS" start="2024-01-01T00:00:01.500000" elapsed="0.250"/>
+</kw>
+<status status="PASS" start="2024-01-01T00:00:00.000000" elapsed="1.750"/>
+</test>
+<test id="s1-t2" name="Speed">
+<kw name="Open Connection" owner="SSHLibrary">
+<status status="FAIL" start="2024-01-01T00:00:02.000000" elapsed="0.500">Connection refused</status>
+</kw>
+<kw name="Log">
+<status status="NOT RUN" start="2024-01-01T00:00:02.500000" elapsed="0.000"/>
+</kw>
+<status status="FAIL" start="2024-01-01T00:00:02.000000" elapsed="0.500">Connection refused</status>
+</test>
+<status status="FAIL" start="2024-01-01T00:00:00.000000" elapsed="2.250"/>
+</suite>
+<statistics>
+<total>
+<stat pass="1" fail="1" skip="0">All Tests</stat>
+</total>
+</statistics>
+</robot>
+"""
+
+
+def write_output(tmp_path, data):
+    path = tmp_path / "output.xml"
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_parse_statistics_and_tests(tmp_path):
+    summary = parse_output_xml(write_output(tmp_path, OUTPUT_XML))
+
+    assert summary["passed_tests"] == 1
+    assert summary["failed_tests"] == 1
+    assert summary["total_tests"] == 2
+    assert summary["progress"] == 50
+    assert summary["test_status"] == "FAILED"
+    assert not summary["incomplete"]
+    assert summary["tests"] == [
+        {"name": "Connect", "status": "PASS", "message": "", "elapsed": 1.75},
+        {"name": "Speed", "status": "FAIL", "message": "Connection refused", "elapsed": 0.5},
+    ]
+
+
+def test_keyword_timings_skip_not_run(tmp_path):
+    keywords = parse_output_xml(write_output(tmp_path, OUTPUT_XML))["keywords"]
+
+    assert keywords["SSHLibrary.Open Connection"] == {
+        "count": 2,
+        "failed": 1,
+        "elapsed": 2.0,
+        "max": 1.5,
+    }
+    # Невыполненная ветка не считается
+    assert keywords["Log"]["count"] == 1
+
+
+def test_truncated_file_is_parsed_partially(tmp_path):
+    truncated = OUTPUT_XML[: OUTPUT_XML.index(b'<test id="s1-t2"')]
+    summary = parse_output_xml(write_output(tmp_path, truncated))
+
+    assert summary["incomplete"]
+    assert summary["test_status"] == "FAILED"
+    assert summary["passed_tests"] == 1
+    assert summary["total_tests"] == 1
+
+
+def test_rf6_timestamps(tmp_path):
+    data = b"""<?xml version="1.0" encoding="UTF-8"?>
+<robot generator="Robot 6.1">
+<suite id="s1" name="Ports">
+<test id="s1-t1" name="Ports Up">
+<status status="PASS" starttime="20240101 00:00:00.000" endtime="20240101 00:00:02.500"/>
+</test>
+</suite>
+</robot>
+"""
+    summary = parse_output_xml(write_output(tmp_path, data))
+    assert summary["tests"][0]["elapsed"] == 2.5
+    assert summary["test_status"] == "COMPLETED"
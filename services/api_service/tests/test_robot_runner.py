@@ -0,0 +1,86 @@
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import pytest
+
+from api_service.domain.services import robot_runner
+from api_service.domain.services.robot_worker_pool import _descendants, kill_process_tree
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="группы процессов POSIX")
+
+SLOW_SUITE = """*** Settings ***
+Library    Process
+
+*** Test Cases ***
+Slow
+    Start Process    sleep    60    alias=child
+    Sleep    60
+"""
+
+
+def is_running(pid):
+    # Убитый, но не собранный процесс остается зомби - он тоже не работает
+    state = subprocess.run(["ps", "-o", "stat=", "-p", str(pid)], capture_output=True, text=True).stdout
+    return bool(state.strip()) and not state.strip().startswith("Z")
+
+
+def wait_dead(pids, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and any(is_running(pid) for pid in pids):
+        time.sleep(0.05)
+    return not any(is_running(pid) for pid in pids)
+
+
+def test_kill_process_tree_reaches_other_sessions():
+    # Потомок в своей сессии (как у Process library) сигнал группе не получает
+    process = subprocess.Popen(
+        ["sh", "-c", "sleep 60 & setsid sleep 60 & wait"], start_new_session=True
+    )
+    try:
+        deadline = time.monotonic() + 5
+        while len(_descendants(process.pid)) < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        descendants = _descendants(process.pid)
+        assert len(descendants) >= 2
+        kill_process_tree(process.pid)
+        process.wait(timeout=5)
+        assert wait_dead(descendants)
+    finally:
+        if process.poll() is None:
+            process.kill()
+
+
+@pytest.mark.skipif(shutil.which("robot") is None, reason="нет robot в PATH")
+def test_cancel_kills_robot_and_its_children(tmp_path, monkeypatch):
+    monkeypatch.setattr(robot_runner.robot_worker_pool, "size", 0)
+    suite = tmp_path / "slow.robot"
+    suite.write_text(SLOW_SUITE, encoding="utf-8")
+
+    async def main():
+        run = asyncio.create_task(robot_runner.execute_robot_local(str(suite), str(tmp_path)))
+        deadline = time.monotonic() + 30
+        robot_pids = []
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.2)
+            robot_pids = [
+                int(pid)
+                for pid in subprocess.run(
+                    ["pgrep", "-f", str(suite)], capture_output=True, text=True
+                ).stdout.split()
+            ]
+            if robot_pids and any(_descendants(pid) for pid in robot_pids):
+                break
+        tree = robot_pids + [child for pid in robot_pids for child in _descendants(pid)]
+        run.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await run
+        return tree
+
+    tree = asyncio.run(main())
+    # robot и запущенный им sleep
+    assert len(tree) >= 2
+    assert wait_dead([pid for pid in tree if pid != os.getpid()])
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from api_service.domain.services.robot_worker_pool import RobotWorkerPool
+
+# Воркер не должен поднимать приложение API (run_fastapi.py -> app.main)
+CLEAN_WORKER_SUITE = """*** Test Cases ***
+Worker Does Not Import The API
+    ${loaded}=    Evaluate    {'fastapi', 'app.main', 'api_service'} & set(sys.modules)    modules=sys
+    Should Not Be True    ${loaded}
+"""
+
+SLOW_SUITE = """*** Test Cases ***
+Slow
+    Sleep    30
+"""
+
+
+def write_suite(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_worker_runs_suite_without_api_imports(tmp_path):
+    suite = write_suite(tmp_path, "clean.robot", CLEAN_WORKER_SUITE)
+
+    async def main():
+        pool = RobotWorkerPool(1)
+        try:
+            return await pool.run(suite, str(tmp_path / "out"), timeout=60)
+        finally:
+            await pool.stop()
+
+    result = asyncio.run(main())
+    assert result["return_code"] == 0, result["stdout"]
+
+
+def test_timeout_replaces_worker(tmp_path):
+    slow = write_suite(tmp_path, "slow.robot", SLOW_SUITE)
+    clean = write_suite(tmp_path, "clean.robot", CLEAN_WORKER_SUITE)
+
+    async def main():
+        pool = RobotWorkerPool(1)
+        try:
+            await pool.start()
+            first_pid = pool._workers[0].pid
+            with pytest.raises(asyncio.TimeoutError):
+                await pool.run(slow, str(tmp_path / "slow"), timeout=2)
+            result = await pool.run(clean, str(tmp_path / "clean"), timeout=60)
+            return first_pid, pool._workers[0].pid, result
+        finally:
+            await pool.stop()
+
+    first_pid, second_pid, result = asyncio.run(main())
+    assert second_pid != first_pid
+    assert result["return_code"] == 0
@@ -0,0 +1,78 @@
+import asyncio
+import gzip
+import os
+import time
+
+from api_service.domain.services.run_artifacts import ACTIVE_MARKER, ArtifactStore
+
+
+def make_store(tmp_path, **options):
+    options.setdefault("compression", "gzip")
+    options.setdefault("max_age_days", 1)
+    options.setdefault("max_total_mb", 100)
+    return ArtifactStore(root=str(tmp_path / "output"), **options)
+
+
+def finished_run(store, test_id, age_seconds=0, size=10):
+    run = store.create_run_dir("slot1", test_id)
+    # .html не сжимается: размер каталога равен size
+    with open(os.path.join(run.path, "report.html"), "wb") as f:
+        f.write(b"x" * size)
+    asyncio.run(store.finalize(run))
+    stamp = time.time() - age_seconds
+    os.utime(run.final_path, (stamp, stamp))
+    return run
+
+
+def test_finalize_compresses_output_and_clears_marker(tmp_path):
+    store = make_store(tmp_path, scratch_root=str(tmp_path / "scratch"))
+    run = store.create_run_dir("slot1", "wifi")
+    assert os.path.exists(os.path.join(run.final_path, ACTIVE_MARKER))
+    xml = b"<robot>" + b"<kw/>" * 2000 + b"</robot>"
+    with open(os.path.join(run.path, "output.xml"), "wb") as f:
+        f.write(xml)
+    with open(os.path.join(run.path, "log.html"), "w") as f:
+        f.write("<html/>")
+
+    asyncio.run(store.finalize(run))
+
+    assert sorted(os.listdir(run.final_path)) == ["log.html", "output.xml.gz"]
+    with gzip.open(os.path.join(run.final_path, "output.xml.gz")) as f:
+        assert f.read() == xml
+    # Каталог на tmpfs удален после переноса
+    assert not os.path.exists(run.path)
+
+
+def test_sweep_removes_old_runs(tmp_path):
+    store = make_store(tmp_path)
+    old = finished_run(store, "wifi", age_seconds=2 * 86400)
+    fresh = finished_run(store, "wifi")
+
+    assert store.sweep()["removed"] == 1
+    assert not os.path.exists(old.final_path)
+    assert os.path.exists(fresh.final_path)
+
+
+def test_sweep_trims_oldest_over_size_limit(tmp_path):
+    store = make_store(tmp_path, max_total_mb=1.5)
+    oldest = finished_run(store, "wifi", age_seconds=300, size=1024 * 1024)
+    newest = finished_run(store, "sim", age_seconds=100, size=1024 * 1024)
+
+    store.sweep()
+    assert not os.path.exists(oldest.final_path)
+    assert os.path.exists(newest.final_path)
+
+
+def test_sweep_skips_active_runs(tmp_path):
+    store = make_store(tmp_path)
+    run = store.create_run_dir("slot1", "wifi")
+    stamp = time.time() - 2 * 86400
+    os.utime(run.final_path, (stamp, stamp))
+
+    assert store.sweep()["removed"] == 0
+    assert os.path.exists(run.final_path)
+
+    # Маркер упавшего процесса перестает защищать каталог через active_ttl
+    marker = os.path.join(run.final_path, ACTIVE_MARKER)
+    os.utime(marker, (stamp, stamp))
+    assert store.sweep()["removed"] == 1
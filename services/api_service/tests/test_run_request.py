@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from api.routes.post import run_test
+from api_service.domain.services.session_service import session_manager
+from domain.models.test_models import TestRequest as RunRequest
+
+
+def make_request(**fields):
+    payload = {"test_id": "all", "mac_address": "", "serial_number": "SN-1", "device_name": ""}
+    payload.update(fields)
+    return RunRequest(**payload)
+
+
+def test_running_session_is_not_touched():
+    async def main():
+        request = make_request(serial_number="SN-409", device_name="first")
+        session = session_manager.get_or_create(request)
+        session.task = asyncio.create_task(asyncio.sleep(1))
+        tests_before = {test_id: dict(item) for test_id, item in session.tests.items()}
+        try:
+            with pytest.raises(HTTPException) as refused:
+                await run_test(make_request(serial_number="SN-409", device_name="second", force=True))
+        finally:
+            session.task.cancel()
+            session_manager.sessions.pop(session.session_id, None)
+        return refused.value, session, tests_before
+
+    refused, session, tests_before = asyncio.run(main())
+    assert refused.status_code == 409
+    assert session.device_name == "first"
+    assert session.force_run is False
+    assert session.tests == tests_before
+
+
+def test_refused_status_does_not_reset_tests():
+    request = make_request(serial_number="SN-done", status="success")
+    session = session_manager.ensure(request)
+    test_id = next(test_id for test_id in session.tests if test_id != "all")
+    session.tests[test_id]["status"] = "passed"
+    try:
+        response = asyncio.run(run_test(request))
+    finally:
+        session_manager.sessions.pop(session.session_id, None)
+    assert response["message"] == "Тесты уже пройдены"
+    assert session.tests[test_id]["status"] == "passed"
+    assert session.serial_number != "SN-done"
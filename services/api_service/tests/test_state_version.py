@@ -0,0 +1,42 @@
+import asyncio
+
+from api_service.db.db_tests import StateVersion
+
+
+def test_bump_increases_value_and_tag():
+    version = StateVersion()
+    value, tag = version.value, version.tag
+    version.bump()
+    assert version.value == value + 1
+    assert version.tag != tag
+    assert version.tag == f"{version.instance}-{version.value}"
+
+
+def test_tags_differ_between_processes():
+    # Версии двух воркеров с одинаковым счетчиком не совпадают
+    first, second = StateVersion(), StateVersion()
+    second.value = first.value
+    assert first.tag != second.tag
+
+
+def test_wait_returns_false_without_changes():
+    version = StateVersion()
+    assert asyncio.run(version.wait(version.value, 0.05)) is False
+
+
+def test_wait_returns_immediately_for_old_version():
+    version = StateVersion()
+    old = version.value
+    version.bump()
+    assert asyncio.run(version.wait(old, 0)) is True
+
+
+def test_wait_wakes_on_bump():
+    async def main():
+        version = StateVersion()
+        waiter = asyncio.create_task(version.wait(version.value, 5))
+        await asyncio.sleep(0.01)
+        version.bump()
+        return await asyncio.wait_for(waiter, 1)
+
+    assert asyncio.run(main()) is True
@@ -0,0 +1,59 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api_service.app.config import connected_clients
+from api_service.websocket import subscriptions
+from api_service.websocket.endpoint import router
+from api_service.websocket.subscriptions import resolve_topics, topic_name
+
+
+def make_client():
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def test_resolve_topics():
+    assert resolve_topics(["test:wifi", "session:slot1", "gpio", "gpio:33", "firmware:7"]) == [
+        "wifi",
+        "session:slot1",
+        "gpio",
+        "gpio:33",
+        "firmware:7",
+    ]
+    assert topic_name("wifi") == "test:wifi"
+    assert topic_name("gpio:33") == "gpio:33"
+    for name in ("test", "session", "robot:1"):
+        with pytest.raises(ValueError):
+            resolve_topics([name])
+
+
+def test_subscribe_snapshot_and_unsubscribe():
+    with make_client().websocket_connect("/ws") as websocket:
+        websocket.send_json({"type": "subscribe", "topics": ["gpio:33", "session:slot-x"]})
+        snapshot = websocket.receive_json()
+        assert snapshot["type"] == "snapshot"
+        assert set(snapshot["topics"]) == {"gpio:33", "session:slot-x"}
+
+        # Индекс клиента и реестр топиков согласованы
+        (client,) = [ws for ws, topics in subscriptions.client_topics.items() if "gpio:33" in topics]
+        assert client in connected_clients["gpio:33"]
+
+        websocket.send_json({"type": "unsubscribe", "topics": ["gpio:33"]})
+        assert websocket.receive_json() == {"type": "unsubscribed", "topics": ["gpio:33"]}
+        assert "gpio:33" not in connected_clients
+        assert subscriptions.client_topics[client] == {"session:slot-x"}
+
+    # Отключение снимает все подписки клиента
+    assert client not in subscriptions.client_topics
+    assert "session:slot-x" not in connected_clients
+
+
+def test_unknown_topic_is_an_error():
+    with make_client().websocket_connect("/ws") as websocket:
+        websocket.send_json({"type": "subscribe", "topics": ["robot:1"]})
+        reply = websocket.receive_json()
+        assert reply["type"] == "error"
+        websocket.send_json({"type": "ping"})
+        assert websocket.receive_json()["type"] == "pong"
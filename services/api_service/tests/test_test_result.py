@@ -0,0 +1,21 @@
+from api_service.domain.models.test_models import TestStatus as Status
+from api_service.domain.services.test_service import evaluate_test_result
+
+
+def test_passed_suite_is_success_without_database():
+    status, passed, _ = evaluate_test_result("wifi", {"test_status": "COMPLETED", "progress": 100})
+    assert status == Status.SUCCESS
+    assert passed
+
+
+def test_failed_and_missing_results():
+    assert evaluate_test_result("wifi", {"test_status": "FAILED"})[0] == Status.FAIL
+    assert evaluate_test_result("wifi", {})[0] == Status.ERROR
+
+
+def test_failed_interface_ping_fails_ethernets():
+    data = {"interfaces": [{"name": "lan1", "ping_result": "ok"}, {"name": "lan2", "ping_result": "fail"}]}
+    status, passed, details = evaluate_test_result("ethernets", data)
+    assert status == Status.FAIL
+    assert not passed
+    assert "interface" in details
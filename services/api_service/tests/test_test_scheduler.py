@@ -0,0 +1,156 @@
+import asyncio
+import time
+
+import pytest
+
+from api_service.domain.services.test_scheduler import (
+    CISCO_SWITCH,
+    ROUTER_SSH,
+    ResourcePool,
+    SessionResources,
+    SuiteSpec,
+    run_schedule,
+    validate_specs,
+)
+
+
+def schedule(test_ids, specs, results=None, resources=None, delay=0.01):
+    """Прогон планировщика: порядок старта, пропущенные наборы и отчет"""
+    started, skipped = [], []
+    results = results or {}
+
+    async def run_suite(test_id):
+        started.append(test_id)
+        await asyncio.sleep(delay)
+        return results.get(test_id, "ok")
+
+    async def skip_suite(test_id, failed_dependencies):
+        skipped.append((test_id, sorted(failed_dependencies)))
+
+    report = asyncio.run(
+        run_schedule(
+            test_ids,
+            run_suite,
+            resources=resources,
+            specs=specs,
+            is_success=lambda result: result == "ok",
+            skip_suite=skip_suite,
+        )
+    )
+    return started, skipped, report
+
+
+def test_dependency_starts_after_its_dependency():
+    specs = {
+        "b": SuiteSpec("b", depends_on={"a"}),
+        "a": SuiteSpec("a"),
+    }
+    started, skipped, report = schedule(["b", "a"], specs)
+    assert started == ["a", "b"]
+    assert not skipped
+    assert report.suites["b"]["gated_by"] == "a"
+    assert report.critical_path == ["a", "b"]
+
+
+def test_shared_resource_is_exclusive():
+    specs = {
+        "a": SuiteSpec("a", resources={"router"}),
+        "b": SuiteSpec("b", resources={"router"}),
+        "c": SuiteSpec("c", resources={"wifi"}),
+    }
+    _, _, report = schedule(["a", "b", "c"], specs, delay=0.05)
+    suites = report.suites
+    assert suites["b"]["start"] >= suites["a"]["end"]
+    # Набор с другим ресурсом идет параллельно
+    assert suites["c"]["start"] < suites["a"]["end"]
+
+
+def test_dependents_of_failed_suite_are_skipped_transitively():
+    specs = {
+        "c": SuiteSpec("c", depends_on={"b"}),
+        "b": SuiteSpec("b", depends_on={"a"}),
+        "a": SuiteSpec("a"),
+        "d": SuiteSpec("d"),
+    }
+    started, skipped, report = schedule(["c", "b", "a", "d"], specs, results={"a": "fail"})
+    assert sorted(started) == ["a", "d"]
+    assert skipped == [("b", ["a"]), ("c", ["b"])]
+    assert report.suites["c"]["result"] == "skipped"
+
+
+def test_exception_in_suite_counts_as_failure():
+    specs = {"a": SuiteSpec("a"), "b": SuiteSpec("b", depends_on={"a"})}
+    skipped = []
+
+    async def run_suite(test_id):
+        raise RuntimeError("boom")
+
+    async def skip_suite(test_id, failed_dependencies):
+        skipped.append(test_id)
+
+    report = asyncio.run(run_schedule(["a", "b"], run_suite, specs=specs, skip_suite=skip_suite))
+    assert report.suites["a"]["result"] == "RuntimeError"
+    assert skipped == ["b"]
+
+
+def test_release_outside_scheduler_wakes_pending_suites():
+    # Ресурс держит восстановление портов внутри другого набора
+    specs = {"a": SuiteSpec("a", resources={"router"}), "b": SuiteSpec("b", resources={"switch"})}
+
+    async def main():
+        pool = ResourcePool()
+        pool.try_claim("recovery", {"switch"})
+        starts = {}
+        began = time.monotonic()
+
+        async def run_suite(test_id):
+            starts[test_id] = time.monotonic() - began
+            if test_id == "a":
+                await asyncio.sleep(0.05)
+                await pool.release("recovery", {"switch"})
+                await asyncio.sleep(0.5)
+            return "ok"
+
+        await run_schedule(["a", "b"], run_suite, resources=pool, specs=specs)
+        return starts
+
+    starts = asyncio.run(main())
+    assert starts["b"] < 0.4
+
+
+def test_cycle_is_rejected():
+    specs = {"a": SuiteSpec("a", depends_on={"b"}), "b": SuiteSpec("b", depends_on={"a"})}
+    with pytest.raises(ValueError):
+        validate_specs(specs)
+
+
+def test_resource_pool_does_not_block_own_resources():
+    async def main():
+        pool = ResourcePool()
+        assert await pool.claim("a", {"router"}) == {"router"}
+        # Восстановление внутри того же теста не ждет само себя
+        assert await pool.claim("a", {"router", "switch"}) == {"switch"}
+        assert pool.try_claim("b", {"switch"}) is None
+        await pool.release("a", {"switch"})
+        assert pool.try_claim("b", {"switch"}) == {"switch"}
+
+    asyncio.run(main())
+
+
+def test_host_resources_are_shared_between_sessions():
+    async def main():
+        pool = ResourcePool()
+        first, second = SessionResources("slot1", pool), SessionResources("slot2", pool)
+        assert first.try_claim("wifi", {ROUTER_SSH, CISCO_SWITCH}) == {ROUTER_SSH, CISCO_SWITCH}
+        # Роутер у каждого устройства свой, коммутатор на хосте один
+        assert second.try_claim("wifi", {ROUTER_SSH}) == {ROUTER_SSH}
+        assert second.try_claim("ports", {CISCO_SWITCH}) is None
+        assert first.holders() == {ROUTER_SSH: "wifi", CISCO_SWITCH: "wifi"}
+
+        second.clear_released()
+        waiter = asyncio.create_task(second.wait_released())
+        await first.release("wifi", {CISCO_SWITCH})
+        await asyncio.wait_for(waiter, 1)
+        assert second.try_claim("ports", {CISCO_SWITCH}) == {CISCO_SWITCH}
+
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+# WebSocket-эндпоинт агентов стендов
+import hmac
+import json
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+
+from api_service.domain.services.bench_agents import (
+    BENCH_AGENT_ALLOW_INSECURE,
+    BENCH_AGENT_TOKEN,
+    BenchAgent,
+    agent_registry,
+)
+
+router = APIRouter()
+
+
+@router.websocket("/ws/agent")
+async def agent_websocket_endpoint(websocket: WebSocket):
+    """
+    Подключение агента стенда. Первое сообщение - register, затем
+    агент получает run/cancel и присылает event/result.
+    """
+    await websocket.accept()
+    agent = None
+    try:
+        message = json.loads(await websocket.receive_text())
+        if message.get("type") != "register" or not message.get("agent_id"):
+            await websocket.close(code=1008, reason="Ожидалось сообщение register")
+            return
+        if not BENCH_AGENT_TOKEN:
+            if not BENCH_AGENT_ALLOW_INSECURE:
+                print(f"Агент {message.get('agent_id')}: BENCH_AGENT_TOKEN не задан, регистрация отклонена")
+                await websocket.close(code=1008, reason="Регистрация агентов отключена")
+                return
+        elif not hmac.compare_digest(str(message.get("token") or ""), BENCH_AGENT_TOKEN):
+            print(f"Агент {message.get('agent_id')}: неверный токен")
+            await websocket.close(code=1008, reason="Неверный токен агента")
+            return
+
+        agent = BenchAgent(
+            message["agent_id"],
+            websocket,
+            hostname=message.get("hostname", ""),
+            sessions=message.get("sessions") or [],
+            version=message.get("version", ""),
+        )
+        agent_registry.register(agent)
+        await agent.send({"type": "registered", "agent_id": agent.agent_id})
+
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                print(f"Агент {agent.agent_id}: некорректное сообщение")
+                continue
+            await agent_registry.handle_message(agent, message)
+
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"❌ Ошибка в WebSocket агента: {e}")
+    finally:
+        if agent is not None:
+            agent_registry.unregister(agent)
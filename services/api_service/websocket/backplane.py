@@ -0,0 +1,252 @@
+# Шина событий WebSocket между воркерами uvicorn через LISTEN/NOTIFY PostgreSQL
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from typing import Any, Dict, Hashable, Iterable, Optional, Set
+
+import orjson
+
+from api_service.db.postgres_db import db
+from api_service.websocket.broadcaster import broadcaster
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# postgres - события расходятся по всем воркерам; local - только в своем процессе
+WS_BACKPLANE = os.getenv("WS_BACKPLANE", "postgres")
+WS_BACKPLANE_CHANNEL = os.getenv("WS_BACKPLANE_CHANNEL", "ws_events")
+# Пауза перед повторным подключением слушателя после обрыва, секунды
+WS_BACKPLANE_RETRY = float(os.getenv("WS_BACKPLANE_RETRY", "5"))
+# Сколько сообщений может ждать отправки в PostgreSQL
+WS_BACKPLANE_QUEUE_SIZE = int(os.getenv("WS_BACKPLANE_QUEUE_SIZE", "10000"))
+# Сколько хранятся крупные сообщения в ws_events, секунды
+WS_EVENTS_TTL = float(os.getenv("WS_EVENTS_TTL", "300"))
+
+# Лимит payload NOTIFY - 8000 байт, с запасом на служебные поля
+NOTIFY_PAYLOAD_LIMIT = 7900
+# Сколько сообщений отправляется одним обращением к пулу
+NOTIFY_BATCH_SIZE = 100
+
+
+class Backplane:
+    """
+    Публикация событий WebSocket во все процессы API.
+
+    Сообщение сразу доставляется подписчикам своего процесса и ставится в
+    очередь на NOTIFY; каждый воркер слушает канал на одном соединении пула
+    и доставляет чужие сообщения своим подписчикам. Сообщение больше лимита
+    NOTIFY сохраняется в ws_events, в канал уходит только его id. Входящие
+    уведомления разбирает одна задача в порядке поступления, поэтому
+    сообщение из ws_events не обгоняет и не отстает от соседних.
+    Без PostgreSQL (или при обрыве слушателя) события доставляются только
+    в своем процессе, как при одном воркере.
+    """
+
+    def __init__(self, channel: str = WS_BACKPLANE_CHANNEL, mode: str = WS_BACKPLANE):
+        self.channel = channel
+        self.mode = mode
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._connection = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._sender: Optional[asyncio.Task] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._inbox: Optional[asyncio.Queue] = None
+        self._receiver: Optional[asyncio.Task] = None
+        # Advisory locks этого процесса; после переподключения берутся снова
+        self._locks: Set[str] = set()
+        self.sent = 0
+        self.received = 0
+        self.stored = 0
+        self.failed = 0
+
+    @property
+    def active(self) -> bool:
+        return self._connection is not None
+
+    def publish(
+        self, topics: Iterable[str], message: Dict[str, Any], key: Optional[Hashable] = None
+    ) -> int:
+        """Публикует сообщение в топики всех процессов; возвращает локальный seq"""
+        topics = list(topics)
+        seq = broadcaster.publish(topics, message, key)
+        if self.active:
+            # Сериализация сразу: словарь сообщения может измениться до отправки
+            payload = orjson.dumps(
+                {"origin": self.origin, "topics": topics, "message": message, "key": key},
+                default=str,
+                option=orjson.OPT_NON_STR_KEYS,
+            ).decode("utf-8")
+            try:
+                self._queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                self.failed += 1
+                logger.warning("Очередь шины WebSocket переполнена, сообщение доставлено только локально")
+        return seq
+
+    def _deliver(self, event: Dict[str, Any]):
+        key = event.get("key")
+        broadcaster.publish(event["topics"], event["message"], tuple(key) if isinstance(key, list) else key)
+        self.received += 1
+
+    async def _receive(self, payload: str):
+        # Сообщение своего процесса уже доставлено в publish
+        if payload.startswith("ref:"):
+            origin, _, event_id = payload[len("ref:"):].rpartition(":")
+            if origin == self.origin:
+                return
+            payload = await db.get_ws_event(int(event_id))
+            if payload is None:
+                logger.warning(f"Сообщение шины {event_id} уже удалено из ws_events")
+                return
+        event = orjson.loads(payload)
+        if event.get("origin") != self.origin:
+            self._deliver(event)
+
+    async def _receive_loop(self):
+        while True:
+            payload = await self._inbox.get()
+            try:
+                await self._receive(payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Не удалось доставить сообщение шины WebSocket: {e}")
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            self._inbox.put_nowait(payload)
+        except asyncio.QueueFull:
+            self.failed += 1
+            logger.warning("Очередь входящих сообщений шины WebSocket переполнена")
+
+    async def _send_loop(self):
+        purged_at = 0.0
+        while True:
+            payloads = [await self._queue.get()]
+            while len(payloads) < NOTIFY_BATCH_SIZE and not self._queue.empty():
+                payloads.append(self._queue.get_nowait())
+            try:
+                for i, payload in enumerate(payloads):
+                    if len(payload.encode("utf-8")) > NOTIFY_PAYLOAD_LIMIT:
+                        event_id = await db.store_ws_event(payload)
+                        payloads[i] = f"ref:{self.origin}:{event_id}"
+                        self.stored += 1
+                await db.notify(self.channel, payloads)
+                self.sent += len(payloads)
+
+                loop_time = asyncio.get_running_loop().time()
+                if self.stored and loop_time - purged_at > WS_EVENTS_TTL:
+                    purged_at = loop_time
+                    await db.purge_ws_events(WS_EVENTS_TTL)
+            except Exception as e:
+                self.failed += len(payloads)
+                logger.warning(f"Ошибка отправки {len(payloads)} сообщений в шину WebSocket: {e}")
+
+    async def _connect(self):
+        connection = await db.pool.acquire()
+        lost = asyncio.Event()
+        try:
+            await connection.add_listener(self.channel, self._on_notify)
+            connection.add_termination_listener(lambda _connection: lost.set())
+        except Exception:
+            await db.pool.release(connection)
+            raise
+        self._connection = connection
+        logger.info(f"Шина WebSocket: LISTEN {self.channel} ({self.origin})")
+        return lost
+
+    async def _relock(self):
+        """Advisory locks снимаются вместе с соединением - берем их снова"""
+        for lock_name in sorted(self._locks):
+            try:
+                if await self._connection.fetchval("SELECT pg_try_advisory_lock(hashtext($1))", lock_name):
+                    continue
+            except Exception as e:
+                logger.error(f"Шина WebSocket: не удалось снова взять блокировку {lock_name}: {e}")
+                continue
+            logger.error(
+                f"Шина WebSocket: блокировку {lock_name} после переподключения занял другой "
+                f"процесс, задача может выполняться дважды"
+            )
+
+    async def _listen(self, lost: asyncio.Event):
+        while True:
+            await lost.wait()
+            logger.warning("Шина WebSocket: соединение LISTEN потеряно, события только локальные")
+            connection, self._connection = self._connection, None
+            try:
+                await db.pool.release(connection)
+            except Exception:
+                pass
+            while True:
+                await asyncio.sleep(WS_BACKPLANE_RETRY)
+                try:
+                    lost = await self._connect()
+                    await self._relock()
+                    break
+                except Exception as e:
+                    logger.warning(f"Шина WebSocket: повторное подключение не удалось: {e}")
+
+    async def start(self):
+        """Подключает шину; без PostgreSQL события остаются в процессе"""
+        if self.mode != "postgres" or db.pool is None or self._listener is not None:
+            logger.info("Шина WebSocket: события доставляются только в своем процессе")
+            return
+        self._queue = asyncio.Queue(maxsize=WS_BACKPLANE_QUEUE_SIZE)
+        self._inbox = asyncio.Queue(maxsize=WS_BACKPLANE_QUEUE_SIZE)
+        try:
+            lost = await self._connect()
+        except Exception as e:
+            logger.warning(f"Шина WebSocket недоступна, события только локальные: {e}")
+            return
+        self._sender = asyncio.create_task(self._send_loop())
+        self._receiver = asyncio.create_task(self._receive_loop())
+        self._listener = asyncio.create_task(self._listen(lost))
+
+    async def stop(self):
+        tasks = [task for task in (self._listener, self._sender, self._receiver) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._listener = self._sender = self._receiver = None
+        self._locks.clear()
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                await connection.remove_listener(self.channel, self._on_notify)
+                await db.pool.release(connection)
+            except Exception as e:
+                logger.warning(f"Ошибка закрытия соединения шины WebSocket: {e}")
+
+    async def try_lock(self, name: str) -> bool:
+        """
+        Advisory lock на соединении шины: задача (монитор GPIO) запускается
+        только в одном воркере хоста. Имя блокировки включает hostname, так
+        что хосты с общей базой не мешают друг другу. Без шины процесс
+        считается единственным.
+        """
+        if not self.active:
+            return True
+        lock_name = f"{socket.gethostname()}:{name}"
+        locked = await self._connection.fetchval("SELECT pg_try_advisory_lock(hashtext($1))", lock_name)
+        if locked:
+            self._locks.add(lock_name)
+        return locked
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode if self.active else "local",
+            "origin": self.origin,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "inbox": self._inbox.qsize() if self._inbox is not None else 0,
+            "sent": self.sent,
+            "received": self.received,
+            "stored": self.stored,
+            "failed": self.failed,
+        }
+
+
+# Глобальная шина событий WebSocket
+backplane = Backplane()
@@ -0,0 +1,372 @@
+# Рассылка сообщений клиентам WebSocket без ожидания сети
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Hashable, Iterable, List, Optional, Tuple, Union
+
+from fastapi import WebSocket
+from starlette.websockets import WebSocketState
+
+from api_service.app.config import ConnectedClients, connected_clients
+from api_service.websocket.encoding import FORMAT_JSON, encode_frame, encode_stats
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Сколько сообщений может ждать отправки одному клиенту
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+# Предельное время одной отправки, секунды
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5"))
+# Клиент, очередь которого переполнена дольше этого времени, отключается
+WS_SLOW_CLIENT_TIMEOUT = float(os.getenv("WS_SLOW_CLIENT_TIMEOUT", "10"))
+
+# Сколько последних сообщений каждого топика хранится для переподключившихся клиентов
+WS_REPLAY_BUFFER = int(os.getenv("WS_REPLAY_BUFFER", "200"))
+# Буфер топика без подписчиков и новых сообщений дольше этого времени удаляется, секунды
+WS_REPLAY_TTL = float(os.getenv("WS_REPLAY_TTL", "3600"))
+
+# Счетчики ClientSender, которые суммируются в статистике рассылки
+SENDER_COUNTERS = ("sent", "bytes_sent", "coalesced", "dropped")
+
+# Код закрытия для отстающих клиентов: "попробуйте позже"
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+def is_connected(websocket: WebSocket) -> bool:
+    return (
+        websocket.application_state == WebSocketState.CONNECTED
+        and websocket.client_state == WebSocketState.CONNECTED
+    )
+
+
+class Frame:
+    """
+    Сообщение рассылки и его кодировки: кадр в каждый формат кодируется
+    один раз и один и тот же объект отправляется всем клиентам формата
+    """
+
+    __slots__ = ("message", "_encoded")
+
+    def __init__(self, message: Any):
+        self.message = message
+        self._encoded: Dict[str, Union[str, bytes]] = {}
+
+    def encoded(self, fmt: str = FORMAT_JSON) -> Union[str, bytes]:
+        data = self._encoded.get(fmt)
+        if data is None:
+            data = self._encoded[fmt] = encode_frame(self.message, fmt)
+        return data
+
+
+class ClientSender:
+    """
+    Очередь отправки одного клиента и задача-писатель.
+
+    Сообщения с ключом (состояние теста) схлопываются: если предыдущее
+    состояние того же теста еще не отправлено, оно заменяется новым и
+    переносится в конец очереди, чтобы клиент получал seq по возрастанию.
+    При переполнении новые сообщения без ключа отбрасываются; клиент,
+    который не догоняет дольше WS_SLOW_CLIENT_TIMEOUT, отключается.
+    """
+
+    def __init__(
+        self, websocket: WebSocket, fmt: str = FORMAT_JSON, max_queue: int = WS_SEND_QUEUE_SIZE
+    ):
+        self.websocket = websocket
+        self.format = fmt
+        self.max_queue = max_queue
+        self._order: Deque[Hashable] = deque()
+        # Кадры в очереди: один и тот же Frame у всех клиентов
+        self._pending: Dict[Hashable, Frame] = {}
+        self._wakeup = asyncio.Event()
+        self._seq = 0
+        self.overflow_since: Optional[float] = None
+        self.closed = False
+        self.sent = 0
+        self.bytes_sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self._task = asyncio.create_task(self._writer())
+
+    def push(self, frame: Frame, key: Optional[Hashable] = None, force: bool = False) -> bool:
+        """
+        Ставит кадр в очередь без ожидания; False - клиента пора отключить.
+        force - без ограничения очереди (снимок и повтор пропущенного при подключении).
+        """
+        if self.closed:
+            return False
+        if key is not None and key in self._pending:
+            self._pending[key] = frame
+            # Новый кадр старше всех в очереди: на прежнем месте он ушел бы
+            # раньше кадров с меньшим seq
+            self._order.remove(key)
+            self._order.append(key)
+            self.coalesced += 1
+            return True
+
+        if len(self._order) >= self.max_queue and not force:
+            now = time.monotonic()
+            if self.overflow_since is None:
+                self.overflow_since = now
+            self.dropped += 1
+            return now - self.overflow_since < WS_SLOW_CLIENT_TIMEOUT
+        self.overflow_since = None
+
+        if key is None:
+            self._seq += 1
+            key = ("_", self._seq)
+        self._pending[key] = frame
+        self._order.append(key)
+        self._wakeup.set()
+        return True
+
+    async def _writer(self):
+        try:
+            while True:
+                if not self._order:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                key = self._order.popleft()
+                data = self._pending.pop(key).encoded(self.format)
+                if isinstance(data, bytes):
+                    await asyncio.wait_for(self.websocket.send_bytes(data), WS_SEND_TIMEOUT)
+                else:
+                    await asyncio.wait_for(self.websocket.send_text(data), WS_SEND_TIMEOUT)
+                self.sent += 1
+                self.bytes_sent += len(data)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Клиент {self.websocket.client} не принял сообщение за {WS_SEND_TIMEOUT}с, отключение"
+            )
+            await self.close()
+        except Exception as e:
+            logger.warning(f"Ошибка отправки сообщения клиенту {self.websocket.client}: {e}")
+            # Закрытие переводит сокет в DISCONNECTED - писатель не пересоздается
+            await self.close(code=1011, reason="Ошибка отправки")
+
+    @property
+    def queued(self) -> int:
+        return len(self._order)
+
+    async def close(
+        self, code: int = CLOSE_TRY_AGAIN_LATER, reason: str = "Клиент не успевает получать сообщения"
+    ):
+        self.closed = True
+        self._order.clear()
+        self._pending.clear()
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+        if is_connected(self.websocket):
+            try:
+                await asyncio.wait_for(self.websocket.close(code=code, reason=reason), WS_SEND_TIMEOUT)
+            except Exception:
+                pass
+
+    def stop(self):
+        self.closed = True
+        self._task.cancel()
+
+
+class TopicHistory:
+    """Кольцевой буфер последних кадров топика: (seq, кадр)"""
+
+    def __init__(self, size: int = WS_REPLAY_BUFFER, evicted: int = 0):
+        self.frames: Deque[Tuple[int, Frame]] = deque(maxlen=size)
+        # Последний вытесненный seq: пропуски до него уже не восстановить
+        self.evicted = evicted
+        self.updated = time.monotonic()
+
+    def append(self, seq: int, frame: Frame):
+        if len(self.frames) == self.frames.maxlen:
+            self.evicted = self.frames[0][0]
+        self.frames.append((seq, frame))
+        self.updated = time.monotonic()
+
+    def since(self, seq: int) -> Optional[List[Tuple[int, Frame]]]:
+        if seq < self.evicted:
+            return None
+        return [item for item in self.frames if item[0] > seq]
+
+
+class Broadcaster:
+    """
+    Отправители всех подключенных клиентов; рассылка не ждет сеть.
+    Сообщение кодируется один раз на рассылку (и на формат), а не на каждого клиента.
+
+    Каждое опубликованное сообщение получает seq и попадает в буфер топика,
+    поэтому переподключившийся клиент получает только пропущенное.
+    """
+
+    def __init__(self, registry: ConnectedClients = connected_clients):
+        self.registry = registry
+        self._senders: Dict[WebSocket, ClientSender] = {}
+        # Формат кадров, согласованный с клиентом при подключении
+        self._formats: Dict[WebSocket, str] = {}
+        # seq начинается с текущего времени в мс, чтобы после перезапуска API
+        # не совпасть с seq, который клиент видел у прежнего процесса
+        self._seq = int(time.time() * 1000)
+        self._started_seq = self._seq
+        self._history: Dict[str, TopicHistory] = {}
+        # Последний seq удаленных буферов: пропущенное до него не восстановить
+        self._pruned: Dict[str, int] = {}
+        self.messages = 0
+        self.encode_seconds = 0.0
+        self.encoded_bytes = 0
+        # Счетчики отключившихся клиентов, чтобы итоги не убывали
+        self._closed = dict.fromkeys(SENDER_COUNTERS, 0)
+
+    def _sender(self, websocket: WebSocket) -> Optional[ClientSender]:
+        sender = self._senders.get(websocket)
+        if sender is not None and sender.closed:
+            self.discard(websocket)
+            return None
+        if sender is None:
+            if not is_connected(websocket):
+                return None
+            sender = ClientSender(websocket, self._formats.get(websocket, FORMAT_JSON))
+            self._senders[websocket] = sender
+        return sender
+
+    def encode(self, message: Any) -> Frame:
+        """Кадр сообщения; JSON кодируется сразу, остальные форматы - по требованию"""
+        started = time.perf_counter()
+        frame = Frame(message)
+        data = frame.encoded(FORMAT_JSON)
+        self.encode_seconds += time.perf_counter() - started
+        self.messages += 1
+        self.encoded_bytes += len(data)
+        return frame
+
+    def set_format(self, websocket: WebSocket, fmt: str):
+        """Формат кадров клиента; задается до первой отправки"""
+        if fmt != FORMAT_JSON:
+            self._formats[websocket] = fmt
+
+    @property
+    def seq(self) -> int:
+        """seq последнего опубликованного сообщения"""
+        return self._seq
+
+    def publish(self, topics: Iterable[str], message: Dict[str, Any], key: Optional[Hashable] = None) -> int:
+        """
+        Публикует сообщение в топики: присваивает seq, сохраняет кадр в буферы
+        топиков и ставит его в очереди подписчиков. Возвращает seq.
+        """
+        self._seq += 1
+        seq = self._seq
+        frame = self.encode({**message, "seq": seq})
+        clients = set()
+        for topic in topics:
+            history = self._history.get(topic)
+            if history is None:
+                history = self._history[topic] = TopicHistory(evicted=self._pruned.pop(topic, 0))
+            history.append(seq, frame)
+            clients.update(self.registry.get(topic, ()))
+        self.send(clients, frame, key)
+        return seq
+
+    def replay(self, topics: Iterable[str], since: int) -> Optional[List[Frame]]:
+        """
+        Кадры топиков с seq > since по порядку. None - часть пропущенного
+        уже вытеснена из буфера (или since от прежнего процесса), нужен снимок.
+        """
+        if since < self._started_seq or since > self._seq:
+            return None
+        missed = []
+        for topic in set(topics):
+            history = self._history.get(topic)
+            if history is None:
+                # Буфер топика удален prune_history: пропущенное после since
+                # могло быть в нем
+                if since < self._pruned.get(topic, 0):
+                    return None
+                continue
+            frames = history.since(since)
+            if frames is None:
+                return None
+            missed.extend(frames)
+        missed.sort(key=lambda item: item[0])
+        return [frame for _, frame in missed]
+
+    def prune_history(self, ttl: float = WS_REPLAY_TTL) -> int:
+        """
+        Удаляет буферы давно молчащих топиков без подписчиков (завершенные
+        циклы прошивки, старые сессии), чтобы память не росла за смену.
+        Клиент, вернувшийся к такому топику, получит снимок.
+        """
+        now = time.monotonic()
+        stale = [
+            topic
+            for topic, history in self._history.items()
+            if now - history.updated > ttl and not self.registry.get(topic)
+        ]
+        for topic in stale:
+            history = self._history.pop(topic)
+            if history.frames:
+                self._pruned[topic] = history.frames[-1][0]
+        return len(stale)
+
+    def send(
+        self,
+        websockets: Iterable[WebSocket],
+        message: Any,
+        key: Optional[Hashable] = None,
+        force: bool = False,
+    ):
+        """Ставит сообщение в очереди клиентов (каждому один раз) и сразу возвращается"""
+        websockets = set(websockets)
+        if not websockets:
+            return
+        frame = message if isinstance(message, Frame) else self.encode(message)
+        for websocket in websockets:
+            sender = self._sender(websocket)
+            if sender is None:
+                continue
+            if not sender.push(frame, key, force):
+                logger.warning(
+                    f"Клиент {websocket.client} отстает дольше {WS_SLOW_CLIENT_TIMEOUT}с "
+                    f"(отброшено {sender.dropped}), отключение"
+                )
+                asyncio.create_task(sender.close())
+
+    def discard(self, websocket: WebSocket):
+        """Останавливает писателя клиента после отключения"""
+        self._formats.pop(websocket, None)
+        sender = self._senders.pop(websocket, None)
+        if sender is not None:
+            sender.stop()
+            for name in SENDER_COUNTERS:
+                self._closed[name] += getattr(sender, name)
+
+    def stats(self) -> Dict[str, Any]:
+        senders = list(self._senders.values())
+        return {
+            "clients": len(senders),
+            "topics": len(self.registry),
+            "history_topics": len(self._history),
+            "formats": {
+                fmt: {
+                    "frames": stats["frames"],
+                    "bytes": stats["bytes"],
+                    "encode_ms": round(stats["seconds"] * 1000, 3),
+                }
+                for fmt, stats in encode_stats.items()
+            },
+            "messages": self.messages,
+            "encode_ms": round(self.encode_seconds * 1000, 3),
+            "encoded_bytes": self.encoded_bytes,
+            "queued": sum(s.queued for s in senders),
+            **{
+                name: self._closed[name] + sum(getattr(s, name) for s in senders)
+                for name in SENDER_COUNTERS
+            },
+        }
+
+
+# Глобальный рассыльщик сообщений WebSocket
+broadcaster = Broadcaster()
@@ -0,0 +1,91 @@
+# Форматы кадров WebSocket: JSON по умолчанию и компактные по запросу клиента
+import os
+import time
+from typing import Any, Dict, Optional, Tuple, Union
+
+import orjson
+from fastapi import WebSocket
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Полный JSON, как раньше
+FORMAT_JSON = "json"
+# JSON без избыточного текста: raw_message, event_display, пустые поля
+FORMAT_COMPACT = "compact"
+# Компактная схема в MessagePack, бинарные кадры (нужен пакет msgpack)
+FORMAT_MSGPACK = "msgpack"
+
+# Сжатие permessage-deflate (uvicorn согласует его с браузером сам); сжимает
+# любой формат, компактный - дополнительно к нему
+WS_PER_MESSAGE_DEFLATE = os.getenv("WS_PER_MESSAGE_DEFLATE", "1") == "1"
+
+# Подпротоколы Sec-WebSocket-Protocol в порядке предпочтения сервера
+SUBPROTOCOLS = {FORMAT_MSGPACK: "msgpack.v1", FORMAT_COMPACT: "compact.v1"}
+
+# Поля, которые дублируют остальные поля события в виде текста
+COMPACT_DROP_FIELDS = frozenset(("raw_message", "event_display"))
+
+# Время и объем кодирования по форматам: каждый кадр кодируется в формат
+# один раз, сколько бы клиентов его ни получало
+encode_stats: Dict[str, Dict[str, float]] = {}
+
+
+def compact(message: Any) -> Any:
+    """
+    Компактная схема: без raw_message и event_display (есть value и event),
+    без полей со значением null, без timestamp в сводке пина (он равен last_timestamp)
+    """
+    if isinstance(message, dict):
+        result = {
+            key: compact(value)
+            for key, value in message.items()
+            if value is not None and key not in COMPACT_DROP_FIELDS
+        }
+        if "last_timestamp" in result:
+            result.pop("timestamp", None)
+        return result
+    if isinstance(message, (list, tuple)):
+        return [compact(item) for item in message]
+    return message
+
+
+def encode_frame(message: Any, fmt: str = FORMAT_JSON) -> Union[str, bytes]:
+    """
+    Кадр в формате клиента. JSON кадры остаются текстовыми, как у send_json,
+    MessagePack - бинарные.
+    """
+    started = time.perf_counter()
+    if fmt == FORMAT_MSGPACK:
+        frame = msgpack.packb(compact(message), default=str)
+    else:
+        if fmt == FORMAT_COMPACT:
+            message = compact(message)
+        frame = orjson.dumps(message, default=str, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+    stats = encode_stats.setdefault(fmt, {"frames": 0, "bytes": 0, "seconds": 0.0})
+    stats["frames"] += 1
+    stats["bytes"] += len(frame)
+    stats["seconds"] += time.perf_counter() - started
+    return frame
+
+
+def negotiate(websocket: WebSocket) -> Tuple[str, Optional[str]]:
+    """
+    Формат кадров клиента и подпротокол для ответа. Клиент предлагает
+    подпротокол msgpack.v1 / compact.v1 или передает ?format=compact|msgpack;
+    без них - JSON. MessagePack без установленного msgpack заменяется compact.
+    """
+    offered = websocket.scope.get("subprotocols") or []
+    for fmt, subprotocol in SUBPROTOCOLS.items():
+        if subprotocol in offered and (fmt != FORMAT_MSGPACK or msgpack is not None):
+            return fmt, subprotocol
+
+    fmt = websocket.query_params.get("format", FORMAT_JSON)
+    if fmt == FORMAT_MSGPACK and msgpack is None:
+        return FORMAT_COMPACT, None
+    if fmt in (FORMAT_COMPACT, FORMAT_MSGPACK):
+        return fmt, None
+    return FORMAT_JSON, None
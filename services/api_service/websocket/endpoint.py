@@ -1,71 +1,93 @@
-# WebSocket-эндпоинт
+# WebSocket-эндпоинты
+import orjson
 from fastapi import WebSocket, APIRouter, WebSocketDisconnect
-from typing import Dict
-from api_service.app.config import connected_clients, ConnectedClients
-from db.db_tests import tests_db
-import importlib.util
-import os
-from typing import List
-import json
-
-# Загружаем types модуль напрямую
-types_path = os.path.join(os.path.dirname(__file__), "types.py")
-spec = importlib.util.spec_from_file_location("websocket_types", types_path)
-types_module = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(types_module)
-TestsDatabase = types_module.TestsDatabase
+from api_service.app.config import connected_clients
+from api_service.db.db_tests import tests_db
+from api_service.websocket.backplane import backplane
+from api_service.websocket.broadcaster import broadcaster
+from api_service.websocket.gpio_events import gpio_coalescer
+from api_service.websocket.heartbeat import heartbeat
+from api_service.websocket.subscriptions import (
+    GPIO_TOPIC,
+    accept,
+    client_topics,
+    disconnect,
+    gpio_pin,
+    open_topics,
+    parse_since,
+    resolve_topics,
+    topic_name,
+    unsubscribe,
+)
 
 router = APIRouter()
 
 
-# Вспомогательная асинхронная функция для регистрации клиента и отправки статуса
-async def _subscribe_and_send_initial_status(
-    websocket: WebSocket,
-    current_test_id: str,
-    tests_db_ref: TestsDatabase,
-    connected_clients_ref: ConnectedClients,
-):
+@router.websocket("/ws")
+async def multiplexed_websocket_endpoint(websocket: WebSocket):
     """
-    Регистрирует WebSocket для указанного test_id и отправляет его текущий статус.
+    Одно соединение на все топики. Клиент отправляет:
+        {"type": "subscribe", "topics": ["test:wifi", "session:slot1", "gpio:33", "firmware"], "since": <seq>}
+        {"type": "unsubscribe", "topics": [...]}
+        {"type": "ping"} / {"type": "pong"}
+    Сервер периодически присылает {"type": "ping"}; клиент, не приславший
+    ничего дольше WS_IDLE_TIMEOUT, отключается.
+    На подписку приходит один кадр snapshot со всеми топиками (или только
+    пропущенные сообщения, если передан since), затем - сообщения топиков.
     """
-    print(f"Подписка клиента на test_id: {current_test_id}")  # Для отладки
-    if current_test_id not in connected_clients_ref:
-        connected_clients_ref[current_test_id] = []
-
-    # Избегаем дублирования одного и того же websocket в списке для одного test_id
-    if websocket not in connected_clients_ref[current_test_id]:
-        connected_clients_ref[current_test_id].append(websocket)
-
-    print(f"connected_clients_ref: {connected_clients_ref}")  # Для отладки
-    print(f"Отправка начального статуса для test_id: {current_test_id}")  # Для отладки
-    if current_test_id in tests_db_ref:
-        print("current_test_id: ", current_test_id)
-        # print("tests_db_ref: ", tests_db_ref)
-        print("tests_db_ref[current_test_id]: ", tests_db_ref[current_test_id])
-        await websocket.send_json(
-            {
-                "test_id": current_test_id,
-                "status": tests_db_ref[current_test_id]["status"],
-                "time_start": tests_db_ref[current_test_id]["time_start"],
-                "updated_at": tests_db_ref[current_test_id]["updated_at"],
-                "time_end": tests_db_ref[current_test_id]["time_end"],
-                "result": tests_db_ref[current_test_id]["result"],
-            }
-        )
-    else:
-        await websocket.send_json(
-            {
-                "test_id": current_test_id,
-                "status": "pending_initiation",
-                "time_start": None,
-                "updated_at": None,
-                "time_end": None,
-                "result": None,
-            }
-        )
+    await accept(websocket)
+    heartbeat.track(websocket)
+    try:
+        while True:
+            data = await websocket.receive_text()
+            heartbeat.touch(websocket)
+            try:
+                message = orjson.loads(data)
+                action = message.get("type")
+                names = message.get("topics") or []
+                if action in ("subscribe", "unsubscribe"):
+                    resolved = resolve_topics(names)
+            except (ValueError, AttributeError) as e:
+                broadcaster.send([websocket], {"type": "error", "message": str(e)})
+                continue
+
+            if action == "subscribe":
+                topics = client_topics.get(websocket, ())
+                new_topics = [topic for topic in resolved if topic not in topics]
+                replayed = open_topics(websocket, new_topics, since=parse_since(message.get("since")))
+                if replayed:
+                    broadcaster.send(
+                        [websocket],
+                        {
+                            "type": "subscribed",
+                            "topics": [topic_name(topic) for topic in new_topics],
+                            "seq": broadcaster.seq,
+                        },
+                    )
+            elif action == "unsubscribe":
+                unsubscribe(websocket, resolved)
+                broadcaster.send(
+                    [websocket],
+                    {"type": "unsubscribed", "topics": [topic_name(topic) for topic in resolved]},
+                )
+            elif action == "ping":
+                broadcaster.send([websocket], {"type": "pong", "seq": broadcaster.seq})
+            elif action == "pong":
+                pass
+            else:
+                broadcaster.send(
+                    [websocket], {"type": "error", "message": f"Неизвестное сообщение: {action}"}
+                )
 
+    except WebSocketDisconnect:
+        pass
 
-gpio_connections: List[WebSocket] = []
+    except Exception as e:
+        print(f"❌ Ошибка в WebSocket /ws: {e}")
+
+    finally:
+        heartbeat.forget(websocket)
+        disconnect(websocket)
 
 
 @router.websocket("/ws/gpio")
@@ -73,21 +95,27 @@ async def gpio_websocket_endpoint(websocket: WebSocket):
     """
     WebSocket для получения событий GPIO в реальном времени
     """
-    await websocket.accept()
-    gpio_connections.append(websocket)
+    await accept(websocket)
 
     print(
-        f"✅ Новое GPIO WebSocket подключение. Всего подключений: {len(gpio_connections)}"
+        f"✅ Новое GPIO WebSocket подключение. Всего подключений: {len(connected_clients.get(GPIO_TOPIC, ())) + 1}"
     )
 
     try:
         # Отправляем подтверждение подключения
-        await websocket.send_json(
+        broadcaster.send(
+            [websocket],
             {
                 "type": "connection_established",
                 "message": "Подключен к мониторингу GPIO",
-                "connections_count": len(gpio_connections),
-            }
+                "connections_count": len(connected_clients.get(GPIO_TOPIC, ())) + 1,
+                "seq": broadcaster.seq,
+            },
+            force=True,
+        )
+        # Пропущенные события (?since=<seq>), затем подписка на новые
+        open_topics(
+            websocket, [GPIO_TOPIC], parse_since(websocket.query_params.get("since")), snapshot="none"
         )
 
         # Держим соединение открытым
@@ -95,66 +123,19 @@ async def gpio_websocket_endpoint(websocket: WebSocket):
             data = await websocket.receive_text()
             # Обрабатываем входящие сообщения от клиента (например, ping)
             if data == "ping":
-                await websocket.send_json({"type": "pong", "timestamp": "..."})
+                broadcaster.send([websocket], {"type": "pong", "seq": broadcaster.seq})
 
     except WebSocketDisconnect:
-        gpio_connections.remove(websocket)
-        print(
-            f"🔌 GPIO WebSocket отключен. Осталось подключений: {len(gpio_connections)}"
-        )
+        pass
 
     except Exception as e:
         print(f"❌ Ошибка в GPIO WebSocket: {e}")
-        if websocket in gpio_connections:
-            gpio_connections.remove(websocket)
-
-
-# Функция для парсинга GPIO событий из логов Node.js
-async def parse_and_broadcast_gpio_event(log_line: str):
-    """
-    Парсит строку лога Node.js и рассылает события через WebSocket
-    """
-    try:
-        # Парсим события изменения GPIO
-        if "Событие:" in log_line and "GPIO:" in log_line:
-            parts = log_line.split("|")
-            if len(parts) >= 3:
-                event_part = parts[0].strip()
-                value_part = parts[1].strip()
-                time_part = parts[2].strip() if len(parts) > 2 else ""
-
-                # Извлекаем тип события и значение
-                event_type = "🔼 ПОДЪЕМ" if "🔼" in event_part else "🔽 СПАД"
-                value = int(value_part.replace("GPIO:", "").strip())
-
-                event_data = {
-                    "type": "gpio_event",
-                    "event": "rising" if "🔼" in event_type else "falling",
-                    "value": value,
-                    "event_display": event_type,
-                    "timestamp": time_part.replace("Время:", "").strip(),
-                    "raw_message": log_line.strip(),
-                }
 
-                await broadcast_gpio_event(event_data)
-                return
-
-        # Парсим ошибки
-        elif "❌ Ошибка:" in log_line:
-            error_data = {
-                "type": "error",
-                "message": log_line.replace("❌ Ошибка:", "").strip(),
-                "raw_message": log_line.strip(),
-            }
-            await broadcast_gpio_event(error_data)
-            return
-
-        # Логируем другие сообщения для отладки
-        elif "✅" in log_line or "Инициализация" in log_line:
-            print(f"[GPIO Monitor] {log_line.strip()}")
-
-    except Exception as e:
-        print(f"❌ Ошибка парсинга GPIO лога: {e}")
+    finally:
+        disconnect(websocket)
+        print(
+            f"🔌 GPIO WebSocket отключен. Осталось подключений: {len(connected_clients.get(GPIO_TOPIC, ()))}"
+        )
 
 
 # Функция для парсинга GPIO событий из логов Node.js
@@ -209,107 +190,70 @@ async def parse_and_broadcast_gpio_event(log_line: str):
 async def websocket_endpoint(
     websocket: WebSocket, test_id: str
 ):  # 'test_id' здесь - это значение из URL
-    print("websocket_endpoint")
     print(f"Запрос на подключение к WebSocket для test_id из URL: {test_id}")
-    await websocket.accept()
-
-    # Список фактических test_id, на которые этот WebSocket был подписан.
-    # Важно для корректной отписки.
-    subscribed_ids_for_this_connection = []
+    await accept(websocket)
 
+    # Подписка "all" - на все тесты, каждый тест отдельным кадром
+    topics = list(tests_db.keys()) if test_id == "all" else [test_id]
     try:
-        if test_id == "all":
-            # Если клиент хочет подписаться на все тесты
-            print("Клиент запросил подписку на все тесты.")
-            for (
-                actual_db_test_id
-            ) in tests_db.keys():  # Используем другое имя переменной для итерации
-                await _subscribe_and_send_initial_status(
-                    websocket, actual_db_test_id, tests_db, connected_clients
-                )
-                subscribed_ids_for_this_connection.append(actual_db_test_id)
-        else:
-            # Если клиент хочет подписаться на конкретный тест
-            print(f"Клиент запросил подписку на конкретный test_id: {test_id}")
-            await _subscribe_and_send_initial_status(
-                websocket,
-                test_id,  # Используем test_id из URL
-                tests_db,
-                connected_clients,
-            )
-            subscribed_ids_for_this_connection.append(test_id)
+        # Переподключение с ?since=<seq>: только пропущенные изменения вместо снимка
+        open_topics(
+            websocket, topics, parse_since(websocket.query_params.get("since")), snapshot="frames"
+        )
 
         # Держим соединение открытым для получения обновлений
         while True:
-            await websocket.receive_text()  # Ожидаем сообщения от клиента (или используйте asyncio.sleep(1) если клиенты только слушают)
-            # Например, можно добавить обработку ping от клиента для поддержания соединения
-            # data = await websocket.receive_text()
-            # if data == "ping":
-            #     await websocket.send_text("pong")
+            await websocket.receive_text()
 
     except WebSocketDisconnect:
-        exception_websocket_disconnect_endpoint(
-            e, websocket, "test_id", test_id, subscribed_ids_for_this_connection
-        )
+        print(f"Клиент test_id {test_id} отсоединился")
 
     except Exception as e:
-        exception_websocket_endpoint(e, websocket)
+        print(f"Ошибка в WebSocket test_id {test_id}: {e}")
 
+    finally:
+        disconnect(websocket)
 
-async def exception_websocket_endpoint(exception: Exception, websocket: WebSocket):
-    print(f"Ошибка в WebSocket: {exception}")
-    if not websocket.client_state.DISCONNECTED:
-        await websocket.close(code=1008, reason=str(exception))
 
+@router.websocket("/ws/sessions/{session_id}")
+async def session_websocket_endpoint(websocket: WebSocket, session_id: str):
+    """
+    WebSocket для всех тестов одной сессии (устройства/слота стенда)
+    """
+    await accept(websocket)
+    topics = [f"session:{session_id}"]
+    try:
+        open_topics(
+            websocket, topics, parse_since(websocket.query_params.get("since")), snapshot="frames"
+        )
 
-async def exception_websocket_disconnect_endpoint(
-    exception: Exception,
-    websocket: WebSocket,
-    type_ws_id: str,
-    subscribed_id: str,
-    subscribed_ids_for_this_connection: list,
-):
-    print(
-        f"Клиент отсоединился (изначальный запрос был для {type_ws_id}: {subscribed_id} ). Очистка подписок..."
-    )
-    for subscribed_id in subscribed_ids_for_this_connection:
-        if (subscribed_id in connected_clients) and (
-            websocket in connected_clients[subscribed_id]
-        ):
-            connected_clients[subscribed_id].remove(websocket)
-            if not connected_clients[subscribed_id]:
-                del connected_clients[subscribed_id]
-                print(
-                    f"Удален пустой список клиентов для {type_ws_id}: {subscribed_id}"
-                )
-    print(
-        f"Подписки для отсоединенного клиента (изначальный запрос: '{type_ws_id}: {subscribed_id}') очищены."
-    )
+        while True:
+            await websocket.receive_text()
+
+    except WebSocketDisconnect:
+        print(f"Клиент сессии {session_id} отсоединился")
+
+    except Exception as e:
+        print(f"Ошибка в WebSocket сессии {session_id}: {e}")
+
+    finally:
+        disconnect(websocket)
 
 
 async def broadcast_gpio_event(event_data: dict):
     """
-    Рассылает событие GPIO всем подключенным WebSocket клиентам
+    Рассылает событие GPIO: изменения пинов - пачками через gpio_coalescer,
+    остальные (ошибки монитора) - сразу подписчикам всех пинов и пина события
     """
-    if not gpio_connections:
+    if event_data.get("type") == "gpio_event":
+        gpio_coalescer.submit(event_data)
         return
 
-    message = json.dumps(event_data, ensure_ascii=False)
-    disconnected_connections = []
-
-    for connection in gpio_connections:
-        try:
-            await connection.send_text(message)
-        except Exception as e:
-            print(f"❌ Ошибка отправки GPIO события: {e}")
-            disconnected_connections.append(connection)
-
-    # Удаляем отключенные соединения
-    for connection in disconnected_connections:
-        if connection in gpio_connections:
-            gpio_connections.remove(connection)
-
-    if disconnected_connections:
-        print(
-            f"🔌 Удалено отключенных GPIO соединений: {len(disconnected_connections)}"
-        )
+    topics = [GPIO_TOPIC]
+    pin = gpio_pin(event_data)
+    if pin is not None:
+        event_data = {**event_data, "pin": int(pin)}
+        topics.append(f"{GPIO_TOPIC}:{pin}")
+    # Событие сохраняется в буфере топика даже без подключенных клиентов,
+    # чтобы переподключившийся клиент получил пропущенное
+    backplane.publish(topics, event_data)
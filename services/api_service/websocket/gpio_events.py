@@ -0,0 +1,114 @@
+# Доставка событий GPIO пачками: дребезг и частые импульсы не заваливают клиентов
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from api_service.websocket.backplane import backplane
+from api_service.websocket.subscriptions import GPIO_TOPIC, gpio_pin, gpio_state
+
+# Период сборки пачки событий GPIO, миллисекунды
+GPIO_FLUSH_INTERVAL_MS = float(os.getenv("GPIO_FLUSH_INTERVAL_MS", "20"))
+# Минимальный интервал между кадрами одного пина (подавление дребезга), миллисекунды
+GPIO_DEBOUNCE_MS = float(os.getenv("GPIO_DEBOUNCE_MS", "50"))
+
+
+class GpioCoalescer:
+    """
+    Копит события GPIO по пинам и раз в GPIO_FLUSH_INTERVAL_MS публикует
+    одну пачку: в топик gpio - кадр gpio_batch со всеми пинами, в топик
+    gpio:<pin> - сводное событие пина. Пин, кадр которого ушел меньше
+    GPIO_DEBOUNCE_MS назад, ждет следующей пачки. Сводка хранит точное число
+    событий (всего, подъемов, спадов), первое и последнее время и последнее
+    значение пина. Таймер ставится только при наличии событий.
+    """
+
+    def __init__(
+        self,
+        interval: float = GPIO_FLUSH_INTERVAL_MS / 1000,
+        debounce: float = GPIO_DEBOUNCE_MS / 1000,
+    ):
+        self.interval = interval
+        self.debounce = debounce
+        self._pending: Dict[Optional[str], Dict[str, Any]] = {}
+        self._last_sent: Dict[Optional[str], float] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.received = 0
+        self.batches = 0
+
+    def submit(self, event_data: Dict[str, Any]):
+        """Добавляет событие в пачку пина без ожидания"""
+        self.received += 1
+        pin = gpio_pin(event_data)
+        received_ms = int(time.time() * 1000)
+        batch = self._pending.get(pin)
+        if batch is None:
+            batch = self._pending[pin] = {
+                "count": 0,
+                "rising": 0,
+                "falling": 0,
+                "first_timestamp": event_data.get("timestamp"),
+                "first_received_ms": received_ms,
+            }
+        batch["count"] += 1
+        if event_data.get("event") in ("rising", "falling"):
+            batch[event_data["event"]] += 1
+        batch["last_timestamp"] = event_data.get("timestamp")
+        batch["last_received_ms"] = received_ms
+        batch["event"] = event_data
+        self._schedule(self.interval)
+
+    def _schedule(self, delay: float):
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(delay, self.flush)
+
+    def _summary(self, pin: Optional[str], batch: Dict[str, Any]) -> Dict[str, Any]:
+        event = batch.pop("event")
+        summary = {**event, **batch}
+        if pin is not None:
+            summary["pin"] = int(pin)
+        return summary
+
+    def flush(self):
+        """Публикует пачку пинов, для которых истекло окно дребезга"""
+        self._timer = None
+        now = time.monotonic()
+        events: List[Dict[str, Any]] = []
+        wait = None
+        for pin in list(self._pending):
+            remaining = self.debounce - (now - self._last_sent.get(pin, float("-inf")))
+            if remaining > 0:
+                wait = remaining if wait is None else min(wait, remaining)
+                continue
+            self._last_sent[pin] = now
+            summary = self._summary(pin, self._pending.pop(pin))
+            events.append(summary)
+            if pin is not None:
+                gpio_state[pin] = summary
+                # Сводка - приращение за пачку, поэтому идет без ключа:
+                # слияние в очереди клиента потеряло бы счетчики событий
+                backplane.publish([f"{GPIO_TOPIC}:{pin}"], summary)
+
+        if events:
+            self.batches += 1
+            backplane.publish(
+                [GPIO_TOPIC],
+                {
+                    "type": "gpio_batch",
+                    "count": sum(event["count"] for event in events),
+                    "events": events,
+                },
+            )
+        if self._pending:
+            self._schedule(max(wait or 0, self.interval))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "received": self.received,
+            "batches": self.batches,
+            "pending": sum(batch["count"] for batch in self._pending.values()),
+        }
+
+
+# Глобальный сборщик событий GPIO
+gpio_coalescer = GpioCoalescer()
@@ -0,0 +1,123 @@
+# Проверка живости клиентов WebSocket и очистка оборванных подключений
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+from fastapi import WebSocket
+
+from api_service.websocket.broadcaster import broadcaster, is_connected
+from api_service.websocket.subscriptions import client_topics, disconnect
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Период ping клиентам /ws и обхода реестра подключений, секунды
+WS_HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", "20"))
+# Клиент /ws, не приславший ничего (в том числе pong) дольше этого времени, отключается
+WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "60"))
+
+# Ping протокола WebSocket от uvicorn для всех эндпоинтов: соединение без pong
+# закрывается сервером, и эндпоинт получает WebSocketDisconnect
+WS_PING_INTERVAL = float(os.getenv("WS_PING_INTERVAL", "20"))
+WS_PING_TIMEOUT = float(os.getenv("WS_PING_TIMEOUT", "20"))
+
+# Код закрытия по таймауту простоя: "уходит"
+CLOSE_GOING_AWAY = 1001
+
+
+class Heartbeat:
+    """
+    Одна фоновая задача на все подключения, а не по задаче на клиента.
+
+    Клиентам /ws раз в WS_HEARTBEAT_INTERVAL отправляется {"type": "ping"};
+    любое сообщение клиента продлевает подключение, молчащий дольше
+    WS_IDLE_TIMEOUT закрывается. Прежние эндпоинты (/ws/test-status, /ws/gpio,
+    /ws/sessions) проверяются ping протокола WebSocket на уровне uvicorn
+    (браузер отвечает на него сам), а обход реестра снимает подписки клиентов,
+    соединение которых уже закрыто, даже если очистка в эндпоинте не сработала.
+    """
+
+    def __init__(
+        self, interval: float = WS_HEARTBEAT_INTERVAL, idle_timeout: float = WS_IDLE_TIMEOUT
+    ):
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self._last_seen: Dict[WebSocket, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.reaped = 0
+        self.idle_closed = 0
+
+    def track(self, websocket: WebSocket):
+        """Клиент отвечает на ping приложения (протокол /ws)"""
+        self._last_seen[websocket] = time.monotonic()
+
+    def touch(self, websocket: WebSocket):
+        if websocket in self._last_seen:
+            self._last_seen[websocket] = time.monotonic()
+
+    def forget(self, websocket: WebSocket):
+        self._last_seen.pop(websocket, None)
+
+    def sweep(self):
+        """Один обход: очистка закрытых, отключение молчащих, ping остальным"""
+        now = time.monotonic()
+        for websocket in list(client_topics.keys() | self._last_seen.keys()):
+            if not is_connected(websocket):
+                disconnect(websocket)
+                self.forget(websocket)
+                self.reaped += 1
+                continue
+
+            last_seen = self._last_seen.get(websocket)
+            if last_seen is None:
+                continue
+            if now - last_seen > self.idle_timeout:
+                logger.warning(
+                    f"Клиент {websocket.client} молчит дольше {self.idle_timeout}с, отключение"
+                )
+                self.forget(websocket)
+                self.idle_closed += 1
+                asyncio.create_task(self._close_idle(websocket))
+            else:
+                broadcaster.send([websocket], {"type": "ping", "seq": broadcaster.seq}, force=True)
+
+        broadcaster.prune_history()
+
+    async def _close_idle(self, websocket: WebSocket):
+        disconnect(websocket)
+        try:
+            await websocket.close(code=CLOSE_GOING_AWAY, reason="Нет ответа на ping")
+        except Exception:
+            pass
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Ошибка проверки подключений WebSocket: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self):
+        return {
+            "clients": len(client_topics.keys() | self._last_seen.keys()),
+            "tracked": len(self._last_seen),
+            "reaped": self.reaped,
+            "idle_closed": self.idle_closed,
+        }
+
+
+# Глобальная проверка живости клиентов WebSocket
+heartbeat = Heartbeat()
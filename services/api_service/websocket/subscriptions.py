@@ -0,0 +1,189 @@
+# Подписки клиентов WebSocket на топики и снимки состояния топиков
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from fastapi import WebSocket
+
+from api_service.app.config import connected_clients
+from api_service.db.db_tests import tests_db
+from api_service.domain.services.firmware_jobs import FIRMWARE_TOPIC, firmware_jobs
+from api_service.domain.services.session_service import session_manager
+from api_service.websocket.broadcaster import broadcaster
+from api_service.websocket.encoding import negotiate
+
+# Топик событий GPIO всех пинов; gpio:<pin> - одного пина
+GPIO_TOPIC = "gpio"
+
+# Последнее событие каждого пина GPIO - снимок при подписке
+gpio_state: Dict[str, Dict[str, Any]] = {}
+
+# Обратный индекс: клиент -> его топики, чтобы отключение снимало все
+# подписки клиента, не перебирая реестр
+client_topics: Dict[WebSocket, Set[str]] = {}
+
+# Топики реестра: тесты - просто test_id (так их публикует broadcast_status),
+# остальные - с префиксом. Клиенты /ws называют тесты test:<test_id>
+_TOPIC_PATTERN = re.compile(r"^(test|session|gpio|firmware)(?::(.+))?$")
+
+
+def resolve_topics(names: Iterable[str]) -> List[str]:
+    """
+    Имена топиков клиента -> топики реестра:
+        test:<test_id> (test:all - все тесты), session:<session_id>,
+        gpio, gpio:<pin>, firmware, firmware:<job_id>
+    """
+    topics = []
+    for name in names:
+        match = _TOPIC_PATTERN.match(str(name))
+        if match is None or (match.group(1) in ("test", "session") and not match.group(2)):
+            raise ValueError(f"Неизвестный топик: {name}")
+        kind, value = match.groups()
+        if kind == "test":
+            topics.extend(tests_db.keys() if value == "all" else [value])
+        else:
+            topics.append(name)
+    return list(dict.fromkeys(topics))
+
+
+def topic_name(topic: str) -> str:
+    """Топик реестра -> имя топика для клиента"""
+    if ":" in topic or topic in (GPIO_TOPIC, FIRMWARE_TOPIC):
+        return topic
+    return f"test:{topic}"
+
+
+def topic_snapshot(topic: str) -> List[Dict[str, Any]]:
+    """Текущее состояние топика"""
+    if topic.startswith("session:"):
+        session_id = topic[len("session:"):]
+        session = session_manager.get(session_id)
+        if session is None:
+            return [{"session_id": session_id, "status": "pending_initiation"}]
+        return session.snapshot()
+    if topic == GPIO_TOPIC:
+        return list(gpio_state.values())
+    if topic.startswith(f"{GPIO_TOPIC}:"):
+        event = gpio_state.get(topic[len(GPIO_TOPIC) + 1:])
+        return [event] if event else []
+    if topic == FIRMWARE_TOPIC:
+        return list(firmware_jobs.values())
+    if topic.startswith(f"{FIRMWARE_TOPIC}:"):
+        job = firmware_jobs.get(topic[len(FIRMWARE_TOPIC) + 1:])
+        return [job] if job else []
+
+    if topic in tests_db:
+        test_item = tests_db[topic]
+        return [
+            {
+                "test_id": topic,
+                "status": test_item["status"],
+                "time_start": test_item["time_start"],
+                "updated_at": test_item["updated_at"],
+                "time_end": test_item["time_end"],
+                "result": test_item["result"],
+            }
+        ]
+    return [
+        {
+            "test_id": topic,
+            "status": "pending_initiation",
+            "time_start": None,
+            "updated_at": None,
+            "time_end": None,
+            "result": None,
+        }
+    ]
+
+
+def subscribe(websocket: WebSocket, topics: Iterable[str]):
+    own = client_topics.setdefault(websocket, set())
+    for topic in topics:
+        connected_clients.setdefault(topic, set()).add(websocket)
+        own.add(topic)
+
+
+def unsubscribe(websocket: WebSocket, topics: Iterable[str]):
+    own = client_topics.get(websocket, set())
+    for topic in list(topics):
+        own.discard(topic)
+        clients = connected_clients.get(topic)
+        if clients is None:
+            continue
+        clients.discard(websocket)
+        if not clients:
+            del connected_clients[topic]
+
+
+def disconnect(websocket: WebSocket):
+    """Снимает все подписки клиента и останавливает его отправителя"""
+    unsubscribe(websocket, client_topics.pop(websocket, ()))
+    broadcaster.discard(websocket)
+
+
+async def accept(websocket: WebSocket):
+    """Принимает подключение в формате кадров, который запросил клиент"""
+    fmt, subprotocol = negotiate(websocket)
+    await websocket.accept(subprotocol=subprotocol)
+    broadcaster.set_format(websocket, fmt)
+
+
+def open_topics(
+    websocket: WebSocket,
+    topics: List[str],
+    since: Optional[int] = None,
+    snapshot: str = "batched",
+) -> bool:
+    """
+    Подписывает клиента на топики. Клиенту с since ставятся в очередь только
+    пропущенные сообщения, иначе - снимок: одним кадром (batched), отдельным
+    кадром на каждую запись (frames, как у прежних эндпоинтов) или без него (none).
+    Подписка и постановка в очередь идут без await, поэтому новые сообщения
+    приходят строго после снимка. Возвращает True, если пропущенное повторено.
+    """
+    replayed = False
+    if since is not None:
+        missed = broadcaster.replay(topics, since)
+        if missed is None:
+            print(f"Пропущенные сообщения с seq {since} уже недоступны, отправляется снимок")
+        else:
+            for frame in missed:
+                broadcaster.send([websocket], frame, force=True)
+            replayed = True
+
+    if not replayed:
+        seq = broadcaster.seq
+        if snapshot == "batched":
+            broadcaster.send(
+                [websocket],
+                {
+                    "type": "snapshot",
+                    "seq": seq,
+                    "topics": {topic_name(topic): topic_snapshot(topic) for topic in topics},
+                },
+                force=True,
+            )
+        elif snapshot == "frames":
+            for topic in topics:
+                for item in topic_snapshot(topic):
+                    broadcaster.send([websocket], {**item, "seq": seq}, force=True)
+
+    subscribe(websocket, topics)
+    return replayed
+
+
+def parse_since(value: Any) -> Optional[int]:
+    """since из запроса клиента; некорректное значение - как отсутствующее"""
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def gpio_pin(event_data: Dict[str, Any]) -> Optional[str]:
+    """Номер пина события GPIO (монитор пишет его как "Пин: <n>")"""
+    if event_data.get("pin") is not None:
+        return str(event_data["pin"])
+    match = re.search(r"Пин:\s*(\d+)", event_data.get("raw_message", ""))
+    return match.group(1) if match else None
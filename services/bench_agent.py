@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Агент стенда: выполняет наборы Robot Framework по запросам центрального API.
+
+Подключается к /ws/agent, сообщает слоты стенда (session_id), которые
+обслуживает, и выполняет присланные наборы локально - в прогретых
+воркерах или отдельными процессами robot. События listener и файлы
+результатов отправляются обратно по тому же WebSocket. FastAPI и
+PostgreSQL на хосте стенда не нужны.
+
+    BENCH_AGENT_API_URL=ws://api-host:8000/ws/agent BENCH_AGENT_SESSIONS=slot1,slot2 python bench_agent.py
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api_service"))
+
+import asyncio
+import json
+import logging
+import shutil
+import socket
+import time
+from typing import Dict
+
+import websockets
+
+from api_service.domain.services.bench_agents import encode_file, is_inside
+from api_service.domain.services.retry_policy import TIMEOUT_RETURN_CODE
+from api_service.domain.services.robot_events import robot_event_server
+from api_service.domain.services.robot_runner import execute_robot_local
+from api_service.domain.services.robot_worker_pool import robot_worker_pool
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger("bench_agent")
+
+API_URL = os.getenv("BENCH_AGENT_API_URL", "ws://localhost:8000/ws/agent")
+AGENT_ID = os.getenv("BENCH_AGENT_ID", socket.gethostname())
+# Слоты стенда, наборы которых выполняет агент
+SESSIONS = [s.strip() for s in os.getenv("BENCH_AGENT_SESSIONS", AGENT_ID).split(",") if s.strip()]
+TOKEN = os.getenv("BENCH_AGENT_TOKEN", "")
+ROBOT_TESTS_DIR = os.path.abspath(
+    os.getenv(
+        "BENCH_AGENT_ROBOT_TESTS_DIR",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "robot-tests"),
+    )
+)
+OUTPUT_ROOT = os.path.abspath(os.getenv("BENCH_AGENT_OUTPUT_ROOT", "agent_output"))
+# Оставлять каталоги прогонов после отправки результатов (для отладки на стенде)
+KEEP_OUTPUT = os.getenv("BENCH_AGENT_KEEP_OUTPUT", "0") == "1"
+# Пауза перед переподключением, растет до RECONNECT_MAX
+RECONNECT_DELAY = 1.0
+RECONNECT_MAX = 30.0
+
+VERSION = "1"
+
+# Файлы прогона, которые возвращаются в API вместе с JSON результатов набора
+ROBOT_ARTIFACTS = ("output.xml", "log.html", "report.html")
+# Код отказа для набора вне ROBOT_TESTS_DIR - как у robot с ошибкой данных,
+# политика повторов такой запуск не повторяет
+INVALID_SUITE_RETURN_CODE = 252
+
+
+class BenchAgentClient:
+    def __init__(self):
+        self.runs: Dict[str, asyncio.Task] = {}
+
+    async def run_forever(self):
+        delay = RECONNECT_DELAY
+        while True:
+            try:
+                async with websockets.connect(API_URL, max_size=None, ping_interval=20) as ws:
+                    delay = RECONNECT_DELAY
+                    await self._serve(ws)
+            except (OSError, websockets.WebSocketException) as e:
+                logger.warning(f"Нет связи с API {API_URL}: {e}")
+            finally:
+                # API уже считает наборы отключенного агента упавшими
+                for task in self.runs.values():
+                    task.cancel()
+                await asyncio.gather(*self.runs.values(), return_exceptions=True)
+                self.runs.clear()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX)
+
+    async def _serve(self, ws):
+        await ws.send(
+            json.dumps(
+                {
+                    "type": "register",
+                    "agent_id": AGENT_ID,
+                    "hostname": socket.gethostname(),
+                    "sessions": SESSIONS,
+                    "token": TOKEN,
+                    "version": VERSION,
+                }
+            )
+        )
+        logger.info(f"Агент {AGENT_ID} подключен к {API_URL}, слоты: {SESSIONS}")
+
+        async for raw in ws:
+            message = json.loads(raw)
+            if message.get("type") == "run":
+                run_id = message["run_id"]
+                self.runs[run_id] = asyncio.create_task(self._run(ws, message))
+            elif message.get("type") == "cancel":
+                task = self.runs.get(message.get("run_id"))
+                if task is not None:
+                    logger.info(f"Отмена набора {message['run_id']}")
+                    task.cancel()
+
+    async def _reject(self, ws, run_id: str, reason: str):
+        logger.warning(f"Набор {run_id} отклонен: {reason}")
+        try:
+            await ws.send(
+                json.dumps(
+                    {
+                        "type": "result",
+                        "run_id": run_id,
+                        "return_code": INVALID_SUITE_RETURN_CODE,
+                        "stderr": reason,
+                        "duration": 0,
+                        "files": {},
+                    }
+                )
+            )
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.runs.pop(run_id, None)
+
+    async def _run(self, ws, message):
+        run_id = message["run_id"]
+        robot_file = os.path.abspath(os.path.join(ROBOT_TESTS_DIR, message["suite"]))
+        if not is_inside(robot_file, ROBOT_TESTS_DIR):
+            await self._reject(ws, run_id, f"Набор {message['suite']} вне каталога наборов")
+            return
+        robot_file = robot_file.replace("\\", "/")
+        # run_id становится именем каталога
+        if not run_id or os.path.basename(run_id) != run_id or run_id in (".", ".."):
+            await self._reject(ws, run_id, f"Некорректный run_id: {run_id}")
+            return
+        run_dir = os.path.join(OUTPUT_ROOT, run_id)
+
+        files = message.get("files") or {}
+        for relative in files.values():
+            if not is_inside(os.path.abspath(os.path.join(run_dir, relative)), run_dir):
+                await self._reject(ws, run_id, f"Файл результатов вне каталога прогона: {relative}")
+                return
+        os.makedirs(run_dir, exist_ok=True)
+
+        variables = dict(message.get("variables") or {})
+        for name, relative in files.items():
+            variables[name] = os.path.join(run_dir, relative)
+
+        async def forward(event: dict):
+            await ws.send(json.dumps({"type": "event", "run_id": run_id, "event": event}, default=str))
+
+        token = await robot_event_server.register(forward)
+        started = time.monotonic()
+        try:
+            logger.info(f"Набор {message['suite']} ({run_id})")
+            try:
+                return_code, stderr = await execute_robot_local(
+                    robot_file, run_dir, variables, token, timeout=message.get("timeout")
+                )
+            except asyncio.TimeoutError:
+                return_code, stderr = TIMEOUT_RETURN_CODE, f"Набор {message['suite']} прерван по таймауту"
+            finally:
+                await robot_event_server.unregister(token)
+
+            # JSON результатов набора и артефакты robot: API сохраняет их в
+            # каталог прогона так же, как при локальном запуске
+            result_files = {}
+            for relative in files.values():
+                path = os.path.join(run_dir, relative)
+                if os.path.isfile(path):
+                    with open(path, "rb") as f:
+                        result_files[relative] = encode_file(f.read())
+            for name in ROBOT_ARTIFACTS:
+                path = os.path.join(run_dir, name)
+                if name not in result_files and os.path.isfile(path):
+                    with open(path, "rb") as f:
+                        result_files[name] = encode_file(f.read(), compress=True)
+
+            await ws.send(
+                json.dumps(
+                    {
+                        "type": "result",
+                        "run_id": run_id,
+                        "return_code": return_code,
+                        "stderr": stderr,
+                        "duration": round(time.monotonic() - started, 3),
+                        "files": result_files,
+                    }
+                )
+            )
+            logger.info(f"Набор {message['suite']} ({run_id}) завершен с кодом {return_code}")
+        except websockets.ConnectionClosed:
+            logger.warning(f"Результат {run_id} не отправлен: соединение закрыто")
+        finally:
+            self.runs.pop(run_id, None)
+            if not KEEP_OUTPUT:
+                shutil.rmtree(run_dir, ignore_errors=True)
+
+
+async def main():
+    await robot_worker_pool.start()
+    try:
+        await BenchAgentClient().run_forever()
+    finally:
+        await robot_worker_pool.stop()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("Агент стенда остановлен")
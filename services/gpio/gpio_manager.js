@@ -30,7 +30,7 @@ class GPIOMonitor {
 
                 if (value !== this.lastValue) {
                     const eventType = value === 1 ? '🔼 ПОДЪЕМ' : '🔽 СПАД';
-                    console.log(`Событие: ${eventType} | GPIO: ${value} | Время: ${new Date().toLocaleTimeString()}`);
+                    console.log(`Событие: ${eventType} | GPIO: ${value} | Время: ${new Date().toLocaleTimeString()} | Пин: ${this.gpioNumber}`);
                     this.lastValue = value;
                 }
             });
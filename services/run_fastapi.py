@@ -11,6 +11,8 @@ sys.path.append(os.path.join(os.path.dirname(__file__), "api_service"))
 import asyncio
 from fastapi import FastAPI
 from app.main import app
+from api_service.websocket.encoding import WS_PER_MESSAGE_DEFLATE
+from api_service.websocket.heartbeat import WS_PING_INTERVAL, WS_PING_TIMEOUT
 
 if __name__ == "__main__":
 
@@ -30,4 +32,9 @@ if __name__ == "__main__":
         reload=False,  # Автоперезагрузка при изменении файлов
         log_level="info",
         access_log=True,
+        # Ping протокола WebSocket: оборванные подключения закрываются сервером
+        ws_ping_interval=WS_PING_INTERVAL,
+        ws_ping_timeout=WS_PING_TIMEOUT,
+        # Сжатие кадров WebSocket, если клиент его поддерживает
+        ws_per_message_deflate=WS_PER_MESSAGE_DEFLATE,
     )